@@ -0,0 +1,117 @@
+"""
+Cache profile memory benchmark
+
+Feeds synthetic gateway payloads through the client state of each cache
+profile and reports the resident memory and time taken. Each profile runs
+in its own process so that RSS readings do not leak between profiles.
+Payloads the gateway would not send for a profile's intents are skipped.
+
+Usage: python -m benchmarks.cache_bench [--guilds 5] [--members 20000] [--messages 20000]
+"""
+import sys
+import time
+import asyncio
+import argparse
+import subprocess
+import discord
+from discord.ext import commands
+
+from src.config import Config
+from src.cache_profile import client_options
+
+
+def rss() -> int:
+  """Resident set size of this process in KiB"""
+  with open('/proc/self/status') as status:
+    for line in status:
+      if line.startswith('VmRSS:'):
+        return int(line.split()[1])
+  return 0
+
+
+def _user(id: int) -> dict:
+  return {'id': str(id), 'username': f'user{id}', 'discriminator': '0', 'global_name': f'User {id}', 'avatar': None}
+
+def _member(id: int, roles: list) -> dict:
+  return {'user': _user(id), 'roles': roles, 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0}
+
+def _guild(id: int, members: int) -> dict:
+  roles = [{'id': str(id), 'name': '@everyone', 'position': 0, 'permissions': '0'}] + [
+    {'id': str(id * 1000 + i), 'name': f'role-{i}', 'position': i, 'permissions': '0'} for i in range(1, 51)
+  ]
+  return {
+    'id': str(id), 'name': f'guild-{id}', 'owner_id': '1', 'large': True,
+    'member_count': members, 'roles': roles, 'emojis': [], 'stickers': [],
+    'channels': [
+      {'id': str(id * 1000 + 500 + i), 'type': 0, 'name': f'channel-{i}', 'position': i, 'permission_overwrites': []}
+      for i in range(20)
+    ],
+    'members': [], 'presences': [], 'voice_states': [], 'threads': []
+  }
+
+def _message(id: int, guild_id: int, author: int) -> dict:
+  return {
+    'id': str(id), 'channel_id': str(guild_id * 1000 + 500 + id % 20), 'guild_id': str(guild_id),
+    'author': _user(author), 'member': _member(author, []),
+    'content': f'just chatting {id}', 'timestamp': '2024-01-01T00:00:00+00:00', 'edited_timestamp': None,
+    'tts': False, 'mention_everyone': False, 'mentions': [], 'mention_roles': [], 'attachments': [],
+    'embeds': [], 'pinned': False, 'type': 0
+  }
+
+
+async def feed(profile: str, guilds: int, members: int, messages: int) -> None:
+  options = client_options(Config.CACHE_PROFILES[profile])
+  client = commands.Bot(command_prefix = '$', **options)
+  state = client._connection
+  state.dispatch = lambda *args, **kwargs: None # type: ignore
+  intents: discord.Intents = options['intents']
+
+  baseline = rss()
+  start = time.perf_counter()
+  state.parse_ready({'user': _user(1), 'guilds': [], 'application': {'id': '1', 'flags': 0}}) # type: ignore
+
+  for g in range(1, guilds + 1):
+    guild_id = 10**6 + g
+    guild = state._add_guild_from_data(_guild(guild_id, members)) # type: ignore
+
+    # Chunking delivers every member, the gateway otherwise only sends active ones
+    if options['chunk_guilds_at_startup']:
+      for offset in range(0, members, 1000):
+        for i in range(offset, min(offset + 1000, members)):
+          guild._add_member(discord.Member(data = _member(10**7 + i, [str(guild_id * 1000 + i % 50 + 1)]), guild = guild, state = state)) # type: ignore
+
+    if intents.presences:
+      for i in range(min(members, 5000)):
+        state.parse_presence_update({ # type: ignore
+          'user': {'id': str(10**7 + i)}, 'guild_id': str(guild_id), 'status': 'online',
+          'activities': [{'name': 'Thread', 'type': 0}], 'client_status': {'desktop': 'online'}
+        })
+
+    if intents.guild_messages:
+      for i in range(messages // guilds):
+        state.parse_message_create(_message(10**9 + g * messages + i, guild_id, 10**7 + i % members)) # type: ignore
+
+  elapsed = time.perf_counter() - start
+  cached_members = sum(len(guild.members) for guild in client.guilds)
+  print(
+    f'{profile:>8} | intents {intents.value:>7} | members cached {cached_members:>8}'
+    f' | messages cached {len(client.cached_messages):>6} | {elapsed:6.2f}s | RSS +{(rss() - baseline) / 1024:7.1f} MiB'
+  )
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--profile')
+  parser.add_argument('--guilds', type = int, default = 5)
+  parser.add_argument('--members', type = int, default = 20000)
+  parser.add_argument('--messages', type = int, default = 20000)
+  args = parser.parse_args()
+
+  if args.profile:
+    asyncio.run(feed(args.profile, args.guilds, args.members, args.messages))
+  else:
+    for profile in Config.CACHE_PROFILES:
+      subprocess.run([
+        sys.executable, '-m', 'benchmarks.cache_bench', '--profile', profile,
+        '--guilds', str(args.guilds), '--members', str(args.members), '--messages', str(args.messages)
+      ], check = True)
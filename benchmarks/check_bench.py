@@ -0,0 +1,64 @@
+"""
+Permission check benchmark
+
+Measures the per-check cost of compiled permission gates for members
+with large role lists, against a per-call role scan like the one the
+gates were compiled from, and the cost of a decision cache hit
+
+Usage: python -m benchmarks.check_bench
+"""
+import timeit
+import discord
+
+from src.check import CompiledClauses, HybridContext, PermissionGate
+from tests.fakes import FakeGuild, FakeMember, FakeContext
+
+
+def _gate(query: str, value, type: str = 'required') -> PermissionGate:
+  return {'type': type, 'requirement': {'type': 'wl', 'query': query, 'value': value}} # type: ignore
+
+
+def scan(__ctx, gates) -> bool:
+  """Reference implementation walking the member roles on every call"""
+  ctx = HybridContext(__ctx)
+  for gate in gates:
+    requirement = gate['requirement']
+    match requirement['query']:
+      case 'has_role':
+        passFlag = isinstance(ctx.author, discord.Member) and any(
+          requirement['value'] in [role.id, role.name] for role in ctx.author.roles
+        )
+      case 'minimum_role':
+        role = ctx.guild and discord.utils.get(ctx.guild.roles, name = requirement['value'])
+        passFlag = bool(role and isinstance(ctx.author, discord.Member) and ctx.author.top_role >= role)
+      case _:
+        passFlag = False
+    if not passFlag:
+      return False
+  return True
+
+
+def run(role_count: int, number: int = 2000) -> None:
+  guild = FakeGuild(id = 10**6)
+  for i in range(1, role_count + 1):
+    guild.add_role(i, f'role-{i}', i)
+  member = FakeMember(guild, 1, range(1, role_count + 1))
+  ctx = FakeContext(member, guild)
+
+  gates = [_gate('has_role', f'role-{role_count // 2}'), _gate('minimum_role', 'role-1')]
+  compiled = CompiledClauses(*gates)
+  assert compiled.validate(ctx) and scan(ctx, gates) # type: ignore
+
+  compiled_cost = timeit.timeit(lambda: compiled.validate(ctx, cached = False), number = number) / number # type: ignore
+  cached_cost = timeit.timeit(lambda: compiled.validate(ctx), number = number) / number # type: ignore
+  scan_cost = timeit.timeit(lambda: scan(ctx, gates), number = number) / number
+  print(
+    f'{role_count:>6} roles | scan {scan_cost * 1e6:9.2f}us'
+    f' | compiled {compiled_cost * 1e6:7.2f}us (x{scan_cost / compiled_cost:.1f})'
+    f' | cached {cached_cost * 1e6:5.2f}us'
+  )
+
+
+if __name__ == '__main__':
+  for count in (10, 100, 250, 1000):
+    run(count)
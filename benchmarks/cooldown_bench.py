@@ -0,0 +1,113 @@
+"""
+Cooldown benchmark
+
+Fills the cooldown stores and discord.py's cooldown mapping with distinct
+users and reports the memory per user, the cost of a lookup and the cost
+of sweeping expired users. discord.py scans every bucket on each lookup,
+so its lookups are only timed a few times.
+
+Usage: python -m benchmarks.cooldown_bench [--users 1000000] [--lookups 100000]
+"""
+import os
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import tracemalloc
+from discord.ext import commands
+from typing import Callable
+
+from src.cooldown import MemoryCooldowns, SQLiteCooldowns
+
+
+def timed(function: Callable[[], object], number: int) -> float:
+  """Average seconds per call"""
+  start = time.perf_counter()
+  for _ in range(number):
+    function()
+  return (time.perf_counter() - start) / number
+
+
+def memory(users: int, lookups: int) -> None:
+  tracemalloc.start()
+  store = MemoryCooldowns(max_keys = users)
+  start = time.perf_counter()
+  for user in range(users):
+    store.update('help', user, 1, 15, now = 0)
+  filled = time.perf_counter() - start
+  size = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+
+  keys = [random.randrange(users) for _ in range(lookups)]
+  iterator = iter(keys)
+  lookup = timed(lambda: store.update('help', next(iterator), 1, 15, now = 1), lookups)
+
+  start = time.perf_counter()
+  swept = store.sweep(now = 100)
+  sweep = time.perf_counter() - start
+  print(
+    f'memory     {users:>9} users | {size / users:6.1f} B/user ({size / 2**20:7.1f} MiB) | fill {filled:6.2f}s'
+    f' | lookup {lookup * 1e6:7.2f}us | sweep {swept} in {sweep * 1000:.0f}ms'
+  )
+
+
+def capped(users: int, cap: int) -> None:
+  store = MemoryCooldowns(max_keys = cap)
+  cost = timed(lambda: store.update('help', random.getrandbits(48), 1, 15, now = 0), users)
+  print(f'capped     {users:>9} users | {len(store)} kept, {store.evictions} evicted | lookup {cost * 1e6:7.2f}us')
+
+
+def sqlite(users: int, lookups: int) -> None:
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'cooldowns.db')
+    store = SQLiteCooldowns(path)
+    store.update('help', 0, 1, 15, now = 0)
+
+    # Bulk insert, one transaction instead of one per user
+    with sqlite3.connect(path) as connection:
+      connection.executemany('INSERT OR REPLACE INTO cooldowns VALUES (?, ?, ?)', (('help', str(user), 15.0) for user in range(users)))
+    size = os.path.getsize(path)
+
+    lookup = timed(lambda: store.update('help', random.randrange(users), 1, 15, now = 1), lookups)
+    start = time.perf_counter()
+    swept = store.sweep(now = 100)
+    sweep = time.perf_counter() - start
+    print(
+      f'sqlite     {users:>9} users | {size / users:6.1f} B/user on disk | lookup {lookup * 1e6:7.2f}us'
+      f' | sweep {swept} in {sweep * 1000:.0f}ms'
+    )
+
+
+def mapping(users: int) -> None:
+  class Message:
+    def __init__(self, id: int) -> None:
+      self.author = type('Author', (), {'id': id})
+
+  tracemalloc.start()
+  cooldowns = commands.CooldownMapping.from_cooldown(1, 15, commands.BucketType.user)
+  now = time.time()
+  for user in range(users):
+    bucket = cooldowns._cooldown.copy() # type: ignore
+    bucket.update_rate_limit(now)
+    cooldowns._cache[user] = bucket
+  size = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+
+  number = max(1, min(1000, 10**7 // users))
+  lookup = timed(lambda: cooldowns.update_rate_limit(Message(random.randrange(users)), now + 1), number) # type: ignore
+  print(f'discord.py {users:>9} users | {size / users:6.1f} B/user ({size / 2**20:7.1f} MiB) | lookup {lookup * 1e6:9.2f}us')
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(prog = 'python -m benchmarks.cooldown_bench')
+  parser.add_argument('--users', type = int, default = 1_000_000)
+  parser.add_argument('--lookups', type = int, default = 100_000)
+  args = parser.parse_args()
+
+  random.seed(0)
+  memory(args.users, args.lookups)
+  capped(args.users, 100_000)
+  sqlite(args.users, min(args.lookups, 20_000))
+  for users in (10_000, 100_000, args.users):
+    mapping(users)
@@ -0,0 +1,8 @@
+"""
+Offline load-test harness
+
+Stand-ins for the Discord gateway and HTTP API that the real client
+connects to, and the event streams delivered through them
+"""
+from .server import FakeDiscord, Recorder
+from . import payloads, streams
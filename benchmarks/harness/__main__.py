@@ -0,0 +1,192 @@
+"""
+Offline load test
+
+Runs the real client, with every cog loaded, against the local gateway
+and HTTP API stand-ins and reports commands per second, reply latency
+percentiles, event loop lag and memory
+
+Usage: python -m benchmarks.harness [--rate 50] [--duration 30] [--mix chat=5,command=3,slash=1,join=1]
+       python -m benchmarks.harness --record stream.jsonl [--rate 50] [--duration 30]
+       python -m benchmarks.harness --replay stream.jsonl [--rate 50]
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional, Sequence
+
+from .server import FakeDiscord
+from . import streams
+
+
+def rss() -> Dict[str, int]:
+  """Current and peak resident set size of this process in KiB"""
+  sizes = {}
+  with open('/proc/self/status') as status:
+    for line in status:
+      if line.startswith(('VmRSS:', 'VmHWM:')):
+        sizes[line[:5]] = int(line.split()[1])
+  return {'current': sizes.get('VmRSS', 0), 'peak': sizes.get('VmHWM', 0)}
+
+def percentiles(values: Sequence[float], quantiles: Sequence[float] = (0.5, 0.9, 0.99)) -> Dict[str, float]:
+  """Nearest-rank percentiles and maximum, in milliseconds"""
+  if not values:
+    return {}
+  ordered = sorted(values)
+  summary = {f'p{round(q * 100)}': ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 for q in quantiles}
+  summary['max'] = ordered[-1] * 1000
+  return summary
+
+
+def command_channels(guild_id: int, count: int) -> List[int]:
+  """IDs of the channels synthetic messages and commands are sent to"""
+  return [guild_id + i for i in range(1, count + 1)]
+
+def event_count(args: argparse.Namespace) -> int:
+  return args.events or round(args.rate * args.duration)
+
+
+class LagMonitor:
+  """
+  Measures how late the event loop wakes up a sleeping task
+  """
+
+  interval: float
+  samples: List[float]
+  _task: Optional[asyncio.Task]
+
+  def __init__(self, interval: float = 0.01) -> None:
+    self.interval = interval
+    self.samples = []
+    self._task = None
+
+  def start(self) -> None:
+    self._task = asyncio.get_running_loop().create_task(self._run())
+
+  def stop(self) -> None:
+    self._task and self._task.cancel()
+
+  async def _run(self) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+      start = loop.time()
+      await asyncio.sleep(self.interval)
+      self.samples.append(max(loop.time() - start - self.interval, 0))
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+  # The client reads its cache profile on import
+  if args.profile:
+    os.environ['CACHE_PROFILE'] = args.profile
+  # Every run identifies against a new fake gateway
+  os.environ['RESUME_SESSIONS'] = '0'
+  from src import client, load_cogs
+  from src.config import Config
+  from src.logger import setup_logging, stop_logging
+
+  server = FakeDiscord(
+    Config.GUILD_ID,
+    [Config.WELCOME_CHANNEL_ID, Config.RULE_CHANNEL_ID, *command_channels(Config.GUILD_ID, args.channels)],
+    args.users, Config.COMMAND_PREFIX, Config.WELCOME_CHANNEL_ID
+  )
+  server.start()
+  server.install()
+  setup_logging(args.log_level)
+
+  try:
+    async with client:
+      await load_cogs()
+      loaded = asyncio.ensure_future(Config.DEFERRED_COGS and client.wait_for('cogs_changed') or client.wait_until_ready())
+      await client.login('harness')
+      connection = asyncio.create_task(client.connect(reconnect = False))
+      await asyncio.wait_for(loaded, timeout = 30)
+
+      if args.replay:
+        events = streams.replay(args.replay)
+      else:
+        events = streams.synthetic(
+          server.guild_id, [channel for channel in server.channels if int(channel['id']) != Config.WELCOME_CHANNEL_ID],
+          server.users, event_count(args), args.mix, args.commands, Config.COMMAND_PREFIX, args.seed
+        )
+
+      baseline = rss()
+      lag = LagMonitor()
+      lag.start()
+      recorder = await asyncio.wrap_future(server.play(events, args.rate or None, args.drain))
+      lag.stop()
+
+      await client.close()
+      await asyncio.gather(connection, return_exceptions = True)
+  finally:
+    stop_logging()
+    server.stop()
+
+  elapsed = (recorder.answered or recorder.started or 0) - (recorder.started or 0)
+  answered = len(recorder.latencies['command']) + len(recorder.latencies['slash'])
+  memory = rss()
+  return {
+    'events': dict(recorder.sent),
+    'answered': answered,
+    'unanswered': recorder.pending,
+    'unmatched': recorder.unmatched,
+    'elapsed': elapsed,
+    'commands_per_second': elapsed and answered / elapsed or 0,
+    'latency_ms': {kind: percentiles(values) for kind, values in recorder.latencies.items() if values},
+    'loop_lag_ms': percentiles(lag.samples),
+    'rss_kib': {'baseline': baseline['current'], **memory},
+    'requests': dict(recorder.requests.most_common())
+  }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+  def line(summary: Dict[str, float]) -> str:
+    return ' | '.join(f'{name} {value:8.2f}ms' for name, value in summary.items())
+
+  rows = [
+    'events      ' + ', '.join(f'{name} {count}' for name, count in report['events'].items()),
+    f'answered    {report["answered"]} in {report["elapsed"]:.2f}s, {report["commands_per_second"]:.1f} commands/s'
+    f' ({sum(report["unanswered"].values())} unanswered, {report["unmatched"]} unmatched)',
+    *(f'{kind:<12}{line(summary)}' for kind, summary in report['latency_ms'].items()),
+    f'loop lag    {line(report["loop_lag_ms"])}',
+    'memory      RSS {current} KiB (+{delta} KiB), peak {peak} KiB'.format(
+      delta = report['rss_kib']['current'] - report['rss_kib']['baseline'], **report['rss_kib']
+    ),
+    'requests    ' + ', '.join(f'{route} {count}' for route, count in report['requests'].items())
+  ]
+  return '\n'.join(rows)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+  return {kind: float(weight) for kind, weight in (pair.split('=') for pair in value.split(','))}
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(prog = 'python -m benchmarks.harness')
+  parser.add_argument('--rate', type = float, default = 50, help = 'events per second, 0 sends as fast as possible')
+  parser.add_argument('--duration', type = float, default = 30, help = 'seconds of synthetic events')
+  parser.add_argument('--events', type = int, help = 'how many synthetic events, defaults to rate times duration')
+  parser.add_argument('--mix', type = parse_mix, default = 'chat=5,command=3,slash=1,join=1')
+  parser.add_argument('--commands', type = lambda value: value.split(','), default = 'ping,help,links,getprefix')
+  parser.add_argument('--channels', type = int, default = 20)
+  parser.add_argument('--users', type = int, default = 500)
+  parser.add_argument('--seed', type = int, default = 0)
+  parser.add_argument('--drain', type = float, default = 10, help = 'seconds to wait for outstanding replies')
+  parser.add_argument('--profile', help = 'cache profile of the client')
+  parser.add_argument('--replay', help = 'recorded stream to deliver instead of synthetic events')
+  parser.add_argument('--record', help = 'write the synthetic stream to this file and exit')
+  parser.add_argument('--log-level', default = 'WARNING')
+  parser.add_argument('--json', action = 'store_true', help = 'print the report as JSON')
+  args = parser.parse_args()
+
+  if args.record:
+    from src.config import Config
+    server = FakeDiscord(Config.GUILD_ID, command_channels(Config.GUILD_ID, args.channels), args.users, Config.COMMAND_PREFIX, 0)
+    written = streams.record(args.record, streams.synthetic(
+      server.guild_id, server.channels, server.users, event_count(args), args.mix, args.commands, Config.COMMAND_PREFIX, args.seed
+    ))
+    print(f'Recorded {written} events to {args.record}')
+    sys.exit()
+
+  report = asyncio.run(run(args))
+  print(args.json and json.dumps(report) or format_report(report))
@@ -0,0 +1,108 @@
+"""
+Gateway and REST payload builders
+
+Produces the minimal JSON discord.py needs to build its models,
+shaped like what Discord sends for a bot in a single guild
+"""
+import itertools
+import datetime
+from discord.utils import time_snowflake
+from typing import Any, Dict, List, Optional
+
+
+TIMESTAMP = '2024-01-01T00:00:00+00:00'
+APPLICATION_ID = 10**17 + 1
+BOT_USER_ID = 10**17 + 2
+
+_sequence = itertools.count(1)
+
+
+def snowflake() -> int:
+  """A unique snowflake for the current time"""
+  now = datetime.datetime.now(datetime.timezone.utc)
+  return time_snowflake(now) | (next(_sequence) & 0x3FFFFF)
+
+
+def user(id: int, bot: bool = False) -> Dict[str, Any]:
+  return {
+    'id': str(id), 'username': bot and 'thread' or f'user{id}', 'discriminator': '0',
+    'global_name': bot and 'Thread' or f'User {id}', 'avatar': None, 'bot': bot
+  }
+
+def member(id: int, roles: List[int] = []) -> Dict[str, Any]:
+  return {
+    'user': user(id), 'roles': [str(role) for role in roles], 'joined_at': TIMESTAMP,
+    'deaf': False, 'mute': False, 'flags': 0
+  }
+
+def channel(id: int, guild_id: int, name: str, position: int = 0) -> Dict[str, Any]:
+  return {
+    'id': str(id), 'guild_id': str(guild_id), 'type': 0, 'name': name,
+    'position': position, 'permission_overwrites': [], 'nsfw': False
+  }
+
+def guild(id: int, channels: List[Dict[str, Any]], members: List[Dict[str, Any]] = []) -> Dict[str, Any]:
+  return {
+    'id': str(id), 'name': 'harness', 'owner_id': str(BOT_USER_ID), 'large': False,
+    'member_count': len(members) + 1, 'unavailable': False,
+    'roles': [{'id': str(id), 'name': '@everyone', 'position': 0, 'permissions': str(0x7FFFFFFFFFF)}],
+    'emojis': [], 'stickers': [], 'channels': channels, 'threads': [],
+    'members': [{**member(BOT_USER_ID), 'user': user(BOT_USER_ID, bot = True)}, *members],
+    'presences': [], 'voice_states': [], 'features': [], 'joined_at': TIMESTAMP
+  }
+
+
+def ready(session_id: str, gateway: str, guild_ids: List[int], shard: Optional[List[int]] = None) -> Dict[str, Any]:
+  payload = {
+    'v': 10, 'user': user(BOT_USER_ID, bot = True), 'session_id': session_id,
+    'resume_gateway_url': gateway, 'guilds': [{'id': str(id), 'unavailable': True} for id in guild_ids],
+    'application': {'id': str(APPLICATION_ID), 'flags': 0}
+  }
+  if shard is not None:
+    payload['shard'] = shard
+  return payload
+
+def application() -> Dict[str, Any]:
+  return {
+    'id': str(APPLICATION_ID), 'name': 'thread', 'description': '', 'icon': None,
+    'bot_public': True, 'bot_require_code_grant': False, 'owner': user(BOT_USER_ID + 1),
+    'verify_key': '', 'flags': 0, 'summary': ''
+  }
+
+
+def message(
+  channel_id: int,
+  guild_id: Optional[int],
+  author: Dict[str, Any],
+  content: str = '',
+  id: Optional[int] = None,
+  **fields: Any
+) -> Dict[str, Any]:
+  payload = {
+    'id': str(id or snowflake()), 'channel_id': str(channel_id), 'author': author,
+    'content': content, 'timestamp': TIMESTAMP, 'edited_timestamp': None, 'tts': False,
+    'mention_everyone': False, 'mentions': [], 'mention_roles': [], 'attachments': [],
+    'embeds': [], 'components': [], 'pinned': False, 'type': 0, **fields
+  }
+  if guild_id is not None:
+    payload['guild_id'] = str(guild_id)
+  return payload
+
+def member_message(channel_id: int, guild_id: int, author_id: int, content: str) -> Dict[str, Any]:
+  return message(channel_id, guild_id, user(author_id), content, member = {
+    key: value for key, value in member(author_id).items() if key != 'user'
+  })
+
+def slash_command(channel: Dict[str, Any], guild_id: int, author_id: int, name: str, options: List[Dict[str, Any]] = []) -> Dict[str, Any]:
+  return {
+    'id': str(snowflake()), 'application_id': str(APPLICATION_ID), 'type': 2,
+    'token': f'harness-{snowflake()}', 'version': 1, 'guild_id': str(guild_id),
+    'channel_id': channel['id'], 'channel': channel, 'locale': 'en-US', 'guild_locale': 'en-US',
+    'member': {**member(author_id), 'permissions': '0'}, 'app_permissions': str(0x7FFFFFFFFFF),
+    'entitlements': [], 'authorizing_integration_owners': {'0': str(guild_id)}, 'context': 0,
+    'attachment_size_limit': 8 * 1024 * 1024,
+    'data': {'id': str(snowflake()), 'name': name, 'type': 1, 'options': options, 'guild_id': str(guild_id)}
+  }
+
+def member_join(guild_id: int, id: int) -> Dict[str, Any]:
+  return {**member(id), 'guild_id': str(guild_id)}
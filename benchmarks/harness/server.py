@@ -0,0 +1,427 @@
+"""
+Local stand-ins for the Discord gateway and HTTP API
+
+One aiohttp application serves both, on its own event loop in a
+background thread so the bot's loop is only charged for the bot's work.
+Events sent to the bot are correlated with the requests it makes back:
+command messages with the reply posted to their channel, slash commands
+with their interaction callback and member joins with the welcome
+message mentioning them.
+"""
+import re
+import json
+import time
+import asyncio
+import threading
+import collections
+import concurrent.futures
+import aiohttp
+import yarl
+import discord
+from aiohttp import web
+from discord.gateway import DiscordWebSocket
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+from . import payloads
+
+
+# Events the gateway withholds unless the matching intent was identified with
+EVENT_INTENTS: Dict[str, int] = {
+  'MESSAGE_CREATE': discord.Intents.guild_messages.flag,
+  'GUILD_MEMBER_ADD': discord.Intents.members.flag
+}
+MESSAGE_CONTENT: int = discord.Intents.message_content.flag
+MENTION = re.compile(r'<@!?(\d+)>')
+SUMMARY = re.compile(r'and (\d+) more members joined')
+
+
+class Recorder:
+  """
+  Correlates events sent to the bot with the requests it makes back
+  """
+
+  prefix: str
+  welcome_channel_id: int
+  sent: collections.Counter
+  requests: collections.Counter
+  latencies: Dict[str, List[float]]
+  unmatched: int
+  started: Optional[float]
+  answered: Optional[float]
+  _channels: Dict[int, Deque[int]]
+  _messages: Dict[int, float]
+  _interactions: Dict[int, float]
+  _joins: Dict[int, float]
+
+  def __init__(self, prefix: str, welcome_channel_id: int) -> None:
+    """
+    Initializes a Recorder
+
+    Parameters
+    ----------
+    :param prefix: The bot's command prefix, messages starting with it expect a reply
+    :param welcome_channel_id: Where the bot welcomes new members
+    """
+    self.prefix = prefix
+    self.welcome_channel_id = welcome_channel_id
+    self.sent = collections.Counter()
+    self.requests = collections.Counter()
+    self.latencies = {'command': [], 'slash': [], 'join': []}
+    self.unmatched = 0
+    self.started = None
+    self.answered = None
+    self._channels = collections.defaultdict(collections.deque)
+    self._messages = {}
+    self._interactions = {}
+    self._joins = {}
+
+  @property
+  def pending(self) -> Dict[str, int]:
+    """Events still waiting for the bot's answer, by kind"""
+    return {
+      'command': len(self._messages),
+      'slash': len(self._interactions),
+      'join': len(self._joins)
+    }
+
+  def dispatched(self, event: str, data: Dict[str, Any]) -> None:
+    """
+    Records an event delivered to the bot
+
+    Parameters
+    ----------
+    :param event: The dispatch name
+    :param data: The dispatch payload, as delivered
+    """
+    now = time.perf_counter()
+    self.started = self.started or now
+    self.sent[event] += 1
+
+    match event:
+      case 'MESSAGE_CREATE' if data.get('content', '').startswith(self.prefix) and not data['author'].get('bot'):
+        self.sent['command'] += 1
+        self._channels[int(data['channel_id'])].append(int(data['id']))
+        self._messages[int(data['id'])] = now
+      case 'INTERACTION_CREATE':
+        self.sent['slash'] += 1
+        self._interactions[int(data['id'])] = now
+      case 'GUILD_MEMBER_ADD':
+        self._joins[int(data['user']['id'])] = now
+
+  def posted(self, channel_id: int, data: Dict[str, Any]) -> None:
+    """
+    Records a message the bot created
+
+    Parameters
+    ----------
+    :param channel_id: The target channel
+    :param data: The JSON body the bot sent
+    """
+    now = time.perf_counter()
+    reference = (data.get('message_reference') or {}).get('message_id')
+    queue = self._channels.get(channel_id)
+
+    if channel_id == self.welcome_channel_id:
+      welcomed = [self._joins.pop(int(id), None) for id in MENTION.findall(data.get('content') or '')]
+
+      # Floods are summarized, the oldest joins are the ones left unnamed
+      for embed in data.get('embeds') or []:
+        summarized = SUMMARY.search(embed.get('description') or '')
+        for id in summarized and list(self._joins)[:int(summarized[1])] or []:
+          welcomed.append(self._joins.pop(id))
+
+      self.latencies['join'].extend(now - joined for joined in welcomed if joined is not None)
+      return
+
+    # Replies name their message, plain sends are matched oldest first
+    sent = reference and self._messages.pop(int(reference), None)
+    while not sent and queue:
+      sent = self._messages.pop(queue.popleft(), None)
+    if sent:
+      self.latencies['command'].append(now - sent)
+      self.answered = now
+    else:
+      self.unmatched += 1
+
+  def responded(self, interaction_id: int) -> None:
+    """
+    Records an interaction callback
+
+    Parameters
+    ----------
+    :param interaction_id: The interaction answered
+    """
+    now = time.perf_counter()
+    sent = self._interactions.pop(interaction_id, None)
+    if sent is None:
+      self.unmatched += 1
+    else:
+      self.latencies['slash'].append(now - sent)
+      self.answered = now
+
+
+class Session:
+  """A gateway connection identified as one shard"""
+
+  __slots__ = ('id', 'socket', 'intents', 'shard', 'sequence')
+
+  def __init__(self, socket: web.WebSocketResponse, intents: int, shard: Tuple[int, int]) -> None:
+    self.id = f'harness-{payloads.snowflake()}'
+    self.socket = socket
+    self.intents = intents
+    self.shard = shard
+    self.sequence = 0
+
+
+class FakeDiscord:
+  """
+  Gateway and HTTP API stand-in for a single guild
+  """
+
+  guild_id: int
+  channels: List[Dict[str, Any]]
+  users: List[int]
+  recorder: Recorder
+  sessions: Dict[str, Session]
+  loop: asyncio.AbstractEventLoop
+  port: int
+  _thread: threading.Thread
+  _runner: web.AppRunner
+  _installed: Dict[str, Any]
+
+  def __init__(self, guild_id: int, channel_ids: Iterable[int], users: int, prefix: str, welcome_channel_id: int) -> None:
+    """
+    Initializes a FakeDiscord
+
+    Parameters
+    ----------
+    :param guild_id: The guild the bot is in
+    :param channel_ids: Text channels of the guild
+    :param users: How many members can author events
+    :param prefix: The bot's command prefix
+    :param welcome_channel_id: Where the bot welcomes new members
+    """
+    self.guild_id = guild_id
+    self.channels = [
+      payloads.channel(id, guild_id, f'channel-{i}', i) for i, id in enumerate(dict.fromkeys(channel_ids))
+    ]
+    self.users = [10**15 + i for i in range(users)]
+    self.recorder = Recorder(prefix, welcome_channel_id)
+    self.sessions = {}
+    self._installed = {}
+
+  @property
+  def url(self) -> str:
+    return f'http://127.0.0.1:{self.port}'
+
+
+  # Lifecycle
+  def start(self) -> None:
+    """Serves on a free localhost port from a background thread"""
+    self.loop = asyncio.new_event_loop()
+    started = concurrent.futures.Future()
+
+    def run() -> None:
+      asyncio.set_event_loop(self.loop)
+      self.loop.run_until_complete(self._serve(started))
+      self.loop.run_forever()
+
+    self._thread = threading.Thread(target = run, name = 'fake-discord', daemon = True)
+    self._thread.start()
+    self.port = started.result(timeout = 10)
+
+  async def _serve(self, started: concurrent.futures.Future) -> None:
+    app = web.Application()
+    app.router.add_get('/', self.gateway)
+    app.router.add_route('*', '/api/v{version}/{path:.*}', self.rest)
+    self._runner = web.AppRunner(app, access_log = None)
+    await self._runner.setup()
+    site = web.TCPSite(self._runner, '127.0.0.1', 0)
+    await site.start()
+    started.set_result(site._server.sockets[0].getsockname()[1]) # type: ignore
+
+  def stop(self) -> None:
+    """Closes every connection and stops the background thread"""
+    self.uninstall()
+    asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self.loop).result(timeout = 10)
+    self.loop.call_soon_threadsafe(self.loop.stop)
+    self._thread.join(timeout = 10)
+
+  def install(self) -> None:
+    """Points discord.py's HTTP routes and gateway at this server"""
+    self._installed = {'BASE': discord.http.Route.BASE, 'DEFAULT_GATEWAY': getattr(DiscordWebSocket, 'DEFAULT_GATEWAY', None)}
+    discord.http.Route.BASE = f'{self.url}/api/v10'
+    DiscordWebSocket.DEFAULT_GATEWAY = yarl.URL(self.url.replace('http', 'ws', 1) + '/')
+
+  def uninstall(self) -> None:
+    """Restores what install replaced"""
+    if self._installed:
+      discord.http.Route.BASE = self._installed['BASE']
+      DiscordWebSocket.DEFAULT_GATEWAY = self._installed['DEFAULT_GATEWAY']
+      self._installed = {}
+
+
+  # Streaming
+  def play(self, events: Iterable[Dict[str, Any]], rate: Optional[float], drain: float = 10) -> 'concurrent.futures.Future[Recorder]':
+    """
+    Delivers a stream of dispatches to the bot
+
+    Each event is a gateway dispatch ``{"t": name, "d": payload}``, with an
+    optional ``"at"`` offset in seconds, otherwise events are paced at rate
+
+    Parameters
+    ----------
+    :param events: The dispatches to deliver, consumed lazily
+    :param rate: Events per second, None sends as fast as possible
+    :param drain: Seconds to wait for outstanding replies once the stream ends
+    """
+    return asyncio.run_coroutine_threadsafe(self._play(events, rate, drain), self.loop)
+
+  async def _play(self, events: Iterable[Dict[str, Any]], rate: Optional[float], drain: float) -> Recorder:
+    start = self.loop.time()
+    for i, event in enumerate(events):
+      at = event.get('at', rate and i / rate or 0)
+      delay = start + at - self.loop.time()
+      if delay > 0:
+        await asyncio.sleep(delay)
+      await self.dispatch(event['t'], event['d'])
+
+    deadline = self.loop.time() + drain
+    while any(self.recorder.pending.values()) and self.loop.time() < deadline:
+      await asyncio.sleep(0.05)
+    return self.recorder
+
+  async def dispatch(self, event: str, data: Dict[str, Any]) -> None:
+    """
+    Sends a dispatch to the shard owning its guild, as the gateway would
+
+    Parameters
+    ----------
+    :param event: The dispatch name
+    :param data: The dispatch payload
+    """
+    guild_id = int(data.get('guild_id') or 0)
+    for session in list(self.sessions.values()):
+      if session.socket.closed or (guild_id >> 22) % session.shard[1] != session.shard[0]:
+        continue
+      if event in EVENT_INTENTS and not session.intents & EVENT_INTENTS[event]:
+        continue
+      if event == 'MESSAGE_CREATE' and not session.intents & MESSAGE_CONTENT:
+        data = {**data, 'content': ''}
+
+      self.recorder.dispatched(event, data)
+      await self._send(session, event, data)
+
+  async def _send(self, session: Session, event: str, data: Dict[str, Any]) -> None:
+    session.sequence += 1
+    await session.socket.send_str(json.dumps({'op': 0, 't': event, 's': session.sequence, 'd': data}))
+
+
+  # Gateway
+  async def gateway(self, request: web.Request) -> web.WebSocketResponse:
+    socket = web.WebSocketResponse(max_msg_size = 0)
+    await socket.prepare(request)
+    await socket.send_str(json.dumps({'op': 10, 'd': {'heartbeat_interval': 41250}}))
+
+    async for frame in socket:
+      if frame.type is not aiohttp.WSMsgType.TEXT:
+        continue
+      message = json.loads(frame.data)
+      data = message.get('d')
+
+      match message['op']:
+        case 1:
+          await socket.send_str(json.dumps({'op': 11}))
+        case 2:
+          await self.identify(socket, data)
+        case 6:
+          await self.resume(socket, data)
+        case 8:
+          await self.request_members(socket, data)
+
+    return socket
+
+  async def identify(self, socket: web.WebSocketResponse, data: Dict[str, Any]) -> None:
+    shard = tuple(data.get('shard') or (0, 1))
+    session = Session(socket, data.get('intents', 0), shard) # type: ignore
+    self.sessions[session.id] = session
+
+    owned = (self.guild_id >> 22) % shard[1] == shard[0]
+    await self._send(session, 'READY', payloads.ready(
+      session.id, self.url.replace('http', 'ws', 1) + '/', owned and [self.guild_id] or [],
+      'shard' in data and list(shard) or None
+    ))
+    if owned:
+      await self._send(session, 'GUILD_CREATE', payloads.guild(self.guild_id, self.channels))
+
+  async def resume(self, socket: web.WebSocketResponse, data: Dict[str, Any]) -> None:
+    session = self.sessions.get(data['session_id'])
+    if session is None:
+      await socket.send_str(json.dumps({'op': 9, 'd': False}))
+      return
+    session.socket = socket
+    await self._send(session, 'RESUMED', {})
+
+  async def request_members(self, socket: web.WebSocketResponse, data: Dict[str, Any]) -> None:
+    session = next(session for session in self.sessions.values() if session.socket is socket)
+    await self._send(session, 'GUILD_MEMBERS_CHUNK', {
+      'guild_id': data['guild_id'], 'members': [payloads.member(id) for id in self.users],
+      'chunk_index': 0, 'chunk_count': 1, 'nonce': data.get('nonce')
+    })
+
+
+  # HTTP API
+  async def rest(self, request: web.Request) -> web.Response:
+    path = request.match_info['path']
+    route = re.sub(r'\d{15,}', '{id}', re.sub(r'^interactions/[^/]+/[^/]+', 'interactions/{id}/{token}', path))
+    self.recorder.requests[f'{request.method} /{route}'] += 1
+
+    match request.method, path.split('/'):
+      case 'GET', ['users', '@me']:
+        return self._json(payloads.user(payloads.BOT_USER_ID, bot = True))
+      case 'GET', ['oauth2', 'applications', '@me'] | ['applications', '@me']:
+        return self._json(payloads.application())
+      case 'GET', ['gateway'] | ['gateway', 'bot']:
+        return self._json({
+          'url': self.url.replace('http', 'ws', 1), 'shards': 1,
+          'session_start_limit': {'total': 1000, 'remaining': 1000, 'reset_after': 0, 'max_concurrency': 1}
+        })
+      case 'POST', ['channels', channel_id, 'messages']:
+        return await self.create_message(int(channel_id), await self._body(request))
+      case 'POST', ['interactions', interaction_id, _, 'callback']:
+        return await self.create_response(int(interaction_id), await self._body(request))
+      case 'PUT', ['applications', *_]:
+        return self._json([])
+      case _:
+        return web.Response(status = 204)
+
+  def _json(self, data: Any) -> web.Response:
+    # discord.py only decodes an exact content type, without a charset
+    return web.Response(body = json.dumps(data).encode(), headers = {'Content-Type': 'application/json'})
+
+  async def _body(self, request: web.Request) -> Dict[str, Any]:
+    if request.content_type == 'multipart/form-data':
+      form = await request.post()
+      return json.loads(str(form.get('payload_json') or '{}'))
+    return request.can_read_body and await request.json() or {}
+
+  async def create_message(self, channel_id: int, data: Dict[str, Any]) -> web.Response:
+    self.recorder.posted(channel_id, data)
+    message = payloads.message(
+      channel_id, self.guild_id, payloads.user(payloads.BOT_USER_ID, bot = True), data.get('content') or '',
+      embeds = data.get('embeds') or [], components = data.get('components') or []
+    )
+
+    # The bot's own messages come back through the gateway
+    await self.dispatch('MESSAGE_CREATE', message)
+    return self._json(message)
+
+  async def create_response(self, interaction_id: int, data: Dict[str, Any]) -> web.Response:
+    self.recorder.responded(interaction_id)
+    message = payloads.message(
+      0, self.guild_id, payloads.user(payloads.BOT_USER_ID, bot = True), (data.get('data') or {}).get('content') or ''
+    )
+    return self._json({
+      'interaction': {'id': str(interaction_id), 'type': 2, 'response_message_id': message['id']},
+      'resource': {'type': data.get('type', 4), 'message': message}
+    })
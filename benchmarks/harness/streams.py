@@ -0,0 +1,90 @@
+"""
+Event streams for the harness
+
+Streams are iterables of gateway dispatches, ``{"t": name, "d": payload}``
+with an optional ``"at"`` offset in seconds from the start of the stream.
+Recorded streams are stored one dispatch per line.
+"""
+import json
+import random
+from typing import Any, Dict, Iterable, Iterator, Mapping, Sequence
+
+from . import payloads
+
+
+def synthetic(
+  guild_id: int,
+  channels: Sequence[Dict[str, Any]],
+  users: Sequence[int],
+  count: int,
+  mix: Mapping[str, float],
+  commands: Sequence[str],
+  prefix: str,
+  seed: int = 0
+) -> Iterator[Dict[str, Any]]:
+  """
+  Generates a random mix of events
+
+  Parameters
+  ----------
+  :param guild_id: The guild events happen in
+  :param channels: Channel payloads messages and commands are sent to
+  :param users: Member IDs authoring events
+  :param count: How many events to generate
+  :param mix: Relative weights of 'chat', 'command', 'slash' and 'join' events
+  :param commands: Command names to invoke
+  :param prefix: The bot's command prefix
+  :param seed: Seed of the random generator, the same seed generates the same stream
+  """
+  rng = random.Random(seed)
+  kinds = list(mix)
+  weights = [mix[kind] for kind in kinds]
+  joined = 0
+
+  for kind in rng.choices(kinds, weights, k = count):
+    channel = rng.choice(channels)
+    author = rng.choice(users)
+
+    match kind:
+      case 'chat':
+        yield {'t': 'MESSAGE_CREATE', 'd': payloads.member_message(int(channel['id']), guild_id, author, f'just chatting {rng.random()}')}
+      case 'command':
+        yield {'t': 'MESSAGE_CREATE', 'd': payloads.member_message(int(channel['id']), guild_id, author, prefix + rng.choice(commands))}
+      case 'slash':
+        yield {'t': 'INTERACTION_CREATE', 'd': payloads.slash_command(channel, guild_id, author, rng.choice(commands))}
+      case 'join':
+        joined += 1
+        yield {'t': 'GUILD_MEMBER_ADD', 'd': payloads.member_join(guild_id, 10**16 + joined)}
+      case _:
+        raise ValueError(f'Unknown event kind {kind!r}')
+
+
+def replay(path: str) -> Iterator[Dict[str, Any]]:
+  """
+  Reads a recorded stream
+
+  Parameters
+  ----------
+  :param path: File with one dispatch per line
+  """
+  with open(path) as file:
+    for line in file:
+      if line.strip():
+        yield json.loads(line)
+
+
+def record(path: str, events: Iterable[Dict[str, Any]]) -> int:
+  """
+  Writes a stream so that it can be replayed, returns how many events were written
+
+  Parameters
+  ----------
+  :param path: Destination file
+  :param events: The dispatches to write
+  """
+  written = 0
+  with open(path, 'w') as file:
+    for event in events:
+      file.write(json.dumps(event) + '\n')
+      written += 1
+  return written
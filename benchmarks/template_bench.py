@@ -0,0 +1,70 @@
+"""
+Response template benchmark
+
+Compares building and serializing a constant reply embed on every call,
+as the links, prefix and error replies did, against stamping a template
+rendered once. Reports CPU time and the memory allocated per reply.
+
+Usage: python -m benchmarks.template_bench [--number 100000]
+"""
+import timeit
+import argparse
+import tracemalloc
+import discord
+from discord.utils import _to_json
+from typing import Any, Callable
+
+from src.utils import Embeds, EmbedTemplates
+
+LINKS = dict(
+  title = 'Project Links',
+  description = '[**Github Organization**](https://github.com/python-thread)\n[**Documentation**](https://thread.ngjx.org)'
+)
+
+
+def allocated(function: Callable[[], Any], number: int = 1000) -> float:
+  """Average bytes allocated by a call, including memory freed before it returns"""
+  function()
+  tracemalloc.start()
+  total = 0
+  for _ in range(number):
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    function()
+    total += tracemalloc.get_traced_memory()[1] - before
+  tracemalloc.stop()
+  return total / number
+
+
+def run(name: str, kwargs: dict, number: int) -> None:
+  templates = EmbedTemplates()
+
+  # What a reply does with the embed: build it and turn it into its payload
+  def today() -> dict:
+    return Embeds(**kwargs).to_dict()
+
+  def templated() -> dict:
+    return templates.embed(**kwargs).to_dict()
+
+  assert {**today(), 'timestamp': 0} == {**templated(), 'timestamp': 0}
+  today_cost = timeit.timeit(today, number = number) / number
+  templated_cost = timeit.timeit(templated, number = number) / number
+
+  # Serializing the request body costs the same either way
+  payload = {'content': '<@1>', 'embeds': [today()]}
+  json_cost = timeit.timeit(lambda: _to_json(payload), number = number) / number
+  print(
+    f'{name:<10} | today {today_cost * 1e6:6.2f}us {allocated(today):6.0f}B'
+    f' | templated {templated_cost * 1e6:6.2f}us {allocated(templated):6.0f}B (x{today_cost / templated_cost:.1f})'
+    f' | JSON body {json_cost * 1e6:5.2f}us'
+  )
+
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(prog = 'python -m benchmarks.template_bench')
+  parser.add_argument('--number', type = int, default = 100_000)
+  args = parser.parse_args()
+
+  run('links', LINKS, args.number)
+  run('prefix', dict(title = 'Prefix', description = '$'), args.number)
+  run('cooldown', dict(color = discord.Color.dark_red(), description = 'This command is on cooldown, please retry in 5s.'), args.number)
@@ -1,9 +1,13 @@
 import asyncio
 from src import main
+from src.config import Config
+from src.cluster import supervise
 
 if __name__ == '__main__':
+  # The launcher runs clusters as worker processes of this same script
+  launcher = Config.CLUSTERS > 1 and not Config.IPC_PATH
   try:
-    asyncio.run(main())
+    asyncio.run(launcher and supervise() or main())
   except KeyboardInterrupt:
     pass
   except Exception as e:
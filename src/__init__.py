@@ -1,34 +1,126 @@
+from .timeline import timeline
+
 import os
+import math
+import asyncio
+import logging
+import resource
 import discord
 from discord.ext import commands
+from typing import Any, Dict
 
 from .config import Config
+from .cache_profile import active_options
+from .cluster import Bot, ShardedBot, link, shard_options
+from .check import set_override_resolver
+from .settings import settings
+from .command_sync import command_sync
+from .cooldown import cooldowns
+from .shutdown import drain
+from .logger import setup_logging, stop_logging
+from .metrics import metrics
+from .utils import MessageFilter
+
+timeline.mark('imported')
+logger = logging.getLogger(__name__)
 
 
-client = commands.Bot(
-  command_prefix = Config.COMMAND_PREFIX,
-  intents = discord.Intents.all()
+# Prefixes and permission overrides are answered from memory, never per-message I/O
+client = (Config.SHARDED and ShardedBot or Bot)(
+  command_prefix = settings.command_prefix,
+  **active_options(),
+  **shard_options()
 )
+message_filter = MessageFilter(settings.prefixes)
+set_override_resolver(settings.permission_override)
 
 # Configuration
+@client.event
+async def on_connect():
+  if not timeline.has('gateway READY'):
+    timeline.mark('gateway READY')
+
 @client.event
 async def on_ready():
-  print(f'Client [{client.user}] UP')
+  logger.info('Client [%s] UP', client.user)
+
+  # Reconnects fire on_ready again
+  if timeline.has('guilds available'): return
+  timeline.mark('guilds available')
+  await load_cogs(deferred = True)
+
+  # Global commands are shared by every cluster, the first one uploads them
+  if Config.SYNC_ON_STARTUP and Config.CLUSTER_ID == 0:
+    await sync_commands()
 
 @client.event
 async def on_message(message):
+  # Most messages are chat, drop them before a context is built
+  skipped = message_filter.reason(message)
+  metrics.observe_message(skipped or 'dispatched')
+  if skipped: return
+
   # Allow text to invoke comamnds
   await client.process_commands(message)
 
 
 # Loading cogs
-async def load_cogs():
-  for filename in os.listdir(os.path.join(os.getcwd(), 'src', 'cogs')):
-    if filename.endswith('.py'):
-      await client.load_extension(
-        f'.cogs.{filename.split("/")[-1][:-3]}',
-        package = 'src'
-      )
+async def load_cog(name: str):
+  with timeline.span(f'extension {name}'):
+    await client.load_extension(f'.cogs.{name}', package = 'src')
+
+async def load_cogs(deferred: bool = False):
+  names = [
+    filename[:-3] for filename in sorted(os.listdir(os.path.join(os.path.dirname(__file__), 'cogs')))
+    if filename.endswith('.py') and ((filename[:-3] in Config.DEFERRED_COGS) == deferred)
+  ]
+
+  with timeline.span(deferred and 'deferred extensions' or 'extensions'):
+    await asyncio.gather(*(load_cog(name) for name in names))
+
+  if deferred and names:
+    client.dispatch('cogs_changed')
+
+
+# Application commands
+async def sync_commands():
+  try:
+    with timeline.span('command sync'):
+      await command_sync.sync(client.tree)
+      if Config.DEV_GUILD_ID:
+        guild = discord.Object(Config.DEV_GUILD_ID)
+        command_sync.mirror(client.tree, guild)
+        await command_sync.sync(client.tree, guild)
+  except Exception:
+    logger.exception('Failed to sync application commands')
+
+
+# Cluster operations, broadcast to every worker process
+async def manage_extension(action: str, name: str) -> None:
+  if action != 'load':
+    await client.unload_extension(f'.cogs.{name}', package = 'src')
+  if action != 'unload':
+    await client.load_extension(f'.cogs.{name}', package = 'src')
+  client.dispatch('cogs_changed')
+
+async def cluster_stats() -> Dict[str, Any]:
+  latencies = getattr(client, 'latencies', None) or [(client.shard_id or 0, client.latency)]
+  return {
+    'shards': [shard_id for shard_id, _ in latencies],
+    'ready': client.is_ready(),
+    'guilds': len(client.guilds),
+    'latency': max((latency for _, latency in latencies if math.isfinite(latency)), default = None),
+    'commands': sum(metrics.calls.values()),
+    'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  }
+
+async def reload_settings(guild_id: int) -> None:
+  await settings.reload(guild_id)
+  client.dispatch('guild_settings_update', guild_id)
+
+link.register('extension', manage_extension)
+link.register('stats', cluster_stats)
+link.register('settings', reload_settings)
 
 
 # Main runner
@@ -36,6 +128,18 @@ async def main():
   if not Config.BOT_TOKEN:
     raise Exception('No bot token')
 
-  async with client:
-    await load_cogs()
-    await client.start(Config.BOT_TOKEN)
+  setup_logging(Config.LOG_LEVEL)
+  try:
+    async with client:
+      with timeline.span('settings'):
+        await settings.open()
+      await load_cogs()
+      with timeline.span('login'):
+        await client.login(Config.BOT_TOKEN)
+      await link.connect()
+      await drain.serve(client, client.connect())
+  finally:
+    await link.close()
+    await settings.close()
+    await cooldowns.close()
+    stop_logging()
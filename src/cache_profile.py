@@ -0,0 +1,137 @@
+import os
+import ast
+import discord
+from typing import Any, Dict, Set, Tuple, Iterable
+
+from .config import Config, CacheProfile
+
+
+# Gateway intents an event listener needs to ever be called
+EVENT_INTENTS: Dict[str, Tuple[str, ...]] = {
+  'on_message': ('guild_messages', 'dm_messages'),
+  'on_message_edit': ('guild_messages', 'dm_messages'),
+  'on_message_delete': ('guild_messages', 'dm_messages'),
+  'on_reaction_add': ('guild_reactions', 'dm_reactions'),
+  'on_reaction_remove': ('guild_reactions', 'dm_reactions'),
+  'on_typing': ('guild_typing', 'dm_typing'),
+  'on_member_join': ('members',),
+  'on_member_remove': ('members',),
+  'on_member_update': ('members',),
+  'on_presence_update': ('presences',),
+  'on_guild_emojis_update': ('emojis_and_stickers',),
+  'on_guild_stickers_update': ('emojis_and_stickers',),
+  'on_invite_create': ('invites',),
+  'on_invite_delete': ('invites',),
+  'on_voice_state_update': ('voice_states',),
+  'on_member_ban': ('moderation',),
+  'on_member_unban': ('moderation',)
+}
+
+# Always required for guild, channel and role state
+BASE_INTENTS: Tuple[str, ...] = ('guilds',)
+
+# Required for prefix commands to read message content
+COMMAND_INTENTS: Tuple[str, ...] = ('guild_messages', 'dm_messages', 'message_content')
+
+_COMMAND_DECORATORS = ('command', 'hybrid_command', 'group', 'hybrid_group')
+
+
+def _decorator_name(decorator: ast.expr) -> str:
+  target = decorator.func if isinstance(decorator, ast.Call) else decorator
+  return target.attr if isinstance(target, ast.Attribute) else getattr(target, 'id', '')
+
+def scan_sources(paths: Iterable[str]) -> Tuple[Set[str], bool]:
+  """
+  Collects the listened events and whether prefix commands exist
+
+  Sources are parsed rather than imported, so this is safe to run before
+  the client is built
+
+  Parameters
+  ----------
+  :param paths: Python source files
+  """
+  events: Set[str] = set()
+  has_commands = False
+
+  for path in paths:
+    with open(path, encoding = 'utf-8') as file:
+      tree = ast.parse(file.read(), filename = path)
+
+    for node in ast.walk(tree):
+      if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)): continue
+      for decorator in node.decorator_list:
+        name = _decorator_name(decorator)
+        if name in _COMMAND_DECORATORS:
+          has_commands = True
+
+        elif name in ('listener', 'event'):
+          event = node.name
+          if isinstance(decorator, ast.Call) and decorator.args and isinstance(decorator.args[0], ast.Constant):
+            event = str(decorator.args[0].value)
+          events.add(event)
+
+  return events, has_commands
+
+def derive_intents(events: Iterable[str], has_commands: bool) -> discord.Intents:
+  """
+  Returns the minimal intents for a set of events
+
+  Parameters
+  ----------
+  :param events: Listened event names
+  :param has_commands: Whether prefix commands need to be received
+  """
+  names = set(BASE_INTENTS)
+  for event in events:
+    names.update(EVENT_INTENTS.get(event, ()))
+  if has_commands:
+    names.update(COMMAND_INTENTS)
+  return discord.Intents(**{name: True for name in names})
+
+def source_paths() -> Iterable[str]:
+  """Paths of the bot's own event handlers and every cog"""
+  root = os.path.dirname(__file__)
+  yield os.path.join(root, '__init__.py')
+  cogs = os.path.join(root, 'cogs')
+  for filename in sorted(os.listdir(cogs)):
+    if filename.endswith('.py'):
+      yield os.path.join(cogs, filename)
+
+def client_options(profile: CacheProfile) -> Dict[str, Any]:
+  """
+  Builds the client's intents and cache options for a profile
+
+  Parameters
+  ----------
+  :param profile: The cache and intents profile
+  """
+  if profile['intents'] == 'all':
+    intents = discord.Intents.all()
+  elif profile['intents'] == 'auto':
+    intents = derive_intents(*scan_sources(source_paths()))
+  else:
+    intents = discord.Intents(**{name: True for name in (*BASE_INTENTS, *profile['intents'])})
+
+  if profile['member_cache_flags'] == 'auto':
+    member_cache_flags = discord.MemberCacheFlags.from_intents(intents)
+  else:
+    member_cache_flags = discord.MemberCacheFlags.none()
+    for name in profile['member_cache_flags']:
+      setattr(member_cache_flags, name, True)
+    # Flags the gateway cannot feed are dropped rather than rejected
+    member_cache_flags.joined &= intents.members
+    member_cache_flags.voice &= intents.voice_states
+
+  return {
+    'intents': intents,
+    'member_cache_flags': member_cache_flags,
+    'chunk_guilds_at_startup': profile['chunk_guilds_at_startup'] and intents.members,
+    'max_messages': profile['max_messages']
+  }
+
+def active_options() -> Dict[str, Any]:
+  """Builds the client options of the configured profile"""
+  if Config.CACHE_PROFILE not in Config.CACHE_PROFILES:
+    raise ValueError(f'Unknown cache profile [{Config.CACHE_PROFILE}]')
+  return client_options(Config.CACHE_PROFILES[Config.CACHE_PROFILE])
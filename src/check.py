@@ -1,13 +1,19 @@
+import time
 import discord
+import logging
+import itertools
+from collections import OrderedDict
 from discord import app_commands
 from discord.ext import commands
 
 from .config import Config
 from typing import (
-  Any, NoReturn, Literal, Union, Optional,
-  List, Sequence, TypedDict
+  Any, NoReturn, Literal, Union, Optional, Callable,
+  List, Dict, Set, Tuple, FrozenSet, Iterable, Sequence, TypedDict
 )
 
+logger = logging.getLogger(__name__)
+
 
 class PermissionRequirement(TypedDict):
   """
@@ -40,6 +46,8 @@ class HybridContext:
   Hybrid Context derrived from any command context
   """
 
+  __slots__ = ('author', 'is_developer', 'guild', 'channel')
+
   author: Union[discord.User, discord.Member]
   is_developer: bool
   guild: Optional[discord.Guild]
@@ -60,94 +68,702 @@ class HybridContext:
 
 
 
-def _validate_group(ctx: HybridContext, group: List[PermissionGate]) -> bool:
-  required: List[bool] = []
-  optional: List[bool] = []
-
-  for gate in group:
-    passFlag: bool = False
-
-    match gate['requirement']['query']:
-      case 'is_developer':
-        passFlag = ((gate['requirement']['type'] == 'wl') and ctx.is_developer)
-
-      case 'has_role':
-        if ctx.guild and isinstance(ctx.author, discord.Member):
-          passFlag = (gate['requirement']['type'] == 'wl') and any(
-            gate['requirement']['value'] in [role.id, role.name]
-            for role in ctx.author.roles
-          )
-
-      case 'has_permission':
-        if ctx.guild and isinstance(ctx.author, discord.Member):
-          passFlag = (gate['requirement']['type'] == 'wl') and getattr(
-            ctx.author.guild_permissions,
-            str(gate['requirement']['value'])
-          )
-
-      case 'in_channel':
-        if ctx.guild and isinstance(ctx.author, discord.Member):
-          passFlag = (gate['requirement']['type'] == 'wl') and (
-            gate['requirement']['value'] == ctx.channel.id
-          )
-
-      case 'in_guild':
-        if ctx.guild and isinstance(ctx.author, discord.Member):
-          passFlag = (gate['requirement']['type'] == 'wl') and (
-            gate['requirement']['value'] in
-            [ctx.guild.id, ctx.guild.name]
-          )
-
-      case 'minimum_role':
-        if ctx.guild and gate['requirement']['value'] and isinstance(ctx.author, discord.Member):
-          role = ctx.guild.get_role(int(gate['requirement']['value']))
-          passFlag = bool((gate['requirement']['type'] == 'wl') and role and (
-            ctx.author.top_role >= role
-          ))
-
-    if gate['type'] == 'required':
-      required.append(passFlag)
+# Role lookups by name are resolved once per guild and then compared by ID
+_resolved_roles: Dict[Tuple[int, str], FrozenSet[int]] = {}
+
+def _resolve_roles(guild: discord.Guild, value: Union[str, int]) -> FrozenSet[int]:
+  """
+  Resolves a role ID or role name to the set of matching role IDs in a guild
+
+  Parameters
+  ----------
+  :param guild: The guild to resolve in
+  :param value: Role ID or role name
+  """
+  key = (guild.id, str(value))
+  resolved = _resolved_roles.get(key)
+  if resolved is None:
+    resolved = frozenset(
+      role.id for role in guild.roles
+      if value in (role.id, role.name) or str(value) == str(role.id)
+    )
+    _resolved_roles[key] = resolved
+  return resolved
+
+def invalidate_resolved_roles(guild_id: Optional[int] = None) -> None:
+  """
+  Drops cached role resolutions
+
+  Parameters
+  ----------
+  :param guild_id: Only drop resolutions for this guild, drops all if None
+  """
+  if guild_id is None:
+    _resolved_roles.clear()
+    return
+  for key in [key for key in _resolved_roles if key[0] == guild_id]:
+    del _resolved_roles[key]
+
+
+class CompiledGate:
+  """
+  A single permission gate compiled into a flat evaluator
+  """
+
+  __slots__ = ('query', 'value', 'required', 'blacklist', '_ids', '_names', '_evaluate')
+
+  query: str
+  value: Optional[Union[str, int]]
+  required: bool
+  blacklist: bool
+
+  def __init__(self, gate: PermissionGate) -> None:
+    """
+    Compiles a permission gate
+
+    Parameters
+    ----------
+    :param gate: The permission gate
+    """
+    requirement = gate['requirement']
+    self.query = requirement['query']
+    self.value = requirement['value']
+    self.required = gate['type'] == 'required'
+    self.blacklist = requirement['type'] == 'bl'
+
+    # Split the value into an integer form for ID compares and a string form for name compares
+    self._ids: FrozenSet[int] = frozenset()
+    self._names: FrozenSet[str] = frozenset()
+    if isinstance(self.value, int) or (isinstance(self.value, str) and self.value.isdigit()):
+      self._ids = frozenset({int(self.value)})
+    elif self.value is not None:
+      self._names = frozenset({str(self.value)})
+
+    match self.query:
+      case 'is_developer': self._evaluate = self._is_developer
+      case 'has_role': self._evaluate = self._has_role
+      case 'has_permission': self._evaluate = self._has_permission
+      case 'in_channel': self._evaluate = self._in_channel
+      case 'in_guild': self._evaluate = self._in_guild
+      case 'minimum_role': self._evaluate = self._minimum_role
+      case _: raise ValueError(f'Unknown permission query [{self.query}]')
+
+  def evaluate(self, ctx: HybridContext) -> bool:
+    """
+    Evaluates the gate, blacklisted gates pass when the condition is not met
+
+    Parameters
+    ----------
+    :param ctx: The hybrid context
+    """
+    return self._evaluate(ctx) != self.blacklist
+
+  @property
+  def label(self) -> str:
+    """Describes the gate, e.g. `required wl has_role=Moderator`"""
+    value = '' if self.value is None else f'={self.value}'
+    return f'{"required" if self.required else "optional"} {"bl" if self.blacklist else "wl"} {self.query}{value}'
+
+  def _is_developer(self, ctx: HybridContext) -> bool:
+    return ctx.is_developer
+
+  def _has_role(self, ctx: HybridContext) -> bool:
+    if not ctx.guild or not isinstance(ctx.author, discord.Member): return False
+    ids = _resolve_roles(ctx.guild, str(self.value)) if self._names else self._ids
+    return any((role_id == ctx.guild.id) or ctx.author._roles.has(role_id) for role_id in ids)
+
+  def _has_permission(self, ctx: HybridContext) -> bool:
+    if not ctx.guild or not isinstance(ctx.author, discord.Member): return False
+    return bool(getattr(ctx.author.guild_permissions, str(self.value)))
+
+  def _in_channel(self, ctx: HybridContext) -> bool:
+    if not ctx.guild or not isinstance(ctx.author, discord.Member) or not ctx.channel: return False
+    return ctx.channel.id in self._ids
+
+  def _in_guild(self, ctx: HybridContext) -> bool:
+    if not ctx.guild or not isinstance(ctx.author, discord.Member): return False
+    return (ctx.guild.id in self._ids) or (ctx.guild.name in self._names)
+
+  def _minimum_role(self, ctx: HybridContext) -> bool:
+    if not ctx.guild or self.value is None or not isinstance(ctx.author, discord.Member): return False
+    # Roles sharing the name are all accepted as the minimum, so the lowest of them applies
+    roles = [role for role_id in _resolve_roles(ctx.guild, self.value) if (role := ctx.guild.get_role(role_id))]
+    if not roles: return False
+    role = min(roles)
+    if role.id == ctx.guild.id: return True
+
+    # Short-circuits on the first role at or above the minimum instead of computing top_role
+    get_role = ctx.guild.get_role
+    return any(
+      (member_role := get_role(role_id)) is not None and member_role >= role
+      for role_id in ctx.author._roles
+    )
+
+
+class CompiledClause:
+  """
+  A group of permission gates compiled into required and optional evaluators
+
+  All required gates must pass and, if any optional gates exist, at least one must pass
+  """
+
+  __slots__ = ('required', 'optional')
+
+  required: Tuple[CompiledGate, ...]
+  optional: Tuple[CompiledGate, ...]
+
+  def __init__(self, group: Iterable[PermissionGate]) -> None:
+    """
+    Compiles a group of permission gates
+
+    Parameters
+    ----------
+    :param group: The permission gates
+    """
+    gates = [CompiledGate(gate) for gate in group]
+    self.required = tuple(gate for gate in gates if gate.required)
+    self.optional = tuple(gate for gate in gates if not gate.required)
+
+  def __len__(self) -> int:
+    return len(self.required) + len(self.optional)
+
+  def evaluate(self, ctx: HybridContext) -> bool:
+    """
+    Evaluates the clause, stopping at the first deciding gate
+
+    Parameters
+    ----------
+    :param ctx: The hybrid context
+    """
+    for gate in self.required:
+      if not gate.evaluate(ctx):
+        return False
+
+    if not self.optional:
+      return True
+
+    for gate in self.optional:
+      if gate.evaluate(ctx):
+        return True
+    return False
+
+  def trace(self, ctx: HybridContext, command: str) -> bool:
+    """
+    Evaluates the clause like `evaluate`, recording every gate with the check tracer
+
+    Parameters
+    ----------
+    :param ctx: The hybrid context
+    :param command: The qualified name of the command being checked
+    """
+    for index, gate in enumerate(self.required):
+      if not check_tracer.evaluate(command, gate, ctx):
+        check_tracer.decided(command, gate, (*self.required[index + 1:], *self.optional))
+        return False
+
+    if not self.optional:
+      return True
+
+    for index, gate in enumerate(self.optional):
+      if check_tracer.evaluate(command, gate, ctx):
+        check_tracer.decided(command, gate, self.optional[index + 1:])
+        return True
+    return False
+
+
+_DecisionKey = Tuple[int, int, Optional[int], Optional[int], int]
+
+class DecisionCache:
+  """
+  Bounded LRU of permission decisions keyed by (clauses, member, guild, channel, member roles)
+
+  Entries are dropped precisely by the permission cache listeners
+  and expire after `ttl` seconds as a backstop. Role changes of members
+  discord.py does not cache fire no listener, the roles in the key make
+  their next check miss instead
+  """
+
+  maxsize: int
+  ttl: float
+  hits: int
+  misses: int
+
+  _entries: 'OrderedDict[_DecisionKey, Tuple[float, bool]]'
+  _by_member: Dict[Tuple[Optional[int], int], Set[_DecisionKey]]
+  _by_guild: Dict[Optional[int], Set[_DecisionKey]]
+  _by_channel: Dict[int, Set[_DecisionKey]]
+
+  def __init__(self, maxsize: int = 8192, ttl: float = 300) -> None:
+    """
+    Initializes a DecisionCache
+
+    Parameters
+    ----------
+    :param maxsize: Maximum number of cached decisions
+    :param ttl: Seconds a decision stays valid without being invalidated
+    """
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self._entries = OrderedDict()
+    self._by_member = {}
+    self._by_guild = {}
+    self._by_channel = {}
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def get(self, key: _DecisionKey) -> Optional[bool]:
+    """
+    Returns a cached decision or None when absent or expired
+
+    Parameters
+    ----------
+    :param key: The decision key
+    """
+    entry = self._entries.get(key)
+    if entry is None or entry[0] < time.monotonic():
+      if entry is not None:
+        self._discard(key)
+      self.misses += 1
+      return None
+
+    self._entries.move_to_end(key)
+    self.hits += 1
+    return entry[1]
+
+  def set(self, key: _DecisionKey, decision: bool) -> None:
+    """
+    Stores a decision, evicting the least recently used one when full
+
+    Parameters
+    ----------
+    :param key: The decision key
+    :param decision: Whether access was granted
+    """
+    if key in self._entries:
+      self._entries.move_to_end(key)
     else:
-      optional.append(passFlag)
+      while len(self._entries) >= self.maxsize:
+        self._discard(next(iter(self._entries)))
+      _, member_id, guild_id, channel_id, _ = key
+      self._by_member.setdefault((guild_id, member_id), set()).add(key)
+      self._by_guild.setdefault(guild_id, set()).add(key)
+      if channel_id is not None:
+        self._by_channel.setdefault(channel_id, set()).add(key)
+    self._entries[key] = (time.monotonic() + self.ttl, decision)
+
+  def _discard(self, key: _DecisionKey) -> None:
+    if self._entries.pop(key, None) is None: return
+    _, member_id, guild_id, channel_id, _ = key
+    for index, index_key in (
+      (self._by_member, (guild_id, member_id)),
+      (self._by_guild, guild_id),
+      (self._by_channel, channel_id)
+    ):
+      keys = index.get(index_key) # type: ignore
+      if keys is not None:
+        keys.discard(key)
+        if not keys:
+          del index[index_key] # type: ignore
+
+  def _discard_all(self, keys: Optional[Set[_DecisionKey]]) -> None:
+    for key in list(keys or ()):
+      self._discard(key)
+
+  def invalidate_member(self, guild_id: Optional[int], member_id: int) -> None:
+    """
+    Drops decisions made for a member, including those not scoped to a guild
 
-  return (
-    (((len(required) > 0) and all(required)) or True)
-    and
-    (((len(optional) > 0) and any(optional)) or True)
-  )
+    Parameters
+    ----------
+    :param guild_id: The guild the member belongs to
+    :param member_id: The member's ID
+    """
+    self._discard_all(self._by_member.get((guild_id, member_id)))
+    self._discard_all(self._by_member.get((None, member_id)))
 
+  def invalidate_guild(self, guild_id: int) -> None:
+    """
+    Drops decisions made within a guild
 
+    Parameters
+    ----------
+    :param guild_id: The guild's ID
+    """
+    self._discard_all(self._by_guild.get(guild_id))
 
-def validate(__ctx: Union[discord.Interaction, commands.Context], *gates: Union[PermissionGate, Sequence[PermissionGate]]) -> bool:
+  def invalidate_channel(self, channel_id: int) -> None:
+    """
+    Drops decisions scoped to a channel
+
+    Parameters
+    ----------
+    :param channel_id: The channel's ID
+    """
+    self._discard_all(self._by_channel.get(channel_id))
+
+  def clear(self) -> None:
+    """Drops every decision"""
+    self._entries.clear()
+    self._by_member.clear()
+    self._by_guild.clear()
+    self._by_channel.clear()
+
+  def stats(self) -> Dict[str, Union[int, float]]:
+    """Returns the cache size and hit/miss counters"""
+    total = self.hits + self.misses
+    return {
+      'size': len(self._entries),
+      'hits': self.hits,
+      'misses': self.misses,
+      'hit_rate': total and self.hits / total
+    }
+
+
+decision_cache = DecisionCache()
+_clause_tokens = itertools.count(1)
+
+
+class GateTrace:
   """
-  Validates a members access to a command
+  Aggregated evaluations of one gate of one command
+  """
+
+  __slots__ = ('calls', 'failures', 'short_circuits', 'skipped', 'total_time', 'max_time')
+
+  calls: int
+  failures: int
+  short_circuits: int
+  skipped: int
+  total_time: float
+  max_time: float
+
+  def __init__(self) -> None:
+    self.calls = 0
+    self.failures = 0
+    self.short_circuits = 0
+    self.skipped = 0
+    self.total_time = 0.0
+    self.max_time = 0.0
+
+  @property
+  def mean_time(self) -> float:
+    return self.calls and self.total_time / self.calls
+
+
+class CommandTrace:
+  """
+  Aggregated permission checks of one command
+  """
+
+  __slots__ = ('checks', 'denied', 'cached', 'total_time', 'last_denial')
+
+  checks: int
+  denied: int
+  cached: int
+  total_time: float
+  last_denial: Optional[str]
+
+  def __init__(self) -> None:
+    self.checks = 0
+    self.denied = 0
+    self.cached = 0
+    self.total_time = 0.0
+    self.last_denial = None
+
+
+class CheckTracer:
+  """
+  Opt-in profiling of permission checks
+
+  While enabled, every evaluated gate records its decision, the time it took
+  and whether it decided its clause, aggregated per command and per gate.
+  Disabled tracing costs one attribute read per check.
+  """
+
+  enabled: bool
+  gates: Dict[Tuple[str, str], GateTrace]
+  commands: Dict[str, CommandTrace]
+  _denial: Optional[str]
+
+  def __init__(self, enabled: bool = False) -> None:
+    """
+    Initializes a CheckTracer
+
+    Parameters
+    ----------
+    :param enabled: Whether checks are traced from the start
+    """
+    self.enabled = enabled
+    self.gates = {}
+    self.commands = {}
+    self._denial = None
+
+  def _gate(self, command: str, gate: CompiledGate) -> GateTrace:
+    key = (command, gate.label)
+    trace = self.gates.get(key)
+    if trace is None:
+      trace = self.gates[key] = GateTrace()
+    return trace
+
+  def evaluate(self, command: str, gate: CompiledGate, ctx: HybridContext) -> bool:
+    """
+    Evaluates and records a gate
+
+    Parameters
+    ----------
+    :param command: The qualified name of the command being checked
+    :param gate: The gate
+    :param ctx: The hybrid context
+    """
+    start = time.perf_counter()
+    decision = gate.evaluate(ctx)
+    elapsed = time.perf_counter() - start
+
+    trace = self._gate(command, gate)
+    trace.calls += 1
+    trace.total_time += elapsed
+    trace.max_time = max(trace.max_time, elapsed)
+    if not decision:
+      trace.failures += 1
+      self._denial = gate.label
+    return decision
+
+  def decided(self, command: str, gate: CompiledGate, skipped: Iterable[CompiledGate]) -> None:
+    """
+    Records a gate deciding its clause before the remaining gates were evaluated
+
+    Parameters
+    ----------
+    :param command: The qualified name of the command being checked
+    :param gate: The deciding gate
+    :param skipped: The gates left unevaluated
+    """
+    self._gate(command, gate).short_circuits += 1
+    self.skip(command, skipped)
+
+  def skip(self, command: str, gates: Iterable[CompiledGate]) -> None:
+    """
+    Records gates left unevaluated because an earlier gate decided the check
+
+    Parameters
+    ----------
+    :param command: The qualified name of the command being checked
+    :param gates: The skipped gates
+    """
+    for gate in gates:
+      self._gate(command, gate).skipped += 1
+
+  def check(self, command: str, decision: bool, elapsed: float, cached: bool) -> None:
+    """
+    Records a finished permission check
+
+    Parameters
+    ----------
+    :param command: The qualified name of the command being checked
+    :param decision: Whether access was granted
+    :param elapsed: Seconds the check took
+    :param cached: Whether the decision came from the decision cache
+    """
+    trace = self.commands.get(command)
+    if trace is None:
+      trace = self.commands[command] = CommandTrace()
+    trace.checks += 1
+    trace.total_time += elapsed
+    trace.cached += cached
+    if not decision:
+      trace.denied += 1
+      trace.last_denial = 'cached decision' if cached else self._denial
+      logger.debug(f'Denied [{command}] at gate [{trace.last_denial}] in {elapsed * 1e6:.1f}us')
+    self._denial = None
+
+  def slowest(self, count: int = 10) -> List[Tuple[str, str, GateTrace]]:
+    """
+    Returns (command, gate, trace) of the gates with the highest mean time
+
+    Parameters
+    ----------
+    :param count: Number of gates
+    """
+    return sorted(
+      ((command, gate, trace) for (command, gate), trace in self.gates.items() if trace.calls),
+      key = lambda item: item[2].mean_time,
+      reverse = True
+    )[:count]
+
+  def most_failed(self, count: int = 10) -> List[Tuple[str, str, GateTrace]]:
+    """
+    Returns (command, gate, trace) of the gates that failed most often
+
+    Parameters
+    ----------
+    :param count: Number of gates
+    """
+    return sorted(
+      ((command, gate, trace) for (command, gate), trace in self.gates.items() if trace.failures),
+      key = lambda item: item[2].failures,
+      reverse = True
+    )[:count]
+
+  def reset(self) -> None:
+    """Drops every recorded trace"""
+    self.gates.clear()
+    self.commands.clear()
+    self._denial = None
+
+
+check_tracer = CheckTracer(Config.TRACE_CHECKS)
+
+# Returns a guild's replacement clauses for a command, installed by the settings store
+OverrideResolver = Callable[[int, str], Optional['CompiledClauses']]
+_override_resolver: Optional[OverrideResolver] = None
+
+def set_override_resolver(resolver: Optional[OverrideResolver]) -> None:
+  """
+  Lets guilds replace the permission gates of commands
 
   Parameters
   ----------
-  :param __ctx: Command Context [legacy and app command supported]
-  :param gates: List of permission gates
+  :param resolver: Returns the clauses replacing a command's own for a guild ID and qualified command name, None keeps them
+  """
+  global _override_resolver
+  _override_resolver = resolver
+
+def _effective(compiled: 'CompiledClauses', guild: Optional[discord.Guild], command: Any) -> 'CompiledClauses':
+  if _override_resolver is None or guild is None or command is None:
+    return compiled
+  return _override_resolver(guild.id, command.qualified_name) or compiled
+
+
+class CompiledClauses:
+  """
+  A set of clauses compiled once and evaluated for every command invocation
   """
-  try:
-    ctx = HybridContext(__ctx)
-    grouped: List[List[PermissionGate]] = [[]]
+
+  __slots__ = ('clauses', 'token', 'guild_scoped', 'channel_scoped')
+
+  clauses: Tuple[CompiledClause, ...]
+  token: int
+  guild_scoped: bool
+  channel_scoped: bool
+
+  def __init__(self, *gates: Union[PermissionGate, Sequence[PermissionGate]]) -> None:
+    """
+    Compiles permission gates and clauses of permission gates
+
+    Unclaused permission gates are treated as one clause
+
+    Parameters
+    ----------
+    :param gates: Permission gates or clauses of permission gates
+    """
+    ungrouped: List[PermissionGate] = []
+    grouped: List[CompiledClause] = []
 
     # Separate grouped and ungrouped
     for gate in gates:
       if isinstance(gate, Sequence):
-        grouped.append(list(gate))
+        grouped.append(CompiledClause(gate))
       else:
-        grouped[0].append(gate)
-
-    # Validate
-    for gate in grouped:
-      if len(gate) > 0:
-        passFlag = _validate_group(ctx, gate)
-        if not passFlag:
-          return False
-      
+        ungrouped.append(gate)
+
+    self.clauses = tuple(
+      clause for clause in [CompiledClause(ungrouped), *grouped]
+      if len(clause) > 0
+    )
+
+    # Decisions only vary by guild or channel when a gate reads them
+    queries = {gate.query for clause in self.clauses for gate in (*clause.required, *clause.optional)}
+    self.token = next(_clause_tokens)
+    self.guild_scoped = bool(queries - {'is_developer'})
+    self.channel_scoped = 'in_channel' in queries
+
+  def validate(self, __ctx: Union[discord.Interaction, commands.Context], cached: bool = True, command: Any = None) -> bool:
+    """
+    Validates a members access to a command
+
+    Parameters
+    ----------
+    :param __ctx: Command Context [legacy and app command supported]
+    :param cached: Whether to read and store the decision in the decision cache
+    :param command: The command being checked, names the check when tracing
+    """
+    try:
+      ctx = HybridContext(__ctx)
+      if check_tracer.enabled:
+        return self._trace(ctx, cached, getattr(command, 'qualified_name', '-'))
+      if not cached:
+        return self._evaluate(ctx)
+
+      key = self._key(ctx)
+      decision = decision_cache.get(key)
+      if decision is None:
+        decision = self._evaluate(ctx)
+        decision_cache.set(key, decision)
+      return decision
+    except Exception as e:
+      raise commands.CheckFailure(f'{e}') from e
+
+  def _key(self, ctx: HybridContext) -> _DecisionKey:
+    return (
+      self.token,
+      ctx.author.id,
+      ctx.guild.id if (self.guild_scoped and ctx.guild) else None,
+      ctx.channel.id if (self.channel_scoped and ctx.channel) else None,
+      # Every message and interaction carries the author's current roles
+      hash(bytes(getattr(ctx.author, '_roles', b'')))
+    )
+
+  def _evaluate(self, ctx: HybridContext) -> bool:
+    for clause in self.clauses:
+      if not clause.evaluate(ctx):
+        return False
     return True
+
+  def _trace(self, ctx: HybridContext, cached: bool, command: str) -> bool:
+    start = time.perf_counter()
+    key = self._key(ctx) if cached else None
+    decision = decision_cache.get(key) if key is not None else None
+    hit = decision is not None
+
+    if decision is None:
+      decision = True
+      for index, clause in enumerate(self.clauses):
+        if not clause.trace(ctx, command):
+          decision = False
+          check_tracer.skip(command, (gate for skipped in self.clauses[index + 1:] for gate in (*skipped.required, *skipped.optional)))
+          break
+      if key is not None:
+        decision_cache.set(key, decision)
+
+    check_tracer.check(command, decision, time.perf_counter() - start, hit)
+    return decision
+
+
+
+def _validate_group(ctx: HybridContext, group: List[PermissionGate]) -> bool:
+  clause = CompiledClause(group)
+  return clause.trace(ctx, '-') if check_tracer.enabled else clause.evaluate(ctx)
+
+
+def validate(__ctx: Union[discord.Interaction, commands.Context], *gates: Union[PermissionGate, Sequence[PermissionGate]]) -> bool:
+  """
+  Validates a members access to a command
+
+  Prefer compiling gates once with `CompiledClauses` when validating repeatedly
+
+  Parameters
+  ----------
+  :param __ctx: Command Context [legacy and app command supported]
+  :param gates: List of permission gates
+  """
+  try:
+    compiled = CompiledClauses(*gates)
   except Exception as e:
     raise commands.CheckFailure(f'{e}') from e
+  return compiled.validate(__ctx, cached = False)
 
 
 class Protected:
@@ -163,8 +779,9 @@ class Protected:
     ----------
     :param *: Permission gates or clausees of permission gates
     """
+    compiled = CompiledClauses(*clauses)
     async def predicate(interaction):
-      return validate(interaction, *clauses)
+      return _effective(compiled, interaction.guild, interaction.command).validate(interaction, command = interaction.command)
     return app_commands.check(predicate)
   
   @staticmethod
@@ -179,8 +796,9 @@ class Protected:
     ----------
     :param *: Permission gates or clausees of permission gates
     """
+    compiled = CompiledClauses(*clauses)
     def predicate(ctx):
-     return validate(ctx, *clauses)
+     return _effective(compiled, ctx.guild, ctx.command).validate(ctx, command = ctx.command)
     return commands.check(predicate)
 
 
@@ -0,0 +1,419 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import itertools
+import discord
+from discord.http import Route
+from discord.ext import commands
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .config import Config
+from .outbound import ScheduledReplies
+from .session import SessionResume
+from .shutdown import DrainingCommands, on_stop_signal
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+Envelope = Dict[str, Any]
+
+# Lines carry whole JSON messages, stats of large clusters can exceed the default limit
+_LINE_LIMIT = 2**20
+
+
+def shard_options() -> Dict[str, Any]:
+  """Builds the client's sharding options from the configuration"""
+  if not Config.SHARDED:
+    return {}
+  options: Dict[str, Any] = {'shard_count': Config.SHARD_COUNT}
+  if Config.SHARD_IDS is not None:
+    options['shard_ids'] = list(Config.SHARD_IDS)
+  return options
+
+def cluster_shards(shard_count: int, clusters: int) -> List[List[int]]:
+  """
+  Splits shards into clusters round-robin
+
+  With fewer shards than clusters the extra clusters are left out, a worker
+  without shard IDs would run every shard
+
+  Parameters
+  ----------
+  :param shard_count: Total number of shards
+  :param clusters: Number of clusters
+  """
+  return [list(range(cluster, shard_count, clusters)) for cluster in range(min(clusters, shard_count))]
+
+
+async def _send(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+  writer.write(json.dumps(message).encode() + b'\n')
+  await writer.drain()
+
+
+class ClusterLink:
+  """
+  A worker's connection to the launcher
+
+  Broadcasts run on every cluster, this one included, and return each
+  cluster's result or error. Without a launcher, broadcasts only run
+  locally so that callers need no separate single-process path.
+  """
+
+  cluster_id: int
+  path: Optional[str]
+  handlers: Dict[str, Handler]
+  _writer: Optional[asyncio.StreamWriter]
+  _listener: Optional[asyncio.Task]
+  _waiters: Dict[str, asyncio.Future]
+  _counter: 'itertools.count[int]'
+
+  def __init__(self, cluster_id: int = 0, path: Optional[str] = None) -> None:
+    """
+    Initializes a ClusterLink
+
+    Parameters
+    ----------
+    :param cluster_id: This worker's cluster
+    :param path: The launcher's socket, None when running without one
+    """
+    self.cluster_id = cluster_id
+    self.path = path
+    self.handlers = {}
+    self._writer = None
+    self._listener = None
+    self._waiters = {}
+    self._counter = itertools.count(1)
+
+  @property
+  def connected(self) -> bool:
+    return self._writer is not None and not self._writer.is_closing()
+
+  def register(self, op: str, handler: Handler) -> None:
+    """
+    Answers broadcasts of an operation
+
+    Parameters
+    ----------
+    :param op: The operation name
+    :param handler: Coroutine called with the broadcast's arguments, returning a JSON-serializable result
+    """
+    self.handlers[op] = handler
+
+  def unregister(self, op: str) -> None:
+    self.handlers.pop(op, None)
+
+
+  async def connect(self) -> None:
+    """Connects to the launcher, if there is one"""
+    if not self.path or self.connected:
+      return
+    reader, self._writer = await asyncio.open_unix_connection(self.path, limit = _LINE_LIMIT)
+    await _send(self._writer, {'type': 'hello', 'cluster': self.cluster_id})
+    self._listener = asyncio.create_task(self._listen(reader))
+
+  async def close(self) -> None:
+    if self._listener:
+      self._listener.cancel()
+    if self._writer:
+      self._writer.close()
+    self._writer = None
+    for waiter in self._waiters.values():
+      waiter.cancel()
+
+  async def _listen(self, reader: asyncio.StreamReader) -> None:
+    try:
+      while line := await reader.readline():
+        message = json.loads(line)
+        if message['type'] == 'request':
+          asyncio.create_task(self._answer(message))
+        elif (waiter := self._waiters.pop(message['id'], None)) and not waiter.done():
+          waiter.set_result(message)
+    except ConnectionError:
+      pass
+
+    logger.warning('Cluster %d lost its connection to the launcher', self.cluster_id)
+    self._writer = None
+    # Nothing answers pending requests anymore, identifies fall back to running locally
+    for waiter in self._waiters.values():
+      if not waiter.done():
+        waiter.set_exception(ConnectionError('Lost the connection to the launcher'))
+
+  async def _answer(self, message: Dict[str, Any]) -> None:
+    envelope = await self.run(message['op'], message['args'])
+    if self.connected:
+      await _send(self._writer, {'type': 'reply', 'id': message['id'], 'cluster': self.cluster_id, **envelope}) # type: ignore
+
+  async def _request(self, message: Dict[str, Any], timeout: Optional[float]) -> Dict[str, Any]:
+    id = message['id'] = f'{self.cluster_id}:{next(self._counter)}'
+    waiter = self._waiters[id] = asyncio.get_running_loop().create_future()
+    try:
+      await _send(self._writer, message) # type: ignore
+      return await asyncio.wait_for(waiter, timeout)
+    finally:
+      self._waiters.pop(id, None)
+
+
+  async def run(self, op: str, args: List[Any]) -> Envelope:
+    """
+    Runs an operation's handler on this cluster
+
+    Parameters
+    ----------
+    :param op: The operation name
+    :param args: Arguments passed to the handler
+    """
+    handler = self.handlers.get(op)
+    if handler is None:
+      return {'error': f'Unknown operation {op}'}
+    try:
+      return {'result': await handler(*args)}
+    except Exception as error:
+      logger.exception('Cluster operation %s failed', op)
+      return {'error': f'{type(error).__name__}: {error}'}
+
+  async def broadcast(self, op: str, *args: Any, timeout: float = 10) -> Dict[int, Envelope]:
+    """
+    Runs an operation on every cluster, returns each cluster's result or error
+
+    Parameters
+    ----------
+    :param op: The operation name
+    :param args: JSON-serializable arguments passed to every handler
+    :param timeout: Seconds other clusters have to answer, clusters that do not are left out
+    """
+    local = asyncio.ensure_future(self.run(op, list(args)))
+    results: Dict[int, Envelope] = {}
+    if self.connected:
+      try:
+        response = await self._request({'type': 'broadcast', 'op': op, 'args': list(args), 'timeout': timeout}, timeout + 1)
+        results = {int(cluster): envelope for cluster, envelope in response['results'].items()}
+      except asyncio.TimeoutError:
+        logger.warning('Broadcast %s timed out', op)
+      except ConnectionError:
+        logger.warning('Broadcast %s lost the launcher, only ran locally', op)
+
+    results[self.cluster_id] = await local
+    return dict(sorted(results.items()))
+
+  async def identify(self, shard_id: int) -> None:
+    """
+    Waits until the launcher allows a shard to identify, raises ConnectionError when the launcher is lost
+
+    Parameters
+    ----------
+    :param shard_id: The shard about to identify
+    """
+    await self._request({'type': 'identify', 'shard': shard_id}, None)
+
+
+class ClusterHub:
+  """
+  The launcher's side of the cluster IPC channel
+
+  Relays broadcasts between workers over a Unix socket and spaces out
+  identifies so that shards of different processes sharing an identify
+  bucket do not exceed Discord's limit
+  """
+
+  path: str
+  max_concurrency: int
+  identify_interval: float
+  _server: Optional[asyncio.AbstractServer]
+  _writers: Dict[int, asyncio.StreamWriter]
+  _pending: Dict[str, Tuple[int, Set[int], Dict[str, Envelope], 'asyncio.Task[None]']]
+  _buckets: Dict[int, float]
+
+  def __init__(self, path: str, max_concurrency: int = 1, identify_interval: float = 5) -> None:
+    """
+    Initializes a ClusterHub
+
+    Parameters
+    ----------
+    :param path: Socket path workers connect to
+    :param max_concurrency: Discord's identify concurrency for the bot
+    :param identify_interval: Seconds between identifies of the same bucket
+    """
+    self.path = path
+    self.max_concurrency = max(max_concurrency, 1)
+    self.identify_interval = identify_interval
+    self._server = None
+    self._writers = {}
+    self._pending = {}
+    self._buckets = {}
+
+  async def start(self) -> None:
+    self._server = await asyncio.start_unix_server(self._serve, self.path, limit = _LINE_LIMIT)
+
+  async def close(self) -> None:
+    if self._server:
+      self._server.close()
+      await self._server.wait_closed()
+    for writer in self._writers.values():
+      writer.close()
+    if os.path.exists(self.path):
+      os.unlink(self.path)
+
+  async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    hello = json.loads(await reader.readline() or '{}')
+    if hello.get('type') != 'hello':
+      writer.close()
+      return
+
+    cluster = hello['cluster']
+    self._writers[cluster] = writer
+    try:
+      while line := await reader.readline():
+        await self._handle(cluster, json.loads(line))
+    finally:
+      if self._writers.get(cluster) is writer:
+        del self._writers[cluster]
+      for id, (_, waiting, _, _) in list(self._pending.items()):
+        waiting.discard(cluster)
+        if not waiting:
+          await self._finish(id)
+
+  async def _handle(self, cluster: int, message: Dict[str, Any]) -> None:
+    match message['type']:
+      case 'broadcast':
+        targets = {other for other in self._writers if other != cluster}
+        expiry = asyncio.create_task(self._expire(message['id'], message['timeout']))
+        self._pending[message['id']] = (cluster, targets, {}, expiry)
+        request = {'type': 'request', 'id': message['id'], 'op': message['op'], 'args': message['args']}
+        for other in list(targets):
+          # A worker whose connection closed before its cleanup ran is not waited for
+          if not await self._relay(other, request):
+            targets.discard(other)
+        if not targets:
+          await self._finish(message['id'])
+
+      case 'reply':
+        pending = self._pending.get(message['id'])
+        if pending is None: return
+        _, waiting, results, _ = pending
+        results[str(cluster)] = {key: message[key] for key in ('result', 'error') if key in message}
+        waiting.discard(cluster)
+        if not waiting:
+          await self._finish(message['id'])
+
+      case 'identify':
+        asyncio.create_task(self._grant_identify(cluster, message))
+
+  async def _relay(self, cluster: int, message: Dict[str, Any]) -> bool:
+    # Returns whether the message was sent, the worker may have disconnected
+    writer = self._writers.get(cluster)
+    if writer is None:
+      return False
+    try:
+      await _send(writer, message)
+    except ConnectionError:
+      return False
+    return True
+
+  async def _expire(self, id: str, timeout: float) -> None:
+    await asyncio.sleep(timeout)
+    await self._finish(id)
+
+  async def _finish(self, id: str) -> None:
+    pending = self._pending.pop(id, None)
+    if pending is None: return
+    origin, _, results, expiry = pending
+    if expiry is not asyncio.current_task():
+      expiry.cancel()
+    await self._relay(origin, {'type': 'response', 'id': id, 'results': results})
+
+  async def _grant_identify(self, cluster: int, message: Dict[str, Any]) -> None:
+    bucket = message['shard'] % self.max_concurrency
+    now = time.monotonic()
+    allowed = max(self._buckets.get(bucket, now), now)
+    self._buckets[bucket] = allowed + self.identify_interval
+    await asyncio.sleep(allowed - now)
+    await self._relay(cluster, {'type': 'identified', 'id': message['id']})
+
+
+class ClusterIdentify:
+  """Routes identifies through the launcher when running as a cluster worker"""
+
+  async def before_identify_hook(self, shard_id: Optional[int], *, initial: bool = False) -> None:
+    if link.connected:
+      try:
+        await link.identify(shard_id or 0)
+        return
+      except ConnectionError:
+        logger.warning('Lost the launcher while shard %s waited to identify, identifying locally', shard_id)
+    await super().before_identify_hook(shard_id, initial = initial) # type: ignore
+
+class Bot(SessionResume, DrainingCommands, ClusterIdentify, ScheduledReplies, commands.Bot):
+  pass
+
+class ShardedBot(SessionResume, DrainingCommands, ClusterIdentify, ScheduledReplies, commands.AutoShardedBot):
+  pass
+
+
+link = ClusterLink(Config.CLUSTER_ID, Config.IPC_PATH)
+
+
+async def recommended_sharding() -> Tuple[int, int]:
+  """Returns Discord's recommended shard count and the bot's identify concurrency"""
+  http = discord.http.HTTPClient(asyncio.get_running_loop())
+  try:
+    await http.static_login(Config.BOT_TOKEN) # type: ignore
+    data = await http.request(Route('GET', '/gateway/bot'))
+  finally:
+    await http.close()
+  return data['shards'], data['session_start_limit']['max_concurrency']
+
+
+async def _worker(cluster: int, shard_ids: List[int], shard_count: int, path: str) -> None:
+  env = {
+    **os.environ,
+    'CLUSTER_ID': str(cluster),
+    'SHARD_COUNT': str(shard_count),
+    'SHARD_IDS': ','.join(map(str, shard_ids)),
+    'IPC_PATH': path
+  }
+  while True:
+    # A session of its own keeps Ctrl+C from reaching the worker before the launcher terminates it
+    process = await asyncio.create_subprocess_exec(sys.executable, *sys.argv, env = env, start_new_session = True)
+    try:
+      code = await process.wait()
+    except asyncio.CancelledError:
+      process.terminate()
+      await process.wait()
+      raise
+
+    if code == 0:
+      return
+    logger.error('Cluster %d exited with code %d, restarting in 5s', cluster, code)
+    await asyncio.sleep(5)
+
+async def supervise() -> None:
+  """Runs each cluster of shards in its own worker process and relays IPC between them"""
+  if not Config.BOT_TOKEN:
+    raise Exception('No bot token')
+
+  from .logger import setup_logging, stop_logging
+  setup_logging(Config.LOG_LEVEL)
+
+  recommended, max_concurrency = await recommended_sharding()
+  shard_count = Config.SHARD_COUNT or max(recommended, Config.CLUSTERS)
+  path = os.path.join(tempfile.gettempdir(), f'thread-bot-{os.getpid()}.sock')
+  hub = ClusterHub(path, max_concurrency)
+  await hub.start()
+
+  clusters = cluster_shards(shard_count, Config.CLUSTERS)
+  logger.info('Launching %d shard(s) in %d cluster(s)', shard_count, len(clusters))
+  workers = asyncio.gather(*(_worker(cluster, shard_ids, shard_count, path) for cluster, shard_ids in enumerate(clusters)))
+
+  # Stopping terminates every worker, each drains before exiting
+  on_stop_signal(workers.cancel)
+  try:
+    await workers
+  except asyncio.CancelledError:
+    logger.info('Stopped %d cluster(s)', len(clusters))
+  finally:
+    await hub.close()
+    stop_logging()
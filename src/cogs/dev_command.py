@@ -1,5 +1,17 @@
+import logging
+import discord
 from discord.ext import commands
+from typing import Any, Dict, Literal
+from src.config import Config
 from src.check import Protected, PermissionPreset
+from src.cluster import link
+from src.command_sync import command_sync
+from src.timeline import timeline
+from src.logger import context_extra
+from src.utils import message_resolver
+
+logger = logging.getLogger(__name__)
+
 
 class DevCommands(commands.Cog, command_attrs = dict(hidden = True), group_extras = dict(hidden = True)):
   """hidden"""
@@ -13,37 +25,89 @@ class DevCommands(commands.Cog, command_attrs = dict(hidden = True), group_extra
 
   @commands.Cog.listener()
   async def on_ready(self):
-    print('Developer Commands UP')
+    logger.info('Developer Commands UP')
 
 
   @commands.command()
   @Protected.legacy(PermissionPreset.Developer)
-  async def syncSlashCommands(self, ctx: commands.Context):
+  async def syncSlashCommands(self, ctx: commands.Context, scope: Literal['global', 'guild'] = 'global', mode: Literal['changed', 'force', 'diff'] = 'changed'):
+    guild = None
+    if scope == 'guild':
+      guild = Config.DEV_GUILD_ID and discord.Object(Config.DEV_GUILD_ID) or ctx.guild
+      if guild is None:
+        await ctx.reply(f'{ctx.author.mention} No development guild configured')
+        return
+      command_sync.mirror(self.client.tree, guild)
+
     try:
-      Sync = await self.client.tree.sync()
-      print(f'Synced {len(Sync)} command(s)')
-      await ctx.reply(f'{ctx.author.mention} Synced {len(Sync)} command(s)')
-    except Exception as e:
-      print(e)
+      if mode == 'diff':
+        result = await command_sync.diff(self.client.tree, guild)
+        status = result and 'Would sync' or 'Unchanged'
+      else:
+        result = await command_sync.sync(self.client.tree, guild, force = mode == 'force')
+        status = result.synced and f'Synced {result.count} command(s)' or 'Unchanged, skipped sync'
+    except Exception:
+      logger.exception('Failed to sync slash commands', extra = context_extra(ctx))
+      return
+
+    await ctx.reply(f'{ctx.author.mention} [{result.scope}] {status}\n```diff\n{result.describe()}\n```')
+
+  async def manage_extension(self, ctx: commands.Context, action: str, extension: str):
+    # Every cluster runs the same extensions
+    results = await link.broadcast('extension', action, extension)
+    failures = {cluster: envelope['error'] for cluster, envelope in results.items() if 'error' in envelope}
+    if not failures:
+      await ctx.message.add_reaction('✅')
+      return
+
+    rows = '\n'.join(f'Cluster {cluster}: {error}' for cluster, error in failures.items())
+    await ctx.reply(f'{ctx.author.mention} Failed to {action} `{extension}` on {len(failures)}/{len(results)} cluster(s)\n```\n{rows}\n```')
 
   @commands.command()
   @Protected.legacy(PermissionPreset.Developer)
   async def load(self, ctx: commands.Context, extension):
-    await self.client.load_extension(f'.cogs.{extension}', package = 'src')
-    await ctx.message.add_reaction('✅')
+    await self.manage_extension(ctx, 'load', extension)
 
   @commands.command()
   @Protected.legacy(PermissionPreset.Developer)
   async def unload(self, ctx: commands.Context, extension):
-    await self.client.unload_extension(f'.cogs.{extension}', package = 'src')
-    await ctx.message.add_reaction('✅')
+    await self.manage_extension(ctx, 'unload', extension)
 
   @commands.command()
   @Protected.legacy(PermissionPreset.Developer)
   async def reload(self, ctx: commands.Context, extension):
-    await self.client.unload_extension(f'.cogs.{extension}', package = 'src')
-    await self.client.load_extension(f'.cogs.{extension}', package = 'src')
-    await ctx.message.add_reaction('✅')
+    await self.manage_extension(ctx, 'reload', extension)
+
+  @commands.command()
+  @Protected.legacy(PermissionPreset.Developer)
+  async def startup(self, ctx: commands.Context):
+    await ctx.reply(f'{ctx.author.mention}\n```\n{timeline.format()}\n```')
+
+  @commands.command()
+  @Protected.legacy(PermissionPreset.Developer)
+  async def clusters(self, ctx: commands.Context):
+    def describe(cluster: int, envelope: Dict[str, Any]) -> str:
+      if 'error' in envelope:
+        return f'{cluster:>3} | {envelope["error"]}'
+      stats = envelope['result']
+      latency = stats['latency'] is None and '-' or f'{stats["latency"] * 1000:.1f}ms'
+      return (
+        f'{cluster:>3} | shards {",".join(map(str, stats["shards"])):<12} | {stats["ready"] and "ready" or "starting"}'
+        f' | {stats["guilds"]:>6} guild(s) | {latency:>9} | {stats["commands"]:>7} command(s) | {stats["peak_rss"] / 1024:.1f} MiB'
+      )
+
+    results = await link.broadcast('stats')
+    table = '\n'.join(describe(cluster, envelope) for cluster, envelope in results.items())
+    await ctx.reply(f'{ctx.author.mention}\n```\n{table}\n```')
+
+  @commands.command()
+  @Protected.legacy(PermissionPreset.Developer)
+  async def messageCache(self, ctx: commands.Context):
+    stats = message_resolver.stats()
+    await ctx.reply(
+      f'{ctx.author.mention} {stats["hits"]} cache hit(s), {stats["fetches"]} fetch(es), '
+      f'{stats["negative_hits"]} negative hit(s) [{stats["hit_rate"]:.1%}], {stats["unknown"]} unknown ID(s) remembered'
+    )
   
 
 
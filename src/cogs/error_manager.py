@@ -1,10 +1,14 @@
+import logging
 import math
-import traceback
 import discord
 from discord.ext import commands
+from typing import Optional
 
-from src.utils import Error, Embeds
-from src.config import Config
+from src.utils import Error, Embeds, embed_templates
+from src.settings import settings
+from src.logger import context_extra
+
+logger = logging.getLogger(__name__)
 
 
 class ErrorManager(commands.Cog):
@@ -19,22 +23,24 @@ class ErrorManager(commands.Cog):
 
   @commands.Cog.listener()
   async def on_ready(self):
-    print('Error Manager UP')
+    logger.info('Error Manager UP')
 
   @commands.Cog.listener()
   async def on_command_error(self, ctx: commands.Context, error):
-    prefix = Config.COMMAND_PREFIX
-    embed = Embeds()
-    embed.color = discord.Color.dark_red()
+    prefix = settings.get(ctx.guild and ctx.guild.id).prefix
+    color = discord.Color.dark_red()
+    # Errors without per-call fields reuse a pre-rendered embed
+    embed: Optional[discord.Embed] = None
+    description: Optional[str] = None
 
     if isinstance(error, Error):
-      embed.description = error.description
+      embed = Embeds(color = color, description = error.description)
       for field in error.fields.values():
         field['inline'] = ('inline' in field) and field['inline'] or False
         embed.add_field(**field)
 
     elif isinstance(error, commands.CommandNotFound):
-      embed.description= f'Command not found! `{prefix}help` for a list of commands!'
+      description = f'Command not found! `{prefix}help` for a list of commands!'
 
     elif isinstance(error, commands.BotMissingPermissions):
       missing = [perm.replace('_', ' ').replace('guild', 'server').title() for perm in error.missing_permissions]
@@ -42,13 +48,13 @@ class ErrorManager(commands.Cog):
         fmt = '{}, and {}'.format("**, **".join(missing[:-1]), missing[-1])
       else:
         fmt = ' and '.join(missing)
-        embed.description = 'I need the **{}** permission(s) to run this command.'.format(fmt)
+        description = 'I need the **{}** permission(s) to run this command.'.format(fmt)
 
     elif isinstance(error, commands.DisabledCommand):
-      embed.description = 'The command has been disabled!'
+      description = 'The command has been disabled!'
 
     elif isinstance(error, commands.CommandOnCooldown):
-      embed.description = 'This command is on cooldown, please retry in {}s.'.format(math.ceil(error.retry_after))
+      description = 'This command is on cooldown, please retry in {}s.'.format(math.ceil(error.retry_after))
 
     elif isinstance(error, commands.MissingPermissions):
       missing = [perm.replace('_', ' ').replace('guild', 'server').title() for perm in error.missing_permissions]
@@ -56,7 +62,7 @@ class ErrorManager(commands.Cog):
         fmt = '{}, and {}'.format("**, **".join(missing[:-1]), missing[-1])
       else:
         fmt = ' and '.join(missing)
-        embed.description = 'You need the **{}** permission(s) to use this command.'.format(fmt)
+        description = 'You need the **{}** permission(s) to use this command.'.format(fmt)
 
     elif isinstance(error, commands.NoPrivateMessage):
       try:
@@ -65,10 +71,10 @@ class ErrorManager(commands.Cog):
         pass
 
     elif isinstance(error, commands.CheckFailure):
-      embed.description = 'You do not have permission to use this command!'
+      description = 'You do not have permission to use this command!'
 
     elif isinstance(error, commands.UserInputError):
-      embed.description = f'Invalid arguments! `{prefix}help` for a list of commands!'
+      embed = Embeds(color = color, description = f'Invalid arguments! `{prefix}help` for a list of commands!')
       embed.add_field(
         name = 'Invalid Arguments',
         value = error,
@@ -76,11 +82,12 @@ class ErrorManager(commands.Cog):
       )
 
     elif isinstance(error, commands.CommandError): # Custom Error
-      embed.description = str(error)
+      description = str(error)
 
+    if embed is None:
+      embed = embed_templates.embed(color = color, description = description)
     await ctx.reply(ctx.author.mention, embed = embed, ephemeral = True)
-    print(error)
-    traceback.print_exc()
+    logger.error('%s in [%s]: %s', type(error).__name__, ctx.command and ctx.command.qualified_name or '-', error, exc_info = error, extra = context_extra(ctx))
 
 
 
@@ -1,9 +1,173 @@
+import logging
+import copy
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from src.utils import Embeds, Error, ViewPageScroller
-from typing import Optional, List
+from src.utils import Embeds, Error, ViewPageScroller, StatelessPageScroller, SearchIndex
+from src.config import Config
+from src.cooldown import cooldown
+from typing import Optional, List, Dict, Tuple, Iterable
+
+logger = logging.getLogger(__name__)
+
+
+# Cog name and the (qualified name, help) of each command on the page
+HelpPage = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+def _is_hidden_doc(doc: Optional[str]) -> bool:
+  return str(doc).startswith('hidden')
+
+
+class HelpEntry:
+  """
+  Help data of a command, precomputed when its cog is indexed
+  """
+
+  __slots__ = ('command', 'qualified_name', 'lower_name', 'lower_aliases', 'help', 'hidden')
+
+  command: commands.Command
+  qualified_name: str
+  lower_name: str
+  lower_aliases: Tuple[str, ...]
+  help: str
+  hidden: bool
+
+  def __init__(self, command: commands.Command) -> None:
+    """
+    Indexes a command
+
+    Parameters
+    ----------
+    :param command: The command
+    """
+    self.command = command
+    self.qualified_name = command.qualified_name
+    self.lower_name = command.qualified_name.lower().strip()
+    self.lower_aliases = tuple(alias.lower() for alias in command.aliases)
+    self.help = str(command.help).strip()
+    self.hidden = command.hidden or _is_hidden_doc(command.help)
+
+
+class HelpCogEntry:
+  """
+  Help data of a cog and its visible commands
+  """
+
+  __slots__ = ('cog', 'name', 'lower_name', 'hidden', 'commands')
+
+  cog: commands.Cog
+  name: str
+  lower_name: str
+  hidden: bool
+  commands: Tuple[HelpEntry, ...]
+
+  def __init__(self, name: str, cog: commands.Cog) -> None:
+    """
+    Indexes a cog
+
+    Parameters
+    ----------
+    :param name: The cog's name
+    :param cog: The cog
+    """
+    self.cog = cog
+    self.name = name
+    self.lower_name = name.lower()
+    self.hidden = _is_hidden_doc(cog.__doc__)
+    self.commands = tuple(
+      entry for entry in (HelpEntry(command) for command in cog.walk_commands())
+      if not entry.hidden
+    )
+
+
+class HelpIndex:
+  """
+  In-memory index of the help menu
+
+  Only rebuilt for cogs that were added, removed or reloaded, so that
+  queries only pay for the per-user permission filter
+  """
+
+  client: commands.Bot
+  cogs: Dict[str, HelpCogEntry]
+  names: SearchIndex
+
+  def __init__(self, client: commands.Bot) -> None:
+    """
+    Initializes a HelpIndex
+
+    Parameters
+    ----------
+    :param client: The bot whose cogs are indexed
+    """
+    self.client = client
+    self.cogs = {}
+    self.names = SearchIndex()
+    self.sync()
+
+  def sync(self) -> bool:
+    """
+    Re-indexes cogs that changed since the last sync
+
+    Returns whether anything changed
+    """
+    changed = False
+    cogs: Dict[str, HelpCogEntry] = {}
+    for name, cog in self.client.cogs.items():
+      entry = self.cogs.get(name)
+      if not entry or entry.cog is not cog:
+        entry = HelpCogEntry(name, cog)
+        changed = True
+      cogs[name] = entry
+
+    changed = changed or (len(cogs) != len(self.cogs))
+    self.cogs = cogs
+    if changed:
+      self.names = SearchIndex([
+        *(entry.name for entry in self.visible),
+        *(
+          name
+          for entry in self.cogs.values()
+          for command in entry.commands if not command.command.parent
+          for name in (*command.command.aliases, command.command.name)
+        )
+      ])
+    return changed
+
+  @property
+  def visible(self) -> Iterable[HelpCogEntry]:
+    """Cogs shown in the help menu"""
+    return (entry for entry in self.cogs.values() if not entry.hidden)
+
+  def search(self, query: Optional[str] = None) -> List[Tuple[HelpCogEntry, List[HelpEntry]]]:
+    """
+    Returns the commands matching a query, grouped by cog
+
+    A query equal to a cog's name selects that cog, otherwise commands
+    whose qualified name contains the query are selected
+
+    Parameters
+    ----------
+    :param query: Module's or Command's name
+    """
+    if not query:
+      return [(entry, list(entry.commands)) for entry in self.visible]
+
+    query = query.lower().strip()
+    results: List[Tuple[HelpCogEntry, List[HelpEntry]]] = []
+    for entry in self.visible:
+      if query == entry.lower_name:
+        results.append((entry, list(entry.commands)))
+        break
+
+      matched = [command for command in entry.commands if query in command.lower_name]
+      if matched:
+        results.append((entry, matched))
+    return results
+
 
 
 class Help(commands.Cog):
@@ -12,16 +176,88 @@ class Help(commands.Cog):
   """
 
   client: commands.Bot
+  index: HelpIndex
+  page_limit: int = 1
 
 
   def __init__(self, client: commands.Bot):
     self.client = client
     client.remove_command('help')
+    self.index = HelpIndex(client)
 
 
   @commands.Cog.listener()
   async def on_ready(self):
-    print('Help command UP')
+    self.index.sync()
+    logger.info('Help command UP')
+
+  @commands.Cog.listener()
+  async def on_cogs_changed(self):
+    self.index.sync()
+
+
+  async def cog_load(self):
+    StatelessPageScroller.register('help', self.build_pages, self.load_page)
+
+  async def cog_unload(self):
+    StatelessPageScroller.unregister('help')
+
+
+  async def _runnable(self, ctx: commands.Context, entries: List[HelpEntry]) -> List[bool]:
+    async def can_run(entry: HelpEntry) -> bool:
+      try:
+        # Each check gets its own context as can_run swaps ctx.command while checking
+        return await entry.command.can_run(copy.copy(ctx))
+      except commands.CommandError:
+        return False
+
+    return await asyncio.gather(*(can_run(entry) for entry in entries))
+
+  async def build_pages(self, ctx: commands.Context, query: Optional[str] = None) -> List[HelpPage]:
+    """
+    Builds the help pages visible to the context's author
+
+    Parameters
+    ----------
+    :param ctx: The command context
+    :param query: Module's or Command's name
+    """
+    matched = self.index.search(query)
+    allowed = iter(await self._runnable(ctx, [entry for _, entries in matched for entry in entries]))
+
+    pages: List[HelpPage] = []
+    for cog, entries in matched:
+      fields = [(entry.qualified_name, entry.help) for entry in entries if next(allowed)]
+      for i in range(0, len(fields), self.page_limit):
+        pages.append((cog.name, tuple(fields[i:i + self.page_limit])))
+    return pages
+
+  def load_page(self, data: HelpPage) -> discord.Embed:
+    """
+    Renders a help page
+
+    Parameters
+    ----------
+    :param data: The cog name and the commands on the page
+    """
+    if not self.client.user:
+      raise Error('Client not logged in!')
+
+    embed = Embeds(
+      title = 'Commands',
+      description = f'Use `/help <module>` or `/help <command>` for more information about that module or command\n\n**{data[0]}\'s commands**\n\u200d'
+    )
+    embed.color = discord.Color.blurple()
+    embed.set_author(name = self.client.user.name, icon_url = self.client.user.display_avatar)
+
+    for name, text in data[1]:
+      embed.add_field(
+        name = f'/{name}',
+        value = f'{text}\n‍',
+        inline = False
+      )
+
+    return embed
 
 
   @commands.hybrid_command(
@@ -33,7 +269,7 @@ class Help(commands.Cog):
   @app_commands.describe(
     query = 'Module\'s or Command\'s name'
   )
-  @commands.cooldown(1, 15, commands.BucketType.user)
+  @cooldown(1, 15, commands.BucketType.user)
   async def help(self, ctx: commands.Context, *, query: Optional[str] = None):
     """
     **Help command of the bot**
@@ -49,86 +285,23 @@ class Help(commands.Cog):
     /help ping
     ```
     """
-    embed_data: dict[str, list[list]] = {}
-    page_limit = 1
-
-    async def load_cog_commands(cog, cmds):
-      if str(self.client.cogs[cog].__doc__).startswith('hidden'): return
-      if not cog in embed_data:
-        embed_data[cog] = [[]]
+    query = query and ''.join(query)
+    pages = await self.build_pages(ctx, query)
 
-      for i in cmds:
-        if i.hidden or str(i.help).startswith('hidden') or not await i.can_run(ctx): continue
-        if len(embed_data[cog][-1]) >= page_limit:
-          embed_data[cog].append([i])
-        else:
-          embed_data[cog][-1].append(i)
-
-    
-    if not query:
-      for cogname in self.client.cogs:
-        if str(self.client.cogs[cogname].__doc__).startswith('hidden'): continue # Skip hidden cogs
-
-        cog = self.client.get_cog(cogname)
-        if cog:
-          await load_cog_commands(cogname, cog.walk_commands())
-
-    else:
-      query = ''.join(query)
-      for cogname in self.client.cogs:
-        if query.lower() == cogname.lower() and not str(self.client.cogs[cogname].__doc__).startswith('hidden'):
-          cog = self.client.get_cog(cogname)
-          if not cog: continue
-
-          await load_cog_commands(cogname, cog.walk_commands())
-          break
-
-        elif not str(self.client.cogs[cogname].__doc__).startswith('hidden'):
-          cog = self.client.get_cog(cogname)
-          if not cog: continue
-
-          for cmd in cog.walk_commands():
-            if query.lower().strip() in cmd.qualified_name.lower().strip():
-              await load_cog_commands(cogname, [cmd])
-
-
-    if not embed_data:
+    if not pages:
       raise Error(
         description = f'Unable to locate module or command' + ((query and f'[{query}]') or '')
       )
-    
-    else: #clean up
-      cleaned = []
-      for cogName, pages in embed_data.items():
-        for page in pages:
-          cleaned.append([cogName, list(page)])
-      
-
-    #Setup embed screen navigation
-    def load_page(data: tuple):
-      if not self.client.user:
-        raise Error('Client not logged in!')
-
-      embed = Embeds(
-        title = 'Commands',
-        description = f'Use `/help <module>` or `/help <command>` for more information about that module or command\n\n**{data[0]}\'s commands**\n\u200d'
-      )
-      embed.color = discord.Color.blurple()
-      embed.set_author(name = self.client.user.name, icon_url = self.client.user.display_avatar)
-
-      for i in data[1]:
-        embed.add_field(
-          name = f'/{i.qualified_name}',
-          value = f'{str(i.help).lstrip().rstrip()}\n‍',
-          inline = False
-        )
 
-      return embed
-      
+    key = query or ''
+    if Config.STATELESS_PAGINATION and StatelessPageScroller.fits('help', key):
+      await StatelessPageScroller.send_message(ctx, 'help', key, pages)
+      return
+
     scroll_embed = ViewPageScroller(
       ownerid = ctx.author.id,
-      load_page = load_page,
-      pages = cleaned,
+      load_page = self.load_page,
+      pages = pages,
       timeout = 180
     )
 
@@ -137,19 +310,10 @@ class Help(commands.Cog):
 
   @help.autocomplete('query')
   async def help_autocomplete(self, ctx, current: str) -> List[app_commands.Choice[str]]:
-    data = []
-    command_names = []
-    for i in self.client.commands:
-      if i.hidden or str(i.help).startswith('hidden'): continue
-      command_names += list(i.aliases) + [i.name]
-
-    for name in [cog for cog in self.client.cogs if not str(self.client.cogs[cog].__doc__).startswith('hidden')] + command_names:
-      if current.lower() in name.lower():
-        data.append(app_commands.Choice(
-          name = name,
-          value = name
-        ))
-    return data[0:24]
+    return [
+      app_commands.Choice(name = name, value = name)
+      for name in self.index.names.search(current, limit = 24)
+    ]
 
 
 async def setup(client):
@@ -1,9 +1,195 @@
+import logging
+import time
+import asyncio
+import functools
 import discord
+from collections import deque
 from discord.ext import commands
-from typing import Optional
+from typing import Any, Optional, Callable, Awaitable, List, Deque, Dict, Tuple
 
 from src.utils import Embeds, Error
-from src.config import Config
+from src.settings import settings
+from src.outbound import outbound, Priority
+from src.shutdown import drain
+
+logger = logging.getLogger(__name__)
+
+
+class WelcomeQueue:
+  """
+  Batches welcome messages during join floods
+
+  Joins arriving within `window` seconds are welcomed in one message
+  mentioning up to `batch_size` members, sends are limited to `rate`
+  messages every `per` seconds, and a backlog above `summary_threshold`
+  is folded into a single summary
+  """
+
+  window: float
+  batch_size: int
+  rate: int
+  per: float
+  summary_threshold: int
+
+  sent: int
+  welcomed: int
+  summarized: int
+  max_depth: int
+  latencies: Deque[float]
+
+  _send_message: Callable[..., Awaitable[Any]]
+  _pending: Deque[Tuple[discord.Member, float]]
+  _sends: Deque[float]
+  _channel: Optional[Any]
+  _worker: Optional['asyncio.Task[None]']
+
+  def __init__(
+    self,
+    resolve_channel: Callable[[], Optional[Any]],
+    rule_channel: Callable[[], Optional[int]] = lambda: None,
+    send: Optional[Callable[..., Awaitable[Any]]] = None,
+    *,
+    window: float = 2,
+    batch_size: int = 10,
+    rate: int = 5,
+    per: float = 5,
+    summary_threshold: int = 50
+  ) -> None:
+    """
+    Initializes a WelcomeQueue
+
+    Parameters
+    ----------
+    :param resolve_channel: Returns the welcome channel, only called until it resolves
+    :param rule_channel: Returns the ID of the channel new members are pointed to
+    :param send: Sends a message to a channel, defaults to sending it directly
+    :param window: Seconds to wait for more joins before sending
+    :param batch_size: Members mentioned per message
+    :param rate: Messages allowed per `per` seconds
+    :param per: Length of the rate budget window in seconds
+    :param summary_threshold: Backlog size above which joins are summarized
+    """
+    self.window = window
+    self.batch_size = batch_size
+    self.rate = rate
+    self.per = per
+    self.summary_threshold = summary_threshold
+
+    self.sent = 0
+    self.welcomed = 0
+    self.summarized = 0
+    self.max_depth = 0
+    self.latencies = deque(maxlen = 1000)
+
+    self._resolve_channel = resolve_channel
+    self._rule_channel = rule_channel
+    self._send_message = send or (lambda channel, *args, **kwargs: channel.send(*args, **kwargs))
+    self._pending = deque()
+    self._sends = deque()
+    self._channel = None
+    self._worker = None
+
+  @property
+  def depth(self) -> int:
+    """Members waiting to be welcomed"""
+    return len(self._pending)
+
+  def push(self, member: discord.Member) -> None:
+    """
+    Queues a member to be welcomed
+
+    Parameters
+    ----------
+    :param member: The member that joined
+    """
+    self._pending.append((member, time.monotonic()))
+    self.max_depth = max(self.max_depth, len(self._pending))
+    if not self._worker or self._worker.done():
+      self._worker = asyncio.create_task(self._run())
+
+  async def join(self) -> None:
+    """Waits until every queued member has been welcomed"""
+    while self._worker and not self._worker.done():
+      await asyncio.wait({self._worker})
+
+  def close(self) -> None:
+    """Stops the worker, queued members are dropped"""
+    if self._worker:
+      self._worker.cancel()
+
+  def channel(self) -> Optional[Any]:
+    """Returns the welcome channel, resolving it once"""
+    if self._channel is None:
+      self._channel = self._resolve_channel()
+    return self._channel
+
+  def reset_channel(self) -> None:
+    """Resolves the welcome channel again on the next send"""
+    self._channel = None
+
+  async def _acquire(self) -> None:
+    while True:
+      now = time.monotonic()
+      while self._sends and self._sends[0] <= now - self.per:
+        self._sends.popleft()
+      if len(self._sends) < self.rate:
+        self._sends.append(now)
+        return
+      await asyncio.sleep(self._sends[0] + self.per - now)
+
+  async def _run(self) -> None:
+    while self._pending:
+      await asyncio.sleep(self.window)
+      channel = self.channel()
+      if channel is None:
+        logger.warning('No welcome channel in guild [%s], dropping %d join(s)', self._pending[0][0].guild.id, len(self._pending))
+        self._pending.clear()
+        return
+
+      if len(self._pending) > self.summary_threshold:
+        batch = [self._pending.popleft() for _ in range(len(self._pending))]
+        await self._send(channel, batch[:self.batch_size], len(batch) - self.batch_size)
+        continue
+
+      while self._pending:
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        await self._send(channel, batch)
+        if len(self._pending) > self.summary_threshold:
+          break
+
+  async def _send(self, channel: Any, batch: List[Tuple[discord.Member, float]], others: int = 0) -> None:
+    await self._acquire()
+    members = [member for member, _ in batch]
+
+    if len(members) == 1 and not others:
+      title = members[0].global_name
+    else:
+      title = f'{len(members) + others} new members'
+    description = '**Welcome to the server!** 🎉'
+    rule_channel_id = self._rule_channel()
+    if rule_channel_id:
+      description += f'\n\nDon\'t forget to `git checkout `<#{rule_channel_id}>'
+    if others:
+      description += f'\n\n*...and {others} more members joined*'
+
+    try:
+      await self._send_message(channel, ' '.join(member.mention for member in members), embed = Embeds(
+        title = title,
+        description = description
+      ))
+    except discord.NotFound:
+      logger.warning('Welcome channel of guild [%s] is gone, dropping %d member(s)', members[0].guild.id, len(members) + others)
+      self._channel = None
+      return
+    except discord.HTTPException:
+      logger.warning('Failed to welcome %d member(s) in guild [%s]', len(members) + others, members[0].guild.id, exc_info = True)
+      return
+
+    now = time.monotonic()
+    self.sent += 1
+    self.welcomed += len(members)
+    self.summarized += others
+    self.latencies.extend(now - joined for _, joined in batch)
 
 
 class Invite(commands.Cog):
@@ -13,27 +199,63 @@ class Invite(commands.Cog):
   """
 
   client: commands.Bot
+  welcome_queues: Dict[int, WelcomeQueue]
   
 
   def __init__(self, client: commands.Bot) -> None:
     self.client = client
+    self.welcome_queues = {}
+    drain.register('welcome(s)', self.join_welcomes, lambda: sum(queue.depth for queue in self.welcome_queues.values()))
+
+  async def cog_unload(self) -> None:
+    drain.unregister('welcome(s)')
+    for queue in self.welcome_queues.values():
+      queue.close()
+
+  async def join_welcomes(self) -> None:
+    """Waits until every guild's queued members have been welcomed"""
+    await asyncio.gather(*(queue.join() for queue in self.welcome_queues.values()))
+
+
+  def welcome_queue(self, guild: discord.Guild) -> WelcomeQueue:
+    """Returns the welcome queue of a guild, creating it on its first join"""
+    queue = self.welcome_queues.get(guild.id)
+    if queue is None:
+      queue = self.welcome_queues[guild.id] = WelcomeQueue(
+        lambda: self.get_welcome_channel(guild.id),
+        lambda: settings.get(guild.id).rule_channel_id,
+        self.send_welcome
+      )
+    return queue
+
+  @staticmethod
+  async def send_welcome(channel: discord.TextChannel, *args, **kwargs) -> discord.Message:
+    # Welcomes never hold up command replies in the same channel
+    return await outbound.submit(channel.id, Priority.WELCOME, functools.partial(channel.send, *args, **kwargs))
+
+  def get_welcome_channel(self, guild_id: int) -> Optional[discord.TextChannel]:
+    channel_id = settings.get(guild_id).welcome_channel_id
+    guild = channel_id and self.client.get_guild(guild_id)
+    welcome_channel = guild and guild.get_channel(channel_id)
+    return isinstance(welcome_channel, discord.TextChannel) and welcome_channel or None
 
 
   @commands.Cog.listener()
   async def on_ready(self):
-    print('Invite Manager UP')
+    logger.info('Invite Manager UP')
 
 
   @commands.Cog.listener()
   async def on_member_join(self, member: discord.Member):
-    guild = self.client.get_guild(Config.GUILD_ID)
-    welcome_channel = guild and guild.get_channel(Config.WELCOME_CHANNEL_ID)
+    # A draining process leaves new joins to the instance replacing it
+    if drain.draining: return
+    self.welcome_queue(member.guild).push(member)
 
-    if welcome_channel and isinstance(welcome_channel, discord.TextChannel):
-      await welcome_channel.send(member.mention, embed = Embeds(
-        title = member.global_name,
-        description = f'**Welcome to the server!** 🎉\n\nDon\'t forget to `git checkout `<#{Config.RULE_CHANNEL_ID}>'
-      ))
+
+  @commands.Cog.listener()
+  async def on_guild_settings_update(self, guild_id: int):
+    queue = self.welcome_queues.get(guild_id)
+    queue and queue.reset_channel()
 
 
 async def setup(client: commands.Bot):
@@ -0,0 +1,111 @@
+import math
+import time
+import logging
+import discord
+from aiohttp import web
+from discord import app_commands
+from discord.http import Route
+from discord.ext import commands, tasks
+from typing import Optional
+
+from src.check import Protected, PermissionPreset
+from src.config import Config
+from src.metrics import metrics, command_started, command_completed
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsManager(commands.Cog, command_attrs = dict(hidden = True)):
+  """hidden
+
+  Collects command and gateway metrics and serves them on a local endpoint
+  """
+
+  client: commands.Bot
+  _runner: Optional[web.AppRunner]
+
+
+  def __init__(self, client: commands.Bot) -> None:
+    self.client = client
+    self._runner = None
+
+  async def cog_load(self) -> None:
+    self.sample_gateway.start()
+    self.sample_rest.start()
+
+    if Config.METRICS_PORT:
+      app = web.Application()
+      app.router.add_get('/metrics', self.serve_metrics)
+      self._runner = web.AppRunner(app, access_log = None)
+      await self._runner.setup()
+      await web.TCPSite(self._runner, '127.0.0.1', Config.METRICS_PORT).start()
+      logger.info('Serving metrics on 127.0.0.1:%d/metrics', Config.METRICS_PORT)
+
+  async def cog_unload(self) -> None:
+    self.sample_gateway.cancel()
+    self.sample_rest.cancel()
+    if self._runner:
+      await self._runner.cleanup()
+
+
+  async def serve_metrics(self, request: web.Request) -> web.Response:
+    return web.Response(text = metrics.render(), content_type = 'text/plain', charset = 'utf-8')
+
+
+  @tasks.loop(seconds = 5)
+  async def sample_gateway(self):
+    latencies = getattr(self.client, 'latencies', None) or [(self.client.shard_id, self.client.latency)]
+    for shard_id, latency in latencies:
+      if math.isfinite(latency):
+        metrics.observe_gateway(shard_id, latency)
+
+  @tasks.loop(seconds = 30)
+  async def sample_rest(self):
+    if not self.client.is_ready(): return
+    start = time.perf_counter()
+    try:
+      await self.client.http.request(Route('GET', '/gateway'))
+    except discord.HTTPException:
+      return
+    metrics.observe_rest(time.perf_counter() - start)
+
+
+  @commands.Cog.listener()
+  async def on_ready(self):
+    logger.info('Metrics Manager UP')
+
+  # Listeners instead of the bot's invoke hooks, which other code may need and unloading would leave behind
+  @commands.Cog.listener()
+  async def on_command(self, ctx: commands.Context):
+    command_started(ctx)
+
+  @commands.Cog.listener()
+  async def on_command_completion(self, ctx: commands.Context):
+    command_completed(ctx)
+
+  @commands.Cog.listener()
+  async def on_command_error(self, ctx: commands.Context, error: Exception):
+    metrics.observe_error(ctx.command and ctx.command.qualified_name or '-', error)
+
+  @commands.Cog.listener()
+  async def on_app_command_completion(self, interaction: discord.Interaction, command: app_commands.Command):
+    # Hybrid commands are already timed as commands
+    if isinstance(command, commands.hybrid.HybridAppCommand): return
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    metrics.observe_command(command.qualified_name, max(elapsed, 0))
+
+
+  @commands.command()
+  @Protected.legacy(PermissionPreset.Developer)
+  async def topCommands(self, ctx: commands.Context, count: int = 10):
+    rows = [
+      f'{name:<20} p99 {p99 * 1000:>9.1f}ms  p50 {metrics.latency[name].quantile(0.5) * 1000:>9.1f}ms  {calls:>7} call(s)'
+      for name, p99, calls in metrics.top(count)
+    ]
+    table = '\n'.join(rows) or 'No commands recorded'
+    await ctx.reply(f'{ctx.author.mention}\n```\n{table}\n```')
+
+
+
+async def setup(client: commands.Bot):
+  await client.add_cog(MetricsManager(client))
@@ -1,26 +1,47 @@
+import math
+import logging
 import emoji
 import discord
 from discord import app_commands
 from discord.ext import commands
-from typing import Optional
+from typing import List, Optional, Sequence
 
-from src.utils import Embeds, Error
-from src.config import Config
+from src.utils import Embeds, EmojiIndex, embed_templates, message_resolver
+from src.settings import settings
+from src.cooldown import cooldown
+from src.metrics import metrics, LatencyRing
+
+logger = logging.getLogger(__name__)
 
 
 class Misc(commands.Cog):
   """Miscellaneous commands"""
 
   client: commands.Bot
+  emojis: EmojiIndex
 
 
   def __init__(self, client):
     self.client = client
+    self.emojis = EmojiIndex()
 
 
   @commands.Cog.listener()
   async def on_ready(self):
-    print('Miscellaneous Commands UP')
+    logger.info('Miscellaneous Commands UP')
+
+  @commands.Cog.listener()
+  async def on_guild_emojis_update(self, guild: discord.Guild, before: Sequence[discord.Emoji], after: Sequence[discord.Emoji]):
+    self.emojis.update(guild, after)
+
+  @commands.Cog.listener()
+  async def on_guild_available(self, guild: discord.Guild):
+    # Emojis may have changed while the guild was unavailable
+    self.emojis.invalidate(guild.id)
+
+  @commands.Cog.listener()
+  async def on_guild_remove(self, guild: discord.Guild):
+    self.emojis.invalidate(guild.id)
 
 
   @commands.hybrid_command(
@@ -29,7 +50,7 @@ class Misc(commands.Cog):
     with_app_command = True,
     required = True
   )
-  @commands.cooldown(1, 15)
+  @cooldown(1, 15)
   async def ping(self, ctx: commands.Context):
     """
     **Calculates the bot's latency**
@@ -39,13 +60,29 @@ class Misc(commands.Cog):
     /ping
     ```
     """
-    replication_rate = 60
-    latency = sum([self.client.latency for _ in range(replication_rate)])/replication_rate
-    await ctx.reply(f'{ctx.author.mention}', embed = Embeds(
+    # AutoShardedBot has no shard_id and averages latency over its shards, each shard is observed instead
+    latencies = getattr(self.client, 'latencies', None) or [(self.client.shard_id, self.client.latency)]
+    for shard_id, shard_latency in latencies:
+      if math.isfinite(shard_latency):
+        metrics.observe_gateway(shard_id, shard_latency)
+    latency = dict(latencies).get(ctx.guild and ctx.guild.shard_id, self.client.latency)
+
+    embed = Embeds(
       title = 'Pong! :ping_pong:',
       description = f'{round(latency*1000, 2)}ms',
       color = discord.Color.purple()
-    ))
+    )
+
+    def describe(samples: LatencyRing) -> str:
+      return ' | '.join(f'{name} `{round(value*1000, 2)}ms`' for name, value in samples.summary().items())
+
+    sharded = len(metrics.gateway_samples) > 1
+    for shard_id, samples in sorted(metrics.gateway_samples.items(), key = lambda item: item[0] or 0):
+      embed.add_field(name = sharded and f'Gateway [Shard {shard_id}]' or 'Gateway', value = describe(samples), inline = False)
+    if len(metrics.rest_samples):
+      embed.add_field(name = 'REST', value = describe(metrics.rest_samples), inline = False)
+
+    await ctx.reply(f'{ctx.author.mention}', embed = embed)
 
 
   @commands.hybrid_command(
@@ -53,7 +90,7 @@ class Misc(commands.Cog):
     description = 'Returns the project links',
     with_app_command = True,
   )
-  @commands.cooldown(1, 10, commands.BucketType.channel)
+  @cooldown(1, 10, commands.BucketType.channel)
   async def links(self, ctx: commands.Context):
     """
     **Returns the project links**
@@ -63,7 +100,7 @@ class Misc(commands.Cog):
     /links
     ```
     """
-    await ctx.reply(ctx.author.mention, embed = Embeds(
+    await ctx.reply(ctx.author.mention, embed = embed_templates.embed(
       title = 'Project Links',
       description = f'[**Github Organization**](https://github.com/python-thread)\n[**Documentation**](https://thread.ngjx.org)'
     ))
@@ -76,7 +113,7 @@ class Misc(commands.Cog):
     required = True,
     aliases = ['prefix']
   )
-  @commands.cooldown(1, 15, commands.BucketType.channel)
+  @cooldown(1, 15, commands.BucketType.channel)
   async def getprefix(self, ctx: commands.Context):
     """
     **Returns the current in-use command prefix**
@@ -92,9 +129,9 @@ class Misc(commands.Cog):
     /getprefix
     ```
     """
-    await ctx.reply(ctx.author.mention, embed = Embeds(
+    await ctx.reply(ctx.author.mention, embed = embed_templates.embed(
       title = 'Prefix',
-      description = str(Config.COMMAND_PREFIX)
+      description = settings.get(ctx.guild and ctx.guild.id).prefix
     ))
 
 
@@ -109,7 +146,7 @@ class Misc(commands.Cog):
     reaction = 'What reaction you would like to add',
     messageid = 'Which message you would like to add to'
   )
-  @commands.cooldown(1, 5, commands.BucketType.user)
+  @cooldown(1, 5, commands.BucketType.user)
   async def addreaction(self, ctx: commands.Context, reaction: str, messageid: Optional[str] = None):
     """
     **Reacts to the message with specified reaction!**
@@ -130,19 +167,11 @@ class Misc(commands.Cog):
     if not ctx.guild or not ctx.message.guild: return
 
     if not emoji.is_emoji(reaction):
-      for emojiinfo in ctx.message.guild.emojis:
-        if emojiinfo.name == reaction:
-          reaction = emojiinfo.animated and f'<a:{emojiinfo.name}:{emojiinfo.id}>' or f'<:{emojiinfo.name}:{emojiinfo.id}>'
-          break
-
-    if messageid:
-      id = messageid.startswith('https:') and messageid.split('/')[len(messageid.split('/')) - 1] or messageid
-    elif isinstance(ctx.message.channel, discord.TextChannel):
-      id = str(ctx.message.channel.last_message_id)
-    else:
-      raise Error('Unsupported channel type')
-
-    message = await ctx.message.channel.fetch_message(int(id))
+      custom = self.emojis.get(ctx.message.guild, reaction)
+      if custom:
+        reaction = str(custom)
+
+    message = await message_resolver.resolve(ctx, messageid)
     await message.add_reaction(reaction)
 
     embed = Embeds(title = 'Success')
@@ -150,12 +179,20 @@ class Misc(commands.Cog):
     embed.add_field(name = "Emoji", value = f'`{reaction}`', inline = False)
     embed.add_field(
       name = "Message ID",
-      value = f'https://discord.com/channels/{ctx.guild.id}/{ctx.message.channel.id}/{id}',
+      value = message.jump_url,
       inline = False
     )
 
     await ctx.reply(ctx.author.mention, embed = embed, ephemeral = True)
 
+  @addreaction.autocomplete('reaction')
+  async def reaction_autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+    if not interaction.guild: return []
+    return [
+      app_commands.Choice(name = f':{custom.name}:', value = str(custom))
+      for custom in self.emojis.search(interaction.guild, current)
+    ]
+
 
 async def setup(client: commands.Bot):
   await client.add_cog(Misc(client))
@@ -0,0 +1,39 @@
+import logging
+import discord
+from discord.ext import commands
+
+from src.utils import StatelessPageScroller
+from src.shutdown import drain
+
+logger = logging.getLogger(__name__)
+
+
+class PageManager(commands.Cog):
+  """hidden
+
+  Handles the buttons of every stateless paginated message
+  """
+
+  client: commands.Bot
+
+
+  def __init__(self, client: commands.Bot) -> None:
+    self.client = client
+
+
+  @commands.Cog.listener()
+  async def on_ready(self):
+    logger.info('Page Manager UP')
+
+
+  @commands.Cog.listener()
+  async def on_interaction(self, interaction: discord.Interaction):
+    if interaction.type != discord.InteractionType.component: return
+    # Stateless pages are answered by the instance replacing a draining one
+    if drain.draining: return
+    await StatelessPageScroller.handle(interaction)
+
+
+
+async def setup(client: commands.Bot):
+  await client.add_cog(PageManager(client))
@@ -0,0 +1,120 @@
+import logging
+import discord
+from discord.ext import commands
+from typing import Literal
+
+from src.check import Protected, PermissionPreset, check_tracer, decision_cache, invalidate_resolved_roles
+
+logger = logging.getLogger(__name__)
+
+
+class PermissionCache(commands.Cog, command_attrs = dict(hidden = True)):
+  """hidden
+
+  Keeps cached permission decisions in sync with member, role and channel changes
+  """
+
+  client: commands.Bot
+
+
+  def __init__(self, client: commands.Bot) -> None:
+    self.client = client
+
+
+  @commands.Cog.listener()
+  async def on_ready(self):
+    logger.info('Permission Cache UP')
+
+
+  @commands.Cog.listener()
+  async def on_member_update(self, before: discord.Member, after: discord.Member):
+    if before.roles != after.roles:
+      decision_cache.invalidate_member(after.guild.id, after.id)
+
+  @commands.Cog.listener()
+  async def on_member_remove(self, member: discord.Member):
+    decision_cache.invalidate_member(member.guild.id, member.id)
+
+  @commands.Cog.listener()
+  async def on_guild_update(self, before: discord.Guild, after: discord.Guild):
+    # Guild gates match on the name, the owner holds every permission
+    if (before.name, before.owner_id) != (after.name, after.owner_id):
+      invalidate_resolved_roles(after.id)
+      decision_cache.invalidate_guild(after.id)
+
+  @commands.Cog.listener()
+  async def on_guild_role_create(self, role: discord.Role):
+    invalidate_resolved_roles(role.guild.id)
+    decision_cache.invalidate_guild(role.guild.id)
+
+  @commands.Cog.listener()
+  async def on_guild_role_update(self, before: discord.Role, after: discord.Role):
+    if (before.position, before.name, before.permissions) != (after.position, after.name, after.permissions):
+      invalidate_resolved_roles(after.guild.id)
+      decision_cache.invalidate_guild(after.guild.id)
+
+  @commands.Cog.listener()
+  async def on_guild_role_delete(self, role: discord.Role):
+    invalidate_resolved_roles(role.guild.id)
+    decision_cache.invalidate_guild(role.guild.id)
+
+  @commands.Cog.listener()
+  async def on_guild_channel_update(self, before: discord.abc.GuildChannel, after: discord.abc.GuildChannel):
+    decision_cache.invalidate_channel(after.id)
+
+  @commands.Cog.listener()
+  async def on_guild_remove(self, guild: discord.Guild):
+    invalidate_resolved_roles(guild.id)
+    decision_cache.invalidate_guild(guild.id)
+
+
+  @commands.command()
+  @Protected.legacy(PermissionPreset.Developer)
+  async def permissionCache(self, ctx: commands.Context):
+    stats = decision_cache.stats()
+    await ctx.reply(
+      f'{ctx.author.mention} {stats["size"]} cached decision(s), '
+      f'{stats["hits"]} hit(s), {stats["misses"]} miss(es) [{stats["hit_rate"]:.1%}]'
+    )
+
+  @commands.command()
+  @Protected.legacy(PermissionPreset.Developer)
+  async def checkTrace(self, ctx: commands.Context, action: Literal['show', 'on', 'off', 'reset'] = 'show', count: int = 5):
+    if action in ('on', 'off'):
+      check_tracer.enabled = action == 'on'
+      await ctx.reply(f'{ctx.author.mention} Permission check tracing {"enabled" if check_tracer.enabled else "disabled"}')
+      return
+    if action == 'reset':
+      check_tracer.reset()
+      await ctx.reply(f'{ctx.author.mention} Permission check traces cleared')
+      return
+
+    # One message per table, a table of at most 15 rows of 120 characters stays below the 2000 character limit
+    count = max(1, min(count, 15))
+    slowest = [
+      f'{command:<16} {gate:<36} mean {trace.mean_time * 1e6:>7.1f}us  max {trace.max_time * 1e6:>7.1f}us  {trace.calls:>6} call(s)'
+      for command, gate, trace in check_tracer.slowest(count)
+    ]
+    failed = [
+      f'{command:<16} {gate:<36} {trace.failures:>6} fail(s)  {trace.short_circuits:>6} decided  {trace.skipped:>6} skipped'
+      for command, gate, trace in check_tracer.most_failed(count)
+    ]
+    denied = [
+      f'{command:<16} {trace.denied:>6}/{trace.checks:<6} denied  {trace.cached:>6} cached  last {trace.last_denial or "-"}'
+      for command, trace in sorted(check_tracer.commands.items(), key = lambda item: item[1].denied, reverse = True)[:count]
+    ]
+    tables = (
+      ('Slowest gates', '\n'.join(slowest) or 'No gates recorded'),
+      ('Most failed gates', '\n'.join(failed) or 'No failures recorded'),
+      ('Denials', '\n'.join(denied) or 'No checks recorded')
+    )
+    state = 'on' if check_tracer.enabled else 'off'
+    await ctx.reply(f'{ctx.author.mention} Tracing is {state}')
+    for title, table in tables:
+      table = '\n'.join(row[:120] for row in table.splitlines())
+      await ctx.send(f'{title}\n```\n{table}\n```')
+
+
+
+async def setup(client: commands.Bot):
+  await client.add_cog(PermissionCache(client))
@@ -0,0 +1,148 @@
+import json
+import logging
+import discord
+from discord.ext import commands
+from typing import Optional
+
+from src.utils import Embeds, Error
+from src.check import Protected, PermissionPreset, CompiledClauses
+from src.cluster import link
+from src.settings import settings
+from src.logger import context_extra
+
+logger = logging.getLogger(__name__)
+
+
+class Settings(commands.Cog):
+  """Server settings commands"""
+
+  client: commands.Bot
+  prefix_limit: int = 5
+
+
+  def __init__(self, client: commands.Bot):
+    self.client = client
+
+
+  @commands.Cog.listener()
+  async def on_ready(self):
+    logger.info('Settings Commands UP')
+
+
+  async def apply(self, ctx: commands.Context, **changes) -> None:
+    if ctx.guild is None:
+      raise Error(description = 'Settings can only be changed within a server!')
+
+    await settings.update(ctx.guild.id, **changes)
+    # Every cluster re-reads the guild, including this one
+    await link.broadcast('settings', ctx.guild.id)
+    logger.info('Changed settings %s', ', '.join(changes), extra = context_extra(ctx))
+
+
+  @commands.hybrid_command(
+    name = 'setprefix',
+    description = 'Changes the command prefix of this server',
+    with_app_command = True
+  )
+  @commands.guild_only()
+  @Protected.legacy(PermissionPreset.Admin)
+  async def setprefix(self, ctx: commands.Context, prefix: Optional[str] = None):
+    """
+    **Changes the command prefix of this server**
+
+    Leave the prefix out to reset it
+
+    > **Example**
+    ```
+    /setprefix !
+    ```
+    """
+    if prefix is not None and (not prefix or len(prefix) > self.prefix_limit or any(char.isspace() for char in prefix)):
+      raise Error(description = f'Prefixes are 1 to {self.prefix_limit} characters without spaces!')
+
+    await self.apply(ctx, prefix = prefix)
+    await ctx.reply(ctx.author.mention, embed = Embeds(
+      title = 'Prefix',
+      description = settings.get(ctx.guild.id).prefix
+    ))
+
+
+  @commands.hybrid_command(
+    name = 'setwelcome',
+    description = 'Changes where new members are welcomed',
+    with_app_command = True
+  )
+  @commands.guild_only()
+  @Protected.legacy(PermissionPreset.Admin)
+  async def setwelcome(self, ctx: commands.Context, channel: Optional[discord.TextChannel] = None):
+    """
+    **Changes where new members are welcomed**
+
+    Leave the channel out to reset it
+
+    > **Example**
+    ```
+    /setwelcome #welcome
+    ```
+    """
+    await self.apply(ctx, welcome_channel_id = channel and channel.id)
+    channel_id = settings.get(ctx.guild.id).welcome_channel_id
+    await ctx.reply(ctx.author.mention, embed = Embeds(
+      title = 'Welcome Channel',
+      description = channel_id and f'<#{channel_id}>' or 'Members are not welcomed'
+    ))
+
+
+  @commands.hybrid_command(
+    name = 'setrules',
+    description = 'Changes the rule channel new members are pointed to',
+    with_app_command = True
+  )
+  @commands.guild_only()
+  @Protected.legacy(PermissionPreset.Admin)
+  async def setrules(self, ctx: commands.Context, channel: Optional[discord.TextChannel] = None):
+    """
+    **Changes the rule channel new members are pointed to**
+
+    Leave the channel out to reset it
+
+    > **Example**
+    ```
+    /setrules #rules
+    ```
+    """
+    await self.apply(ctx, rule_channel_id = channel and channel.id)
+    channel_id = settings.get(ctx.guild.id).rule_channel_id
+    await ctx.reply(ctx.author.mention, embed = Embeds(
+      title = 'Rule Channel',
+      description = channel_id and f'<#{channel_id}>' or 'No rule channel'
+    ))
+
+
+  @commands.command(hidden = True)
+  @commands.guild_only()
+  @Protected.legacy(PermissionPreset.Developer)
+  async def overridePermission(self, ctx: commands.Context, command: str, *, gates: Optional[str] = None):
+    target = self.client.get_command(command)
+    if target is None:
+      raise Error(description = f'Command `{command}` not found!')
+
+    overrides = dict(settings.get(ctx.guild.id).stored['permission_overrides'] or {})
+    if gates is None or gates == 'clear':
+      overrides.pop(target.qualified_name, None)
+    else:
+      try:
+        parsed = json.loads(gates)
+        parsed = isinstance(parsed, list) and parsed or [parsed]
+        CompiledClauses(*parsed)
+      except Exception as e:
+        raise Error(description = f'Invalid permission gates: `{e}`')
+      overrides[target.qualified_name] = parsed
+
+    await self.apply(ctx, permission_overrides = overrides or None)
+    await ctx.message.add_reaction('✅')
+
+
+
+async def setup(client: commands.Bot):
+  await client.add_cog(Settings(client))
@@ -0,0 +1,230 @@
+import os
+import json
+import inspect
+import hashlib
+import logging
+import discord
+from discord import app_commands
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+# Hashes of each command's payload, by command key
+Snapshot = Dict[str, str]
+
+# discord.py 2.4 started passing the tree when serializing commands
+_PASSES_TREE = 'tree' in inspect.signature(app_commands.Command.to_dict).parameters
+
+
+def command_key(payload: Dict[str, Any]) -> str:
+  """Identifies a command, context menus may share names with slash commands"""
+  kind = payload.get('type', 1)
+  return kind == 1 and payload['name'] or f'{payload["name"]} [{kind == 2 and "user" or "message"}]'
+
+def _digest(data: Any) -> str:
+  serialized = json.dumps(data, sort_keys = True, separators = (',', ':'), default = str)
+  return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+async def serialize(tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> List[Dict[str, Any]]:
+  """
+  Serializes the commands of a scope exactly as a sync would upload them
+
+  Parameters
+  ----------
+  :param tree: The command tree
+  :param guild: The guild scope, None for global commands
+  """
+  commands = tree.get_commands(guild = guild)
+  translator = tree.translator
+  if translator:
+    if _PASSES_TREE:
+      return [await command.get_translated_payload(tree, translator) for command in commands] # type: ignore
+    return [await command.get_translated_payload(translator) for command in commands] # type: ignore
+  if _PASSES_TREE:
+    return [command.to_dict(tree) for command in commands] # type: ignore
+  return [command.to_dict() for command in commands] # type: ignore
+
+def snapshot(payload: List[Dict[str, Any]]) -> Snapshot:
+  """
+  Hashes every command of a serialized scope
+
+  Parameters
+  ----------
+  :param payload: The serialized commands
+  """
+  return {command_key(command): _digest(command) for command in payload}
+
+def tree_hash(commands: Snapshot) -> str:
+  """
+  Hashes a whole scope, independent of command order
+
+  Parameters
+  ----------
+  :param commands: The scope's command hashes
+  """
+  return _digest(sorted(commands.items()))
+
+
+class SyncResult:
+  """
+  What changed in a scope since it was last synced
+  """
+
+  __slots__ = ('scope', 'added', 'removed', 'changed', 'synced', 'count')
+
+  scope: str
+  added: List[str]
+  removed: List[str]
+  changed: List[str]
+  synced: bool
+  count: int
+
+  def __init__(self, scope: str, previous: Optional[Snapshot], current: Snapshot) -> None:
+    """
+    Compares the last synced snapshot of a scope to the current one
+
+    Parameters
+    ----------
+    :param scope: 'global' or the guild ID
+    :param previous: The snapshot of the last sync, None if the scope was never synced
+    :param current: The snapshot of the command tree
+    """
+    previous = previous or {}
+    self.scope = scope
+    self.added = sorted(current.keys() - previous.keys())
+    self.removed = sorted(previous.keys() - current.keys())
+    self.changed = sorted(key for key in current.keys() & previous.keys() if current[key] != previous[key])
+    self.synced = False
+    self.count = len(current)
+
+  def __bool__(self) -> bool:
+    return bool(self.added or self.removed or self.changed)
+
+  def describe(self) -> str:
+    """Summarizes the changes, one line per kind of change"""
+    rows = [
+      f'{symbol} {", ".join(names)}'
+      for symbol, names in (('+', self.added), ('-', self.removed), ('~', self.changed)) if names
+    ]
+    return '\n'.join(rows) or 'No changes'
+
+
+class CommandSync:
+  """
+  Syncs application commands only when they changed
+
+  The hash of every command uploaded to a scope is kept in a local file,
+  a scope whose serialized commands hash the same is not uploaded again.
+  Discord allows few command uploads per day, unchanged deploys no longer
+  spend them.
+  """
+
+  path: str
+  _state: Optional[Dict[str, Dict[str, Any]]]
+
+  def __init__(self, path: str) -> None:
+    """
+    Initializes a CommandSync
+
+    Parameters
+    ----------
+    :param path: The JSON file holding the hashes of synced scopes
+    """
+    self.path = path
+    self._state = None
+
+  @property
+  def state(self) -> Dict[str, Dict[str, Any]]:
+    if self._state is None:
+      try:
+        with open(self.path) as file:
+          self._state = json.load(file)
+      except FileNotFoundError:
+        self._state = {}
+      except (OSError, ValueError):
+        logger.warning('Unreadable command sync state %s, every scope counts as changed', self.path, exc_info = True)
+        self._state = {}
+    return self._state # type: ignore
+
+  def _save(self) -> None:
+    # Replace atomically, an interrupted write must not mark scopes as synced
+    temporary = f'{self.path}.tmp'
+    with open(temporary, 'w') as file:
+      json.dump(self.state, file, indent = 2, sort_keys = True)
+    os.replace(temporary, self.path)
+
+
+  async def _scan(self, tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake]) -> Tuple[SyncResult, Snapshot, str]:
+    scope = guild and str(guild.id) or 'global'
+    current = snapshot(await serialize(tree, guild))
+    digest = tree_hash(current)
+    previous = self.state.get(scope)
+    return SyncResult(scope, previous and previous['commands'], current), current, digest
+
+  async def diff(self, tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None) -> SyncResult:
+    """
+    Compares the command tree to the last sync of a scope
+
+    Parameters
+    ----------
+    :param tree: The command tree
+    :param guild: The guild scope, None for global commands
+    """
+    result, _, _ = await self._scan(tree, guild)
+    return result
+
+  async def sync(self, tree: app_commands.CommandTree, guild: Optional[discord.abc.Snowflake] = None, force: bool = False) -> SyncResult:
+    """
+    Uploads the commands of a scope if they changed since its last sync
+
+    Parameters
+    ----------
+    :param tree: The command tree
+    :param guild: The guild scope, None for global commands
+    :param force: Upload even if nothing changed
+    """
+    result, current, digest = await self._scan(tree, guild)
+    previous = self.state.get(result.scope)
+    if not force and previous is not None and previous['hash'] == digest:
+      logger.info('Commands of %s unchanged, skipped sync', result.scope)
+      return result
+
+    synced = await tree.sync(guild = guild)
+    result.synced = True
+    result.count = len(synced)
+    self.state[result.scope] = {'hash': digest, 'commands': current}
+    self._save()
+    logger.info('Synced %d command(s) to %s: %s', len(synced), result.scope, result.describe().replace('\n', ' '))
+    return result
+
+  @staticmethod
+  def mirror(tree: app_commands.CommandTree, guild: discord.abc.Snowflake) -> None:
+    """
+    Copies the global commands into a development guild, where changes show up instantly
+
+    Commands registered only for that guild are replaced
+
+    Parameters
+    ----------
+    :param tree: The command tree
+    :param guild: The development guild
+    """
+    tree.clear_commands(guild = guild)
+    tree.copy_global_to(guild = guild)
+
+  def forget(self, guild: Optional[discord.abc.Snowflake] = None) -> None:
+    """
+    Marks a scope as never synced, e.g. after its commands were changed elsewhere
+
+    Parameters
+    ----------
+    :param guild: The guild scope, None for global commands
+    """
+    if self.state.pop(guild and str(guild.id) or 'global', None) is not None:
+      self._save()
+
+
+command_sync = CommandSync(Config.COMMAND_SYNC_PATH)
@@ -1,9 +1,27 @@
 import os
 from dotenv import load_dotenv
-from typing import NoReturn, Optional
+from typing import NoReturn, Optional, Literal, Union, Dict, Tuple, TypedDict
 
 load_dotenv()
 
+
+class CacheProfile(TypedDict):
+  """
+  Cache and intents profile
+
+  Parameters
+  ----------
+  :param intents: Intent names to enable, 'auto' derives them from the cogs' listeners and commands
+  :param member_cache_flags: Member cache flag names to enable, 'auto' follows the intents
+  :param chunk_guilds_at_startup: Whether to request every guild's member list on startup
+  :param max_messages: Size of the message cache, None disables it
+  """
+  intents: Union[Literal['all', 'auto'], Tuple[str, ...]]
+  member_cache_flags: Union[Literal['auto'], Tuple[str, ...]]
+  chunk_guilds_at_startup: bool
+  max_messages: Optional[int]
+
+
 class Config:
   """Configurations"""
 
@@ -13,9 +31,75 @@ class Config:
   RULE_CHANNEL_ID: int = 1184494394682916954
   WELCOME_CHANNEL_ID: int = 1184345962861314050
 
+  LOG_LEVEL: str = os.getenv('LOG_LEVEL', 'INFO')
+  METRICS_PORT: Optional[int] = int(os.getenv('METRICS_PORT', '0')) or None
+
+  # Defaults of guilds without their own settings
   COMMAND_PREFIX: str = '$'
   DEVELOPER_USER_ID: int = 470966329931857921
 
+  # Record the decision and time of every permission gate, also toggled by the checkTrace command
+  TRACE_CHECKS: bool = os.getenv('TRACE_CHECKS', '0') == '1'
+
+  SETTINGS_PATH: str = os.getenv('SETTINGS_PATH', 'settings.db')
+
+  # Application commands are only uploaded when their hash changed
+  COMMAND_SYNC_PATH: str = os.getenv('COMMAND_SYNC_PATH', '.command_sync.json')
+  SYNC_ON_STARTUP: bool = os.getenv('SYNC_ON_STARTUP', '0') == '1'
+  DEV_GUILD_ID: Optional[int] = int(os.getenv('DEV_GUILD_ID', '0')) or None
+
+  # Outbound messages per channel, Discord allows 5 every 5 seconds, the last ones of a window are kept for replies
+  OUTBOUND_RATE: int = int(os.getenv('OUTBOUND_RATE', '5'))
+  OUTBOUND_PER: float = float(os.getenv('OUTBOUND_PER', '5'))
+  OUTBOUND_RESERVE: int = 1
+
+  # Gateway sessions are saved on shutdown and resumed by the next process within the window
+  RESUME_SESSIONS: bool = os.getenv('RESUME_SESSIONS', '1') == '1'
+  SESSION_PATH: str = os.getenv('SESSION_PATH', '.gateway_sessions.json')
+  SESSION_RESUME_WINDOW: float = float(os.getenv('SESSION_RESUME_WINDOW', '60'))
+  # Resumed guilds are fetched with three requests each, beyond this identifying is cheaper
+  SESSION_RESUME_MAX_GUILDS: int = int(os.getenv('SESSION_RESUME_MAX_GUILDS', '100'))
+
+  # Seconds a stopping process waits for running commands and queued sends
+  SHUTDOWN_TIMEOUT: float = float(os.getenv('SHUTDOWN_TIMEOUT', '20'))
+
+  # Extensions loaded only after the client is ready
+  DEFERRED_COGS: Tuple[str, ...] = ('dev_command',)
+
+  # Encode pagination state in button custom_ids instead of keeping a view per message
+  STATELESS_PAGINATION: bool = True
+
+  # Sharding, more than one cluster runs groups of shards in separate worker processes
+  SHARD_COUNT: Optional[int] = int(os.getenv('SHARD_COUNT', '0')) or None
+  CLUSTERS: int = int(os.getenv('CLUSTERS', '1'))
+  SHARDED: bool = os.getenv('SHARDED', '0') == '1' or CLUSTERS > 1 or SHARD_COUNT is not None
+
+  # Set by the launcher for worker processes
+  CLUSTER_ID: int = int(os.getenv('CLUSTER_ID', '0'))
+  SHARD_IDS: Optional[Tuple[int, ...]] = tuple(int(id) for id in os.getenv('SHARD_IDS', '').split(',') if id) or None
+  IPC_PATH: Optional[str] = os.getenv('IPC_PATH') or None
+
+  # Clusters share cooldowns through SQLite, a single process keeps them in memory
+  COOLDOWN_BACKEND: Literal['memory', 'sqlite'] = os.getenv('COOLDOWN_BACKEND', CLUSTERS > 1 and 'sqlite' or 'memory') # type: ignore
+  COOLDOWN_PATH: str = os.getenv('COOLDOWN_PATH', 'cooldowns.db')
+  COOLDOWN_MAX_KEYS: int = int(os.getenv('COOLDOWN_MAX_KEYS', '100000'))
+
+  CACHE_PROFILE: str = os.getenv('CACHE_PROFILE', 'minimal')
+  CACHE_PROFILES: Dict[str, CacheProfile] = {
+    'full': CacheProfile(
+      intents = 'all',
+      member_cache_flags = 'auto',
+      chunk_guilds_at_startup = True,
+      max_messages = 1000
+    ),
+    'minimal': CacheProfile(
+      intents = 'auto',
+      member_cache_flags = 'auto',
+      chunk_guilds_at_startup = False,
+      max_messages = 200
+    )
+  }
+
   def __init__(self, *args, **kwargs) -> NoReturn:
     raise NotImplementedError('Not instantiable')
   
\ No newline at end of file
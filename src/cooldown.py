@@ -0,0 +1,288 @@
+import abc
+import time
+import sqlite3
+import asyncio
+import itertools
+import logging
+import concurrent.futures
+from discord.ext import commands
+from typing import Callable, Dict, Hashable, Optional, Set, Tuple
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cooldowns (
+  bucket TEXT NOT NULL,
+  key TEXT NOT NULL,
+  tat REAL NOT NULL,
+  PRIMARY KEY (bucket, key)
+) WITHOUT ROWID
+"""
+
+
+def _limit(tat: Optional[float], now: float, rate: int, per: float) -> Tuple[float, float]:
+  """
+  Generic cell rate algorithm, returns the retry delay and the theoretical arrival time to store
+
+  A key's whole state is when its bucket will be full again, no state is
+  needed once that time has passed
+
+  Parameters
+  ----------
+  :param tat: The key's stored theoretical arrival time, None if it has none
+  :param now: The current time
+  :param rate: Uses allowed per window
+  :param per: The window in seconds
+  """
+  interval = per / rate
+  if tat is None or tat < now:
+    tat = now
+  retry_after = tat - now - (per - interval)
+  if retry_after > 0:
+    return retry_after, tat
+  return 0.0, tat + interval
+
+
+class CooldownStore(abc.ABC):
+  """
+  Where command cooldowns are kept
+  """
+
+  @abc.abstractmethod
+  async def hit(self, bucket: str, key: Hashable, rate: int, per: float) -> float:
+    """
+    Uses a key's cooldown, returns how long to wait or 0 when allowed
+
+    Parameters
+    ----------
+    :param bucket: The cooldown's namespace, the command's qualified name
+    :param key: The bucket key, e.g. the user ID
+    :param rate: Uses allowed per window
+    :param per: The window in seconds
+    """
+
+  async def close(self) -> None:
+    pass
+
+
+class MemoryCooldowns(CooldownStore):
+  """
+  Cooldowns kept in this process
+
+  Each key costs one float in a per-command dict ordered by last use.
+  Expired keys are swept periodically from the least recently used end
+  and, past the cap, the least recently used key of a command is dropped,
+  which only ever forgives a cooldown.
+  """
+
+  max_keys: int
+  sweep_interval: float
+  clock: Callable[[], float]
+  evictions: int
+  swept: int
+  _buckets: Dict[str, Dict[Hashable, float]]
+  _next_sweep: float
+
+  def __init__(self, max_keys: int = 100_000, sweep_interval: float = 60, clock: Callable[[], float] = time.monotonic) -> None:
+    """
+    Initializes MemoryCooldowns
+
+    Parameters
+    ----------
+    :param max_keys: Most keys kept per command
+    :param sweep_interval: Seconds between sweeps of expired keys
+    :param clock: Source of the current time
+    """
+    self.max_keys = max_keys
+    self.sweep_interval = sweep_interval
+    self.clock = clock
+    self.evictions = 0
+    self.swept = 0
+    self._buckets = {}
+    self._next_sweep = clock() + sweep_interval
+
+  def __len__(self) -> int:
+    return sum(len(keys) for keys in self._buckets.values())
+
+  async def hit(self, bucket: str, key: Hashable, rate: int, per: float) -> float:
+    return self.update(bucket, key, rate, per)
+
+  def update(self, bucket: str, key: Hashable, rate: int, per: float, now: Optional[float] = None) -> float:
+    """Synchronous `hit`, optionally at a given time"""
+    now = self.clock() if now is None else now
+    keys = self._buckets.get(bucket)
+    if keys is None:
+      keys = self._buckets[bucket] = {}
+
+    # Re-inserting keeps the dict ordered by last use
+    retry_after, keys[key] = _limit(keys.pop(key, None), now, rate, per)
+    if len(keys) > self.max_keys:
+      self._evict(keys, now)
+    if now >= self._next_sweep:
+      self.sweep(now)
+    return retry_after
+
+  def _evict(self, keys: Dict[Hashable, float], now: float) -> None:
+    # Evicting a tenth at once keeps the cost per update constant
+    target = self.max_keys - self.max_keys // 10
+    self.swept += self._drop_expired(keys, now)
+    excess = len(keys) - target
+    if excess > 0:
+      for key in list(itertools.islice(keys, excess)):
+        del keys[key]
+      self.evictions += excess
+
+  @staticmethod
+  def _drop_expired(keys: Dict[Hashable, float], now: float) -> int:
+    expired = []
+    for key, tat in keys.items():
+      if tat > now:
+        break
+      expired.append(key)
+    for key in expired:
+      del keys[key]
+    return len(expired)
+
+  def sweep(self, now: Optional[float] = None) -> int:
+    """
+    Drops expired keys from the least recently used end of every command, returns how many
+
+    Parameters
+    ----------
+    :param now: The current time
+    """
+    now = self.clock() if now is None else now
+    self._next_sweep = now + self.sweep_interval
+    dropped = sum(self._drop_expired(keys, now) for keys in self._buckets.values())
+    self.swept += dropped
+    return dropped
+
+  def stats(self) -> Dict[str, int]:
+    return {'keys': len(self), 'evictions': self.evictions, 'swept': self.swept}
+
+
+class SQLiteCooldowns(CooldownStore):
+  """
+  Cooldowns shared by every process using the same database file
+
+  Keeps the limits of sharded deployments, where a user's commands may
+  reach any cluster. Updates are serialized by SQLite's write lock and
+  run on a dedicated thread, expired keys are deleted periodically.
+  """
+
+  path: str
+  sweep_interval: float
+  swept: int
+  _executor: concurrent.futures.ThreadPoolExecutor
+  _connection: Optional[sqlite3.Connection]
+  _next_sweep: float
+
+  def __init__(self, path: str, sweep_interval: float = 60) -> None:
+    """
+    Initializes SQLiteCooldowns, the database is opened on first use
+
+    Parameters
+    ----------
+    :param path: The SQLite database file
+    :param sweep_interval: Seconds between deletions of expired keys
+    """
+    self.path = path
+    self.sweep_interval = sweep_interval
+    self.swept = 0
+    self._executor = concurrent.futures.ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'cooldowns')
+    self._connection = None
+    self._next_sweep = 0
+
+  async def hit(self, bucket: str, key: Hashable, rate: int, per: float) -> float:
+    return await asyncio.get_running_loop().run_in_executor(self._executor, self.update, bucket, key, rate, per)
+
+  def _connect(self) -> sqlite3.Connection:
+    if self._connection is None:
+      self._connection = sqlite3.connect(self.path, timeout = 5, isolation_level = None)
+      self._connection.execute('PRAGMA journal_mode = WAL')
+      self._connection.execute('PRAGMA synchronous = NORMAL')
+      self._connection.execute(_SCHEMA)
+      self._next_sweep = time.time() + self.sweep_interval
+    return self._connection
+
+  def update(self, bucket: str, key: Hashable, rate: int, per: float, now: Optional[float] = None) -> float:
+    """Synchronous `hit`, optionally at a given time, only called on the store's thread"""
+    connection = self._connect()
+    key = str(key)
+
+    # Wall clock time, monotonic clocks are not comparable between processes
+    now = time.time() if now is None else now
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+      row = connection.execute('SELECT tat FROM cooldowns WHERE bucket = ? AND key = ?', (bucket, key)).fetchone()
+      retry_after, tat = _limit(row and row[0], now, rate, per)
+      if not retry_after:
+        connection.execute('INSERT OR REPLACE INTO cooldowns (bucket, key, tat) VALUES (?, ?, ?)', (bucket, key, tat))
+      connection.execute('COMMIT')
+    except BaseException:
+      connection.execute('ROLLBACK')
+      raise
+
+    if now >= self._next_sweep:
+      self.sweep(now)
+    return retry_after
+
+  def sweep(self, now: Optional[float] = None) -> int:
+    """Deletes expired keys, returns how many"""
+    now = time.time() if now is None else now
+    self._next_sweep = now + self.sweep_interval
+    dropped = self._connect().execute('DELETE FROM cooldowns WHERE tat <= ?', (now,)).rowcount
+    self.swept += dropped
+    return dropped
+
+  async def close(self) -> None:
+    await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+
+  def _close(self) -> None:
+    if self._connection:
+      self._connection.close()
+    self._connection = None
+
+
+def cooldown(rate: int, per: float, type: commands.BucketType = commands.BucketType.default):
+  """
+  Command cooldown kept in the configured cooldown store
+
+  Replaces `commands.cooldown`, whose buckets are never bounded and are
+  scanned in full on every invocation. Runs as the command's last check and
+  is only used up when the command is invoked, listing the commands a
+  member can run does not use it.
+
+  Parameters
+  ----------
+  :param rate: Uses allowed per window
+  :param per: The window in seconds
+  :param type: What the cooldown is kept per
+  """
+  limit = commands.Cooldown(rate, per)
+  async def predicate(ctx: commands.Context) -> bool:
+    command: commands.Command = ctx.command # type: ignore
+    # can_run swaps in the command it checks, an invocation was started with one of its names
+    if ctx.invoked_with not in (command.name, *command.aliases):
+      return True
+    # Shared by copies of the context, a command listing itself does not use its cooldown twice
+    used: Optional[Set[commands.Command]] = getattr(ctx, 'cooldowns_used', None)
+    if used is None:
+      used = ctx.cooldowns_used = set() # type: ignore
+    if command in used:
+      return True
+    used.add(command)
+
+    retry_after = await cooldowns.hit(command.qualified_name, type.get_key(ctx), rate, per)
+    if retry_after:
+      raise commands.CommandOnCooldown(limit, retry_after, type)
+    return True
+  return commands.check(predicate)
+
+
+cooldowns: CooldownStore = (
+  Config.COOLDOWN_BACKEND == 'sqlite' and SQLiteCooldowns(Config.COOLDOWN_PATH)
+  or MemoryCooldowns(Config.COOLDOWN_MAX_KEYS)
+)
@@ -0,0 +1,162 @@
+import sys
+import time
+import queue
+import logging
+import logging.handlers
+import discord
+from discord.ext import commands
+from typing import Any, Dict, Optional, Tuple, Union
+
+
+FORMAT = '%(asctime)s %(levelname)-8s %(name)s [cmd=%(command)s guild=%(guild)s user=%(user)s] %(message)s%(repeats)s'
+DEFAULTS = {'command': '-', 'guild': '-', 'user': '-', 'repeats': ''}
+
+
+def context_extra(ctx: Optional[Union[commands.Context, discord.Interaction]]) -> Dict[str, Any]:
+  """
+  Builds the `extra` fields of a record logged for a command
+
+  Parameters
+  ----------
+  :param ctx: Command Context [legacy and app command supported]
+  """
+  if ctx is None:
+    return {}
+  user = ctx.user if isinstance(ctx, discord.Interaction) else ctx.author
+  command = ctx.command
+  return {
+    'command': command and command.qualified_name or '-',
+    'guild': ctx.guild and ctx.guild.id or '-',
+    'user': user and user.id or '-'
+  }
+
+
+class DedupFilter(logging.Filter):
+  """
+  Folds repeated records and samples bursts
+
+  Records with the same signature within `window` seconds are dropped and
+  counted, the count is attached to the next record let through. Above
+  `max_per_second` records, only one in `sample_rate` is let through.
+  """
+
+  window: float
+  max_per_second: int
+  sample_rate: int
+  suppressed: int
+  sampled_out: int
+
+  _seen: Dict[Tuple, Tuple[float, int]]
+  _second: int
+  _second_count: int
+
+  def __init__(self, window: float = 60, max_per_second: int = 50, sample_rate: int = 10) -> None:
+    """
+    Initializes a DedupFilter
+
+    Parameters
+    ----------
+    :param window: Seconds during which identical records are folded
+    :param max_per_second: Records per second let through before sampling
+    :param sample_rate: One in how many records is kept while sampling
+    """
+    super().__init__()
+    self.window = window
+    self.max_per_second = max_per_second
+    self.sample_rate = sample_rate
+    self.suppressed = 0
+    self.sampled_out = 0
+    self._seen = {}
+    self._second = 0
+    self._second_count = 0
+
+  @staticmethod
+  def signature(record: logging.LogRecord) -> Tuple:
+    """
+    Identifies records caused by the same problem
+
+    Parameters
+    ----------
+    :param record: The log record
+    """
+    origin = None
+    if record.exc_info:
+      origin = (record.exc_info[0],)
+      if tb := record.exc_info[2]:
+        while tb.tb_next:
+          tb = tb.tb_next
+        origin += (tb.tb_frame.f_code.co_filename, tb.tb_lineno)
+    # Errors raised by shared code, e.g. a check, are told apart by the command they failed
+    return (record.name, record.levelno, record.msg, origin, getattr(record, 'command', None))
+
+  def filter(self, record: logging.LogRecord) -> bool:
+    now = time.monotonic()
+
+    second = int(now)
+    if second != self._second:
+      self._second, self._second_count = second, 0
+    self._second_count += 1
+    if self._second_count > self.max_per_second and self._second_count % self.sample_rate:
+      self.sampled_out += 1
+      return False
+
+    key = self.signature(record)
+    seen = self._seen.get(key)
+    if seen and now - seen[0] < self.window:
+      self._seen[key] = (seen[0], seen[1] + 1)
+      self.suppressed += 1
+      return False
+
+    if seen and seen[1]:
+      record.repeats = f' (repeated {seen[1]} more times in the last {int(now - seen[0])}s)'
+    self._seen[key] = (now, 0)
+
+    if len(self._seen) > 4096:
+      self._seen = {key: value for key, value in self._seen.items() if now - value[0] < self.window}
+    return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+  """
+  Queue handler that leaves formatting, including tracebacks, to the listener thread
+  """
+
+  def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+    return record
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def setup_logging(level: Union[int, str] = logging.INFO) -> logging.handlers.QueueListener:
+  """
+  Routes every log record through a queue written by a background thread
+
+  Parameters
+  ----------
+  :param level: The root logging level
+  """
+  global _listener
+  if _listener:
+    return _listener
+
+  output = logging.StreamHandler(sys.stderr)
+  output.setFormatter(logging.Formatter(FORMAT, defaults = DEFAULTS))
+
+  records: 'queue.SimpleQueue[logging.LogRecord]' = queue.SimpleQueue()
+  handler = DeferredQueueHandler(records)
+  handler.addFilter(DedupFilter())
+
+  root = logging.getLogger()
+  root.setLevel(level)
+  root.addHandler(handler)
+
+  _listener = logging.handlers.QueueListener(records, output, respect_handler_level = True)
+  _listener.start()
+  return _listener
+
+def stop_logging() -> None:
+  """Writes out queued records and stops the background thread"""
+  global _listener
+  if _listener:
+    _listener.stop()
+    _listener = None
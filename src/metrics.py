@@ -0,0 +1,357 @@
+import bisect
+import time
+from discord.ext import commands
+from typing import Dict, List, Tuple, Sequence, Optional
+
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+  """
+  Fixed-bucket histogram in the Prometheus layout
+  """
+
+  __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+  buckets: Tuple[float, ...]
+  counts: List[int]
+  sum: float
+  count: int
+
+  def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+    """
+    Initializes a Histogram
+
+    Parameters
+    ----------
+    :param buckets: Ascending upper bounds, an infinite bucket is implied
+    """
+    self.buckets = tuple(buckets)
+    self.counts = [0] * (len(self.buckets) + 1)
+    self.sum = 0
+    self.count = 0
+
+  def observe(self, value: float) -> None:
+    """
+    Records a value
+
+    Parameters
+    ----------
+    :param value: The observed value
+    """
+    self.counts[bisect.bisect_left(self.buckets, value)] += 1
+    self.sum += value
+    self.count += 1
+
+  def quantile(self, q: float) -> float:
+    """
+    Estimates a quantile by interpolating within its bucket
+
+    Parameters
+    ----------
+    :param q: The quantile, between 0 and 1
+    """
+    if not self.count:
+      return 0
+    rank = q * self.count
+    seen = 0
+    for i, count in enumerate(self.counts):
+      if seen + count >= rank and count:
+        lower = self.buckets[i - 1] if i > 0 else 0
+        upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+        return lower + (upper - lower) * (rank - seen) / count
+      seen += count
+    return self.buckets[-1]
+
+
+class LatencyRing:
+  """
+  Fixed-size ring buffer of latency samples
+  """
+
+  __slots__ = ('_values', '_index', 'count')
+
+  _values: List[float]
+  _index: int
+  count: int
+
+  def __init__(self, size: int = 256) -> None:
+    """
+    Initializes a LatencyRing
+
+    Parameters
+    ----------
+    :param size: Number of samples kept
+    """
+    self._values = [0.0] * size
+    self._index = 0
+    self.count = 0
+
+  def __len__(self) -> int:
+    return min(self.count, len(self._values))
+
+  def add(self, value: float) -> None:
+    """
+    Records a sample, overwriting the oldest one when full
+
+    Parameters
+    ----------
+    :param value: The sample
+    """
+    self._values[self._index] = value
+    self._index = (self._index + 1) % len(self._values)
+    self.count += 1
+
+  @property
+  def current(self) -> float:
+    """The latest sample"""
+    return self._values[self._index - 1] if self.count else 0
+
+  def values(self) -> List[float]:
+    """Kept samples, oldest first"""
+    if self.count < len(self._values):
+      return self._values[:self.count]
+    return self._values[self._index:] + self._values[:self._index]
+
+  def summary(self) -> Dict[str, float]:
+    """Returns the current, p50, p95 and max samples"""
+    ordered = sorted(self.values())
+    if not ordered:
+      return {'current': 0, 'p50': 0, 'p95': 0, 'max': 0}
+
+    def percentile(q: float) -> float:
+      return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {'current': self.current, 'p50': percentile(0.5), 'p95': percentile(0.95), 'max': ordered[-1]}
+
+
+class Metrics:
+  """
+  Per-command call, latency, check failure and cooldown metrics
+  """
+
+  calls: Dict[str, int]
+  errors: Dict[str, int]
+  check_failures: Dict[str, int]
+  cooldowns: Dict[str, int]
+  latency: Dict[str, Histogram]
+  gateway_latency: Histogram
+  rest_latency: Histogram
+  gateway_samples: Dict[Optional[int], LatencyRing]
+  rest_samples: LatencyRing
+  gauges: Dict[str, float]
+  messages: Dict[str, int]
+  outbound_depth: Dict[str, int]
+  outbound_wait: Dict[str, Histogram]
+  outbound_merged: Dict[str, int]
+
+  def __init__(self) -> None:
+    self.calls = {}
+    self.errors = {}
+    self.check_failures = {}
+    self.cooldowns = {}
+    self.latency = {}
+    self.gateway_latency = Histogram()
+    self.rest_latency = Histogram()
+    self.gateway_samples = {}
+    self.rest_samples = LatencyRing()
+    self.gauges = {}
+    self.messages = {}
+    self.outbound_depth = {}
+    self.outbound_wait = {}
+    self.outbound_merged = {}
+
+  def observe_command(self, command: str, seconds: float) -> None:
+    """
+    Records a completed command invocation
+
+    Parameters
+    ----------
+    :param command: The command's qualified name
+    :param seconds: How long the invocation took
+    """
+    self.calls[command] = self.calls.get(command, 0) + 1
+    histogram = self.latency.get(command)
+    if histogram is None:
+      histogram = self.latency[command] = Histogram()
+    histogram.observe(seconds)
+
+  def observe_error(self, command: str, error: Exception) -> None:
+    """
+    Records a failed command invocation
+
+    Parameters
+    ----------
+    :param command: The command's qualified name
+    :param error: The raised error
+    """
+    if isinstance(error, commands.CommandOnCooldown):
+      counter = self.cooldowns
+    elif isinstance(error, commands.CheckFailure):
+      counter = self.check_failures
+    else:
+      counter = self.errors
+    counter[command] = counter.get(command, 0) + 1
+
+  def observe_gateway(self, shard_id: Optional[int], seconds: float) -> None:
+    """
+    Records a heartbeat round trip, repeated readings of the same heartbeat are ignored
+
+    Parameters
+    ----------
+    :param shard_id: The shard, None when not sharded
+    :param seconds: The heartbeat round trip
+    """
+    samples = self.gateway_samples.get(shard_id)
+    if samples is None:
+      samples = self.gateway_samples[shard_id] = LatencyRing()
+    elif samples.count and samples.current == seconds:
+      return
+    samples.add(seconds)
+    self.gateway_latency.observe(seconds)
+
+  def observe_rest(self, seconds: float) -> None:
+    """
+    Records a REST round trip
+
+    Parameters
+    ----------
+    :param seconds: The request round trip
+    """
+    self.rest_samples.add(seconds)
+    self.rest_latency.observe(seconds)
+
+  def observe_message(self, result: str) -> None:
+    """
+    Records what happened to a received message
+
+    Parameters
+    ----------
+    :param result: 'dispatched', or why it was skipped
+    """
+    self.messages[result] = self.messages.get(result, 0) + 1
+
+  def set_outbound_depth(self, priority: str, depth: int) -> None:
+    """
+    Records how many outbound requests of a priority are queued
+
+    Parameters
+    ----------
+    :param priority: The priority's name
+    :param depth: Queued requests
+    """
+    self.outbound_depth[priority] = depth
+
+  def observe_outbound(self, priority: str, seconds: float) -> None:
+    """
+    Records an outbound request leaving its queue
+
+    Parameters
+    ----------
+    :param priority: The priority's name
+    :param seconds: How long it was queued
+    """
+    histogram = self.outbound_wait.get(priority)
+    if histogram is None:
+      histogram = self.outbound_wait[priority] = Histogram()
+    histogram.observe(seconds)
+
+  def observe_outbound_merge(self, priority: str) -> None:
+    """
+    Records an outbound request merged into a queued one
+
+    Parameters
+    ----------
+    :param priority: The priority's name
+    """
+    self.outbound_merged[priority] = self.outbound_merged.get(priority, 0) + 1
+
+  def set_gauge(self, name: str, value: float) -> None:
+    """
+    Sets a point-in-time value
+
+    Parameters
+    ----------
+    :param name: Metric name, without the bot prefix
+    :param value: The value
+    """
+    self.gauges[name] = value
+
+  def top(self, count: int = 10, quantile: float = 0.99) -> List[Tuple[str, float, int]]:
+    """
+    Returns (command, latency quantile, calls) of the slowest commands
+
+    Parameters
+    ----------
+    :param count: Number of commands
+    :param quantile: The latency quantile to rank by
+    """
+    return sorted(
+      ((name, histogram.quantile(quantile), histogram.count) for name, histogram in self.latency.items()),
+      key = lambda item: item[1],
+      reverse = True
+    )[:count]
+
+  def render(self) -> str:
+    """Renders every metric in the Prometheus text exposition format"""
+    lines: List[str] = []
+
+    def counter(name: str, help: str, values: Dict[str, int]) -> None:
+      lines.extend((f'# HELP {name} {help}', f'# TYPE {name} counter'))
+      lines.extend(f'{name}{{command="{_escape(command)}"}} {value}' for command, value in sorted(values.items()))
+
+    def histogram(name: str, value: Histogram, labels: str = '') -> None:
+      cumulative = 0
+      for bound, count in zip((*value.buckets, '+Inf'), value.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels}{labels and ","}le="{bound}"}} {cumulative}')
+      suffix = labels and f'{{{labels}}}'
+      lines.extend((f'{name}_sum{suffix} {value.sum}', f'{name}_count{suffix} {value.count}'))
+
+    counter('thread_command_calls_total', 'Completed command invocations', self.calls)
+    counter('thread_command_errors_total', 'Command invocations that raised', self.errors)
+    counter('thread_command_check_failures_total', 'Command invocations rejected by checks', self.check_failures)
+    counter('thread_command_cooldowns_total', 'Command invocations rejected by cooldowns', self.cooldowns)
+
+    lines.extend(('# HELP thread_command_latency_seconds Command invocation latency', '# TYPE thread_command_latency_seconds histogram'))
+    for command, value in sorted(self.latency.items()):
+      histogram('thread_command_latency_seconds', value, f'command="{_escape(command)}"')
+
+    lines.extend(('# HELP thread_gateway_latency_seconds Gateway heartbeat latency', '# TYPE thread_gateway_latency_seconds histogram'))
+    histogram('thread_gateway_latency_seconds', self.gateway_latency)
+
+    lines.extend(('# HELP thread_rest_latency_seconds REST round trip latency', '# TYPE thread_rest_latency_seconds histogram'))
+    histogram('thread_rest_latency_seconds', self.rest_latency)
+
+    lines.extend(('# HELP thread_messages_total Received messages by whether they reached command processing', '# TYPE thread_messages_total counter'))
+    lines.extend(f'thread_messages_total{{result="{result}"}} {value}' for result, value in sorted(self.messages.items()))
+
+    lines.extend(('# HELP thread_outbound_queue_depth Outbound requests waiting for their route', '# TYPE thread_outbound_queue_depth gauge'))
+    lines.extend(f'thread_outbound_queue_depth{{priority="{priority}"}} {value}' for priority, value in sorted(self.outbound_depth.items()))
+
+    lines.extend(('# HELP thread_outbound_wait_seconds Time outbound requests were queued', '# TYPE thread_outbound_wait_seconds histogram'))
+    for priority, value in sorted(self.outbound_wait.items()):
+      histogram('thread_outbound_wait_seconds', value, f'priority="{priority}"')
+
+    lines.extend(('# HELP thread_outbound_merged_total Outbound requests superseded by a newer one', '# TYPE thread_outbound_merged_total counter'))
+    lines.extend(f'thread_outbound_merged_total{{priority="{priority}"}} {value}' for priority, value in sorted(self.outbound_merged.items()))
+
+    for name, value in sorted(self.gauges.items()):
+      lines.extend((f'# TYPE thread_{name} gauge', f'thread_{name} {value}'))
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value: str) -> str:
+  return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+metrics = Metrics()
+
+
+def command_started(ctx: commands.Context) -> None:
+  ctx.metrics_started = time.perf_counter() # type: ignore
+
+def command_completed(ctx: commands.Context) -> None:
+  started: Optional[float] = getattr(ctx, 'metrics_started', None)
+  if started is not None and ctx.command and not ctx.command_failed:
+    metrics.observe_command(ctx.command.qualified_name, time.perf_counter() - started)
@@ -0,0 +1,290 @@
+import enum
+import time
+import heapq
+import asyncio
+import functools
+import itertools
+import logging
+from collections import deque
+from discord.ext import commands
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+from .config import Config
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(enum.IntEnum):
+  """Outbound traffic classes, lower values are sent first"""
+
+  INTERACTION = 0
+  REPLY = 1
+  WELCOME = 2
+  PAGING = 3
+
+
+class _Job:
+  __slots__ = ('priority', 'call', 'future', 'merge', 'queued')
+
+  def __init__(self, priority: Priority, call: Callable[[], Awaitable[Any]], merge: Optional[Hashable]) -> None:
+    self.priority = priority
+    self.call = call
+    self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+    self.merge = merge
+    self.queued = time.monotonic()
+
+
+class RouteQueue:
+  """
+  Queued requests of one rate limit route, highest priority first
+
+  Requests are dispatched within a local budget of `rate` requests every
+  `per` seconds. The last `reserve` requests of a window are kept for
+  replies, so bulk traffic never makes a reply wait for the window.
+  """
+
+  rate: int
+  per: float
+  reserve: int
+  _heap: List[Tuple[int, int, _Job]]
+  _merges: Dict[Hashable, _Job]
+  _sends: Deque[float]
+  _wakeup: asyncio.Event
+  _worker: Optional['asyncio.Task[None]']
+
+  def __init__(self, rate: int, per: float, reserve: int) -> None:
+    """
+    Initializes a RouteQueue
+
+    Parameters
+    ----------
+    :param rate: Requests allowed per window
+    :param per: The window in seconds
+    :param reserve: Requests of each window only replies may use
+    """
+    self.rate = rate
+    self.per = per
+    self.reserve = reserve
+    self._heap = []
+    self._merges = {}
+    self._sends = deque()
+    self._wakeup = asyncio.Event()
+    self._worker = None
+
+  def __len__(self) -> int:
+    return len(self._heap)
+
+  @property
+  def idle(self) -> bool:
+    """Nothing is queued and the window holds no recent requests"""
+    now = time.monotonic()
+    return not self._heap and not any(sent > now - self.per for sent in self._sends)
+
+  def push(self, job: _Job, sequence: int) -> None:
+    heapq.heappush(self._heap, (job.priority, sequence, job))
+    if job.merge is not None:
+      self._merges[job.merge] = job
+    self._wakeup.set()
+
+  def merge(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Optional[_Job]:
+    """
+    Replaces the call of a queued request with the same merge key, returns that request
+
+    Parameters
+    ----------
+    :param key: The merge key
+    :param call: The newer call
+    """
+    job = self._merges.get(key)
+    if job is not None:
+      job.call = call
+    return job
+
+  def wait(self, priority: Priority, now: float) -> float:
+    """
+    Seconds until a request of a priority fits the budget
+
+    Parameters
+    ----------
+    :param priority: The request's priority
+    :param now: The current time
+    """
+    while self._sends and self._sends[0] <= now - self.per:
+      self._sends.popleft()
+    needed = len(self._sends) + 1 + (priority > Priority.REPLY and self.reserve or 0) - self.rate
+    if needed <= 0:
+      return 0
+    return self._sends[min(needed, len(self._sends)) - 1] + self.per - now
+
+  def clear(self) -> List[_Job]:
+    """Removes and returns every queued request"""
+    jobs = [job for _, _, job in self._heap]
+    self._heap.clear()
+    self._merges.clear()
+    return jobs
+
+  def pop(self, now: float) -> _Job:
+    _, _, job = heapq.heappop(self._heap)
+    if job.merge is not None:
+      self._merges.pop(job.merge, None)
+    self._sends.append(now)
+    return job
+
+
+class OutboundScheduler:
+  """
+  Central queue for messages and edits sent by every cog
+
+  Requests are queued per rate limit route, usually the channel, and sent
+  by priority: interaction responses at once, then command replies, then
+  welcomes, then paging edits. A queued edit replaced by a newer edit of
+  the same message is merged into it.
+  """
+
+  rate: int
+  per: float
+  reserve: int
+  queued: Dict[str, int]
+  _routes: Dict[Hashable, RouteQueue]
+  _sending: Set['asyncio.Task[None]']
+  _sequence: 'itertools.count[int]'
+
+  def __init__(self, rate: int = 5, per: float = 5, reserve: int = 1) -> None:
+    """
+    Initializes an OutboundScheduler
+
+    Parameters
+    ----------
+    :param rate: Requests allowed per route every `per` seconds, Discord allows 5 messages per 5 seconds per channel
+    :param per: The window in seconds
+    :param reserve: Requests of each window only replies may use
+    """
+    self.rate = rate
+    self.per = per
+    self.reserve = min(reserve, rate - 1)
+    self.queued = {priority.name.lower(): 0 for priority in Priority if priority is not Priority.INTERACTION}
+    self._routes = {}
+    self._sending = set()
+    self._sequence = itertools.count()
+
+  @property
+  def sending(self) -> int:
+    """Requests dispatched and awaiting their response"""
+    return len(self._sending)
+
+  def _count(self, priority: Priority, change: int) -> None:
+    name = priority.name.lower()
+    self.queued[name] += change
+    metrics.set_outbound_depth(name, self.queued[name])
+
+  async def submit(self, route: Hashable, priority: Priority, call: Callable[[], Awaitable[Any]], merge: Optional[Hashable] = None) -> Any:
+    """
+    Sends a request when its route and priority allow, returns its result
+
+    Parameters
+    ----------
+    :param route: The rate limit route, e.g. the channel ID
+    :param priority: The request's priority
+    :param call: Makes the request
+    :param merge: Requests with the same key supersede queued ones, e.g. edits of one message
+    """
+    if priority is Priority.INTERACTION:
+      # Interaction responses have their own limits and a deadline
+      metrics.observe_outbound('interaction', 0)
+      return await call()
+
+    queue = self._routes.get(route)
+    if queue is None:
+      queue = self._routes[route] = RouteQueue(self.rate, self.per, self.reserve)
+
+    job = merge is not None and queue.merge(merge, call) or None
+    if job is not None:
+      metrics.observe_outbound_merge(priority.name.lower())
+    else:
+      job = _Job(priority, call, merge)
+      queue.push(job, next(self._sequence))
+      self._count(priority, 1)
+      if queue._worker is None or queue._worker.done():
+        queue._worker = asyncio.create_task(self._run(route, queue))
+    return await asyncio.shield(job.future)
+
+  async def _run(self, route: Hashable, queue: RouteQueue) -> None:
+    while queue._heap:
+      now = time.monotonic()
+      wait = queue.wait(queue._heap[0][2].priority, now)
+      if wait > 0:
+        # A higher priority request may arrive and fit the budget sooner
+        queue._wakeup.clear()
+        try:
+          await asyncio.wait_for(queue._wakeup.wait(), wait)
+        except asyncio.TimeoutError:
+          pass
+        continue
+
+      job = queue.pop(now)
+      self._count(job.priority, -1)
+      metrics.observe_outbound(job.priority.name.lower(), now - job.queued)
+      sending = asyncio.ensure_future(self._execute(job))
+      self._sending.add(sending)
+      sending.add_done_callback(self._sending.discard)
+
+    asyncio.get_running_loop().call_later(self.per, self._discard, route, queue)
+
+  @staticmethod
+  async def _execute(job: _Job) -> None:
+    try:
+      result = await job.call()
+    except asyncio.CancelledError:
+      job.future.cancel()
+      raise
+    except Exception as e:
+      job.future.done() or job.future.set_exception(e)
+    else:
+      job.future.done() or job.future.set_result(result)
+
+  async def drain(self, timeout: float) -> Dict[str, int]:
+    """
+    Waits for queued and in-flight requests, then drops those still queued
+
+    Returns the number of dropped requests by priority
+
+    Parameters
+    ----------
+    :param timeout: Seconds to wait
+    """
+    deadline = time.monotonic() + timeout
+    while (any(self.queued.values()) or self._sending) and time.monotonic() < deadline:
+      await asyncio.sleep(0.05)
+
+    dropped = {name: 0 for name in self.queued}
+    for queue in self._routes.values():
+      for job in queue.clear():
+        job.future.cancel()
+        self._count(job.priority, -1)
+        dropped[job.priority.name.lower()] += 1
+      if queue._worker is not None:
+        queue._worker.cancel()
+    return dropped
+
+  def _discard(self, route: Hashable, queue: RouteQueue) -> None:
+    if self._routes.get(route) is queue and queue.idle:
+      del self._routes[route]
+
+
+class ScheduledContext(commands.Context):
+  """Command context whose messages go through the outbound scheduler"""
+
+  async def send(self, *args: Any, **kwargs: Any) -> Any:
+    if self.interaction is not None:
+      return await outbound.submit(None, Priority.INTERACTION, functools.partial(super().send, *args, **kwargs))
+    return await outbound.submit(self.channel.id, Priority.REPLY, functools.partial(super().send, *args, **kwargs))
+
+class ScheduledReplies:
+  """Builds command contexts whose replies are scheduled"""
+
+  async def get_context(self, origin: Any, /, *, cls: Any = ScheduledContext) -> Any:
+    return await super().get_context(origin, cls = cls) # type: ignore
+
+
+outbound = OutboundScheduler(Config.OUTBOUND_RATE, Config.OUTBOUND_PER, Config.OUTBOUND_RESERVE)
@@ -0,0 +1,356 @@
+import os
+import json
+import time
+import yarl
+import asyncio
+import logging
+import discord
+import inspect
+from discord.gateway import DiscordWebSocket, ReconnectWebSocket
+from discord.shard import Shard
+from typing import Any, Dict, Iterable, List, Optional, Tuple, TypedDict
+
+from .config import Config
+from .timeline import timeline
+
+logger = logging.getLogger(__name__)
+
+
+class GatewaySession(TypedDict):
+  """
+  A shard's gateway session, kept for the next process
+
+  Parameters
+  ----------
+  :param session_id: The session to resume
+  :param sequence: The last sequence number received
+  :param gateway: The URL to resume on
+  :param guilds: IDs of the guilds the shard had cached
+  """
+  session_id: str
+  sequence: Optional[int]
+  gateway: str
+  guilds: List[int]
+
+
+class SessionStore:
+  """
+  Gateway sessions saved by a stopping process and read once by the next one
+
+  Discord drops a session shortly after its connection closes, sessions
+  older than `window` seconds or saved with another shard count are discarded
+  """
+
+  path: str
+  window: float
+
+  def __init__(self, path: str, window: float = 60) -> None:
+    """
+    Initializes a SessionStore
+
+    Parameters
+    ----------
+    :param path: The JSON file holding the sessions
+    :param window: Seconds a saved session is considered resumable
+    """
+    self.path = path
+    self.window = window
+
+  def save(self, sessions: Dict[int, GatewaySession], shard_count: Optional[int]) -> None:
+    """
+    Saves sessions, replacing the saved ones
+
+    Parameters
+    ----------
+    :param sessions: Sessions by shard ID
+    :param shard_count: The shard count the sessions identified with
+    """
+    temporary = f'{self.path}.tmp'
+    with open(temporary, 'w') as file:
+      json.dump({'saved': time.time(), 'shard_count': shard_count, 'sessions': sessions}, file)
+    os.replace(temporary, self.path)
+
+  def take(self, shard_count: Optional[int] = None) -> Tuple[Optional[int], Dict[int, GatewaySession]]:
+    """
+    Returns the saved shard count and the resumable sessions by shard ID, a session is only returned once
+
+    Parameters
+    ----------
+    :param shard_count: The shard count to resume with, None accepts the saved one
+    """
+    try:
+      with open(self.path) as file:
+        state = json.load(file)
+    except FileNotFoundError:
+      return shard_count, {}
+    except (OSError, ValueError):
+      logger.warning('Discarding unreadable gateway sessions [%s]', self.path)
+      state = {}
+    finally:
+      try:
+        os.remove(self.path)
+      except OSError:
+        pass
+
+    age = time.time() - state.get('saved', 0)
+    if age > self.window:
+      if state:
+        logger.info('Gateway sessions are %.0fs old, identifying', age)
+      return shard_count, {}
+    if shard_count is not None and state['shard_count'] != shard_count:
+      logger.info('Shard count changed from %s to %s, identifying', state['shard_count'], shard_count)
+      return shard_count, {}
+    return state['shard_count'], {int(shard_id): session for shard_id, session in state['sessions'].items()}
+
+
+# Resuming relies on discord.py internals, all of them are reached through the functions below.
+# They are unchanged from 2.3 through 2.7, other versions identify as usual.
+_SUPPORTED_VERSIONS = ((2, 3), (2, 7))
+
+def _resume_supported(client: Any) -> bool:
+  """
+  Returns whether the internals used to resume exist for the installed discord.py
+
+  Parameters
+  ----------
+  :param client: The client about to connect
+  """
+  low, high = _SUPPORTED_VERSIONS
+  if not low <= tuple(discord.version_info[:2]) <= high:
+    return False
+  state = getattr(client, '_connection', None)
+  ready = getattr(client, '_ready', None)
+  resume = inspect.signature(DiscordWebSocket.from_client).parameters
+  return (
+    hasattr(state, '_add_guild_from_data') and hasattr(state, '_guild_needs_chunking')
+    and isinstance(ready, asyncio.Event) and {'gateway', 'session', 'sequence', 'resume'} <= resume.keys()
+    and (not isinstance(client, discord.AutoShardedClient) or (
+      hasattr(client, '_AutoShardedClient__shards') and hasattr(client, '_AutoShardedClient__queue')
+    ))
+  )
+
+def _shards(client: Any) -> Dict[int, Shard]:
+  # AutoShardedClient keeps its Shard objects in a name mangled attribute
+  return client._AutoShardedClient__shards
+
+def _launch_resumed_shard(client: Any, shard_id: int, ws: DiscordWebSocket) -> None:
+  # As AutoShardedClient.launch_shard does with an identified socket, the shard resumes again on reconnects
+  _shards(client)[shard_id] = shard = Shard(ws, client, client._AutoShardedClient__queue.put_nowait)
+  shard.launch()
+
+def _add_guild(client: Any, data: Any) -> None:
+  client._connection._add_guild_from_data(data)
+
+def _needs_chunking(client: Any, guild: discord.Guild) -> bool:
+  return client._connection._guild_needs_chunking(guild)
+
+def _mark_ready(client: Any) -> None:
+  # Without READY discord.py never sets the event is_ready and wait_until_ready read
+  client._ready.set()
+
+
+def _keep_resumable(ws: DiscordWebSocket) -> None:
+  # Discord invalidates sessions closed with 1000 or 1001, discord.py closes with 1000 on shutdown
+  close = ws.close
+  async def resumable_close(code: int = 4000) -> None:
+    await close(code = 4000)
+  ws.close = resumable_close # type: ignore
+
+
+class SessionResume:
+  """
+  Resumes the gateway sessions of the previous process instead of identifying
+
+  Sessions are saved on close. On start, the guilds they had cached are
+  fetched over REST before resuming, Discord then only replays the events
+  missed in between instead of sending every guild again. When a session
+  cannot be resumed the client identifies as usual.
+  """
+
+  _sessions: Dict[int, GatewaySession]
+  _resumed_ready: Optional['asyncio.Task[None]'] = None
+
+  @property
+  def _sharded(self) -> bool:
+    return isinstance(self, discord.AutoShardedClient)
+
+  def _gateway_sockets(self) -> Dict[int, DiscordWebSocket]:
+    if self._sharded:
+      return {shard_id: shard.ws for shard_id, shard in _shards(self).items()}
+    return {0: self.ws} if self.ws is not None else {} # type: ignore
+
+  def _shard_ids(self) -> Iterable[int]:
+    if not self._sharded:
+      return [0]
+    return self.shard_ids or range(self.shard_count or 0) # type: ignore
+
+
+  async def close(self) -> None:
+    if self._resumed_ready:
+      self._resumed_ready.cancel()
+    if not Config.RESUME_SESSIONS or self.is_closed() or not self.is_ready() or not _resume_supported(self): # type: ignore
+      return await super().close() # type: ignore
+
+    sockets = {shard_id: ws for shard_id, ws in self._gateway_sockets().items() if ws.open and ws.session_id}
+    for ws in sockets.values():
+      _keep_resumable(ws)
+    await super().close() # type: ignore
+
+    # Read after closing, no events arrive once the sockets are closed
+    sessions = {
+      shard_id: GatewaySession(
+        session_id = ws.session_id, # type: ignore
+        sequence = ws.sequence,
+        gateway = str(ws.gateway),
+        guilds = [guild.id for guild in self.guilds if guild.shard_id == shard_id] # type: ignore
+      )
+      for shard_id, ws in sockets.items()
+    }
+    try:
+      session_store.save(sessions, self.shard_count) # type: ignore
+      logger.info('Saved %d gateway session(s) for the next start', len(sessions))
+    except OSError:
+      logger.exception('Failed to save gateway sessions')
+
+
+  async def connect(self, *, reconnect: bool = True) -> None:
+    self._sessions = {}
+    if Config.RESUME_SESSIONS and not _resume_supported(self):
+      logger.warning('Resuming gateway sessions is not supported with discord.py %s, identifying', discord.__version__)
+    elif Config.RESUME_SESSIONS:
+      try:
+        await self._restore()
+      except Exception:
+        # Guilds restored so far are replaced by those of READY
+        logger.exception('Failed to restore gateway sessions, identifying')
+        self._sessions = {}
+
+    if self._sessions and not self._sharded:
+      await self._connect_resumed(self._sessions.pop(0))
+      if self.is_closed(): # type: ignore
+        return
+    await super().connect(reconnect = reconnect) # type: ignore
+
+  async def _restore(self) -> None:
+    shard_count, sessions = session_store.take(self.shard_count) # type: ignore
+    if not sessions:
+      return
+    if self._sharded and self.shard_count is None: # type: ignore
+      self.shard_count = shard_count
+
+    # A partly resumed client would never become ready, resume every shard or none
+    shard_ids = set(self._shard_ids())
+    if set(sessions) != shard_ids:
+      logger.info('Saved sessions cover shards %s instead of %s, identifying', sorted(sessions), sorted(shard_ids))
+      return
+    guild_ids = [guild_id for session in sessions.values() for guild_id in session['guilds']]
+    if len(guild_ids) > Config.SESSION_RESUME_MAX_GUILDS:
+      logger.info('%d guilds are cheaper to receive by identifying', len(guild_ids))
+      return
+
+    with timeline.span('session restore'):
+      await self._hydrate(guild_ids)
+    self._sessions = sessions
+    self._resumed_ready = asyncio.create_task(self._ready_when_resumed(shard_ids))
+
+  async def _hydrate(self, guild_ids: List[int]) -> None:
+    # Resumed sessions receive no GUILD_CREATE, guilds are fetched as identifying would have sent them
+    http = self.http # type: ignore
+    limit = asyncio.Semaphore(5)
+
+    async def fetch(guild_id: int) -> None:
+      async with limit:
+        try:
+          data: Any = await http.get_guild(guild_id, with_counts = True)
+          data['member_count'] = data.get('approximate_member_count')
+          data['channels'] = await http.get_all_guild_channels(guild_id)
+          data['members'] = [await http.get_member(guild_id, self.user.id)] # type: ignore
+          threads = await http.get_active_threads(guild_id)
+          joined = {member['id']: member for member in threads.get('members', [])}
+          data['threads'] = [{**thread, 'member': joined[thread['id']]} if thread['id'] in joined else thread for thread in threads['threads']]
+        except discord.HTTPException as e:
+          logger.info('Skipping guild [%s] while restoring the session: %s', guild_id, e)
+          return
+      _add_guild(self, data)
+
+    await asyncio.gather(*(fetch(guild_id) for guild_id in guild_ids))
+
+  async def _chunk_restored(self) -> None:
+    # Identifying chunks guilds before READY when chunk_guilds_at_startup is set, restored guilds only hold the bot
+    guilds = [guild for guild in self.guilds if _needs_chunking(self, guild)] # type: ignore
+    if not guilds:
+      return
+    with timeline.span('session chunk'):
+      results = await asyncio.gather(*(asyncio.wait_for(guild.chunk(), timeout = 60) for guild in guilds), return_exceptions = True)
+    failed = sum(isinstance(result, BaseException) for result in results)
+    if failed:
+      logger.warning('Failed to chunk %d of %d restored guild(s)', failed, len(guilds))
+
+  async def _resume(self, session: GatewaySession, shard_id: Optional[int]) -> DiscordWebSocket:
+    return await DiscordWebSocket.from_client(
+      self, # type: ignore
+      gateway = yarl.URL(session['gateway']),
+      shard_id = shard_id,
+      session = session['session_id'],
+      sequence = session['sequence'],
+      resume = True
+    )
+
+  async def _connect_resumed(self, session: GatewaySession) -> None:
+    # Keeps resuming while Discord allows it, any other disconnect is left to discord.py, which identifies
+    while not self.is_closed(): # type: ignore
+      try:
+        self.ws = await asyncio.wait_for(self._resume(session, self.shard_id), timeout = 60) # type: ignore
+        while True:
+          await self.ws.poll_event()
+      except ReconnectWebSocket as e:
+        self.dispatch('disconnect') # type: ignore
+        if not e.resume:
+          logger.info('Gateway session was invalidated, identifying')
+          return
+        session = GatewaySession(session_id = self.ws.session_id, sequence = self.ws.sequence, gateway = str(self.ws.gateway), guilds = [])
+      except Exception as e:
+        if not self.is_closed(): # type: ignore
+          logger.info('Resumed gateway connection ended [%r], identifying', e)
+          self.dispatch('disconnect') # type: ignore
+        return
+
+  async def launch_shard(self, gateway: yarl.URL, shard_id: int, *, initial: bool = False) -> None:
+    session = self._sessions.pop(shard_id, None)
+    if session is None:
+      return await super().launch_shard(gateway, shard_id, initial = initial) # type: ignore
+
+    try:
+      ws = await asyncio.wait_for(self._resume(session, shard_id), timeout = 60)
+    except Exception:
+      logger.warning('Failed to resume shard %d, identifying', shard_id, exc_info = True)
+      return await super().launch_shard(gateway, shard_id, initial = initial) # type: ignore
+
+    _launch_resumed_shard(self, shard_id, ws)
+
+  async def _ready_when_resumed(self, shard_ids: Iterable[int]) -> None:
+    # The client is marked ready once every shard resumed
+    pending = set(shard_ids)
+    count = len(pending)
+    try:
+      while pending:
+        if self._sharded:
+          pending.discard(await self.wait_for('shard_resumed', timeout = 60)) # type: ignore
+        else:
+          await self.wait_for('resumed', timeout = 60) # type: ignore
+          pending.clear()
+    except asyncio.TimeoutError:
+      logger.warning('Shards %s did not resume, waiting for them to identify', sorted(pending))
+      return
+
+    if not self.is_ready(): # type: ignore
+      await self._chunk_restored()
+      logger.info('Resumed %d gateway session(s) with %d guild(s)', count, len(self.guilds)) # type: ignore
+      _mark_ready(self)
+      self.dispatch('ready') # type: ignore
+
+
+session_store = SessionStore(
+  Config.CLUSTERS > 1 and f'{Config.SESSION_PATH}.{Config.CLUSTER_ID}' or Config.SESSION_PATH,
+  Config.SESSION_RESUME_WINDOW
+)
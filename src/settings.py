@@ -0,0 +1,242 @@
+import json
+import sqlite3
+import asyncio
+import logging
+import discord
+import concurrent.futures
+from discord.ext import commands
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from .config import Config
+from .check import CompiledClauses, PermissionGate
+
+logger = logging.getLogger(__name__)
+
+PermissionOverrides = Dict[str, List[Union[PermissionGate, List[PermissionGate]]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS guild_settings (
+  guild_id INTEGER PRIMARY KEY,
+  prefix TEXT,
+  welcome_channel_id INTEGER,
+  rule_channel_id INTEGER,
+  permission_overrides TEXT
+)
+"""
+_COLUMNS = ('guild_id', 'prefix', 'welcome_channel_id', 'rule_channel_id', 'permission_overrides')
+
+
+class GuildSettings:
+  """
+  Settings of one guild, with defaults applied
+  """
+
+  __slots__ = ('guild_id', 'prefix', 'welcome_channel_id', 'rule_channel_id', 'permission_overrides', 'prefixes', 'stored', '_compiled')
+
+  guild_id: Optional[int]
+  prefix: str
+  welcome_channel_id: Optional[int]
+  rule_channel_id: Optional[int]
+  permission_overrides: PermissionOverrides
+  prefixes: Tuple[str, ...]
+  stored: Dict[str, Any]
+  _compiled: Dict[str, CompiledClauses]
+
+  def __init__(
+    self,
+    guild_id: Optional[int],
+    prefix: Optional[str] = None,
+    welcome_channel_id: Optional[int] = None,
+    rule_channel_id: Optional[int] = None,
+    permission_overrides: Optional[PermissionOverrides] = None
+  ) -> None:
+    """
+    Initializes GuildSettings, unset values fall back to the configuration
+
+    Parameters
+    ----------
+    :param guild_id: The guild, None for direct messages
+    :param prefix: The command prefix
+    :param welcome_channel_id: Where new members are welcomed
+    :param rule_channel_id: The channel new members are pointed to
+    :param permission_overrides: Permission gates replacing a command's own, by qualified command name
+    """
+    configured = guild_id == Config.GUILD_ID
+    self.stored = {
+      'prefix': prefix, 'welcome_channel_id': welcome_channel_id,
+      'rule_channel_id': rule_channel_id, 'permission_overrides': permission_overrides or None
+    }
+    self.guild_id = guild_id
+    self.prefix = prefix or Config.COMMAND_PREFIX
+    self.welcome_channel_id = welcome_channel_id or (configured and Config.WELCOME_CHANNEL_ID or None)
+    self.rule_channel_id = rule_channel_id or (configured and Config.RULE_CHANNEL_ID or None)
+    self.permission_overrides = permission_overrides or {}
+    self.prefixes = (self.prefix,)
+    self._compiled = {}
+
+  def override(self, command: str) -> Optional[CompiledClauses]:
+    """
+    Returns the compiled permission override of a command, if any
+
+    Parameters
+    ----------
+    :param command: The command's qualified name
+    """
+    compiled = self._compiled.get(command)
+    if compiled is None and command in self.permission_overrides:
+      compiled = self._compiled[command] = CompiledClauses(*self.permission_overrides[command])
+    return compiled
+
+  def row(self) -> Tuple[Any, ...]:
+    """The explicitly set values, in column order"""
+    overrides = self.stored['permission_overrides']
+    return (
+      self.guild_id, self.stored['prefix'], self.stored['welcome_channel_id'],
+      self.stored['rule_channel_id'], overrides and json.dumps(overrides) or None
+    )
+
+  @classmethod
+  def from_row(cls, row: Sequence[Any]) -> 'GuildSettings':
+    guild_id, prefix, welcome_channel_id, rule_channel_id, permission_overrides = row
+    return cls(guild_id, prefix, welcome_channel_id, rule_channel_id, permission_overrides and json.loads(permission_overrides))
+
+
+class SettingsStore:
+  """
+  Per-guild settings stored in SQLite
+
+  Every guild is loaded at startup, reads are answered from memory and
+  writes go to the database on a dedicated thread before the cached
+  settings are replaced
+  """
+
+  path: str
+  _cache: Dict[Optional[int], GuildSettings]
+  _executor: Optional[concurrent.futures.ThreadPoolExecutor]
+  _connection: Optional[sqlite3.Connection]
+  _lock: asyncio.Lock
+
+  def __init__(self, path: str) -> None:
+    """
+    Initializes a SettingsStore
+
+    Parameters
+    ----------
+    :param path: The SQLite database file
+    """
+    self.path = path
+    self._cache = {}
+    self._executor = None
+    self._connection = None
+    self._lock = asyncio.Lock()
+
+  def __len__(self) -> int:
+    return len(self._cache)
+
+  async def _run(self, function, *args) -> Any:
+    if self._executor is None:
+      raise RuntimeError('Settings store is not open')
+    return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+
+  async def open(self) -> None:
+    """Opens the database and loads every guild's settings"""
+    if self._executor is not None:
+      return
+    self._executor = concurrent.futures.ThreadPoolExecutor(max_workers = 1, thread_name_prefix = 'settings')
+    rows = await self._run(self._open)
+    self._cache = {row[0]: GuildSettings.from_row(row) for row in rows}
+    logger.info('Loaded settings of %d guild(s)', len(rows))
+
+  def _open(self) -> List[Tuple[Any, ...]]:
+    self._connection = sqlite3.connect(self.path)
+    self._connection.execute('PRAGMA journal_mode = WAL')
+    self._connection.execute(_SCHEMA)
+    return self._connection.execute(f'SELECT {", ".join(_COLUMNS)} FROM guild_settings').fetchall()
+
+  async def close(self) -> None:
+    if self._executor is None:
+      return
+    await self._run(self._close)
+    self._executor.shutdown()
+    self._executor = None
+
+  def _close(self) -> None:
+    if self._connection:
+      self._connection.close()
+    self._connection = None
+
+
+  def get(self, guild_id: Optional[int]) -> GuildSettings:
+    """
+    Returns a guild's settings from memory
+
+    Parameters
+    ----------
+    :param guild_id: The guild, None for direct messages
+    """
+    settings = self._cache.get(guild_id)
+    if settings is None:
+      settings = self._cache[guild_id] = GuildSettings(guild_id)
+    return settings
+
+  def command_prefix(self, bot: commands.Bot, message: discord.Message) -> str:
+    """Answers the bot's prefix lookups"""
+    return self.get(message.guild and message.guild.id).prefix
+
+  def prefixes(self, message: discord.Message) -> Tuple[str, ...]:
+    """Answers the message pre-filter's prefix lookups"""
+    return self.get(message.guild and message.guild.id).prefixes
+
+  def permission_override(self, guild_id: int, command: str) -> Optional[CompiledClauses]:
+    """Answers permission checks' override lookups"""
+    settings = self._cache.get(guild_id)
+    return settings and settings.override(command)
+
+
+  async def update(self, guild_id: int, **changes: Any) -> GuildSettings:
+    """
+    Changes a guild's settings, None resets a value to its default
+
+    Parameters
+    ----------
+    :param guild_id: The guild
+    :param changes: New values of prefix, welcome_channel_id, rule_channel_id or permission_overrides
+    """
+    unknown = set(changes) - set(_COLUMNS[1:])
+    if unknown:
+      raise ValueError(f'Unknown settings {", ".join(sorted(unknown))}')
+
+    # Only explicit values are stored, guilds left unset follow the configuration
+    async with self._lock:
+      current = self._cache.get(guild_id)
+      settings = GuildSettings(guild_id, **{**(current and current.stored or {}), **changes})
+      await self._run(self._write, settings.row())
+      self._cache[guild_id] = settings
+    return settings
+
+  def _write(self, row: Tuple[Any, ...]) -> None:
+    with self._connection: # type: ignore
+      self._connection.execute( # type: ignore
+        f'INSERT OR REPLACE INTO guild_settings ({", ".join(_COLUMNS)}) VALUES (?, ?, ?, ?, ?)', row
+      )
+
+  async def reload(self, guild_id: int) -> GuildSettings:
+    """
+    Re-reads a guild's settings, after another process changed them
+
+    Parameters
+    ----------
+    :param guild_id: The guild
+    """
+    row = await self._run(self._read, guild_id)
+    settings = self._cache[guild_id] = row and GuildSettings.from_row(row) or GuildSettings(guild_id)
+    return settings
+
+  def _read(self, guild_id: int) -> Optional[Tuple[Any, ...]]:
+    return self._connection.execute( # type: ignore
+      f'SELECT {", ".join(_COLUMNS)} FROM guild_settings WHERE guild_id = ?', (guild_id,)
+    ).fetchone()
+
+
+settings = SettingsStore(Config.SETTINGS_PATH)
@@ -0,0 +1,207 @@
+import time
+import signal
+import asyncio
+import logging
+from contextlib import contextmanager
+from discord import app_commands
+from discord.ext import commands
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple
+
+from .config import Config
+from .outbound import outbound
+from .utils import ViewPageScroller
+
+logger = logging.getLogger(__name__)
+
+
+def on_stop_signal(callback: Callable[[], None]) -> None:
+  """
+  Calls back on SIGTERM and SIGINT instead of raising KeyboardInterrupt
+
+  Parameters
+  ----------
+  :param callback: Called on every signal
+  """
+  loop = asyncio.get_running_loop()
+  for signum in (signal.SIGTERM, signal.SIGINT):
+    try:
+      loop.add_signal_handler(signum, callback)
+    except NotImplementedError:
+      # Windows event loops have no signal handlers, Ctrl+C still raises KeyboardInterrupt
+      pass
+
+
+class Drain:
+  """
+  Graceful shutdown for rolling restarts
+
+  On SIGTERM or SIGINT the client stops taking commands, disables live
+  paginated views and waits up to `timeout` seconds for running commands,
+  registered queues and outbound sends before disconnecting. Whatever is
+  left at the deadline is logged and cut off. A second signal skips the wait.
+  """
+
+  timeout: float
+  draining: bool
+  forced: bool
+  _running: Dict['asyncio.Task[Any]', Tuple[str, float]]
+  _queues: Dict[str, Tuple[Callable[[], Awaitable[Any]], Callable[[], int]]]
+  _stop: Optional[asyncio.Event]
+
+  def __init__(self, timeout: float = 20) -> None:
+    """
+    Initializes a Drain
+
+    Parameters
+    ----------
+    :param timeout: Seconds to wait for running work once stopping
+    """
+    self.timeout = timeout
+    self.draining = False
+    self.forced = False
+    self._running = {}
+    self._queues = {}
+    self._stop = None
+
+  @contextmanager
+  def track(self, name: str) -> Iterator[None]:
+    """
+    Marks the current task as running a command until the block exits
+
+    Parameters
+    ----------
+    :param name: The command's qualified name
+    """
+    task = asyncio.current_task()
+    if task is None:
+      yield
+      return
+    self._running[task] = (name, time.monotonic())
+    try:
+      yield
+    finally:
+      self._running.pop(task, None)
+
+  def register(self, name: str, wait: Callable[[], Awaitable[Any]], pending: Callable[[], int]) -> None:
+    """
+    Waits for a queue to empty while draining
+
+    Parameters
+    ----------
+    :param name: Names the queue in logs
+    :param wait: Returns once everything queued was handled
+    :param pending: Returns the number of queued items, logged when cut off
+    """
+    self._queues[name] = (wait, pending)
+
+  def unregister(self, name: str) -> None:
+    self._queues.pop(name, None)
+
+
+  def stop(self) -> None:
+    """Starts draining, a second call skips waiting for running work"""
+    if self._stop is None or not self._stop.is_set():
+      logger.info('Stopping, draining for up to %.0fs', self.timeout)
+      self._stopper().set()
+    elif not self.forced:
+      logger.warning('Stopping again, cutting off running work')
+      self.forced = True
+
+  def _stopper(self) -> asyncio.Event:
+    if self._stop is None:
+      self._stop = asyncio.Event()
+    return self._stop
+
+  async def serve(self, client: commands.Bot, connect: Awaitable[None]) -> None:
+    """
+    Runs the connection until it ends or a stop signal arrives, then drains and closes the client
+
+    Parameters
+    ----------
+    :param client: The client
+    :param connect: Runs the gateway connection
+    """
+    on_stop_signal(self.stop)
+    connection = asyncio.ensure_future(connect)
+    stopping = asyncio.ensure_future(self._stopper().wait())
+    try:
+      await asyncio.wait((connection, stopping), return_when = asyncio.FIRST_COMPLETED)
+    finally:
+      stopping.cancel()
+    if connection.done():
+      return connection.result()
+
+    await self.drain()
+    await client.close()
+    await connection
+
+  async def drain(self) -> None:
+    """Stops taking commands and waits for running work until the deadline"""
+    self.draining = True
+    deadline = time.monotonic() + self.timeout
+
+    # Buttons of views only this process knows about stop working once it exits
+    views = [asyncio.ensure_future(view.disable('restart')) for view in ViewPageScroller.live()]
+    logger.info(
+      'Draining %d command(s), %d view(s) and %d queued send(s)',
+      len(self._running), len(views), sum(outbound.queued.values())
+    )
+
+    await self._until(lambda: not self._running, deadline)
+    now = time.monotonic()
+    for task, (name, started) in list(self._running.items()):
+      logger.warning('Cut off command [%s] running for %.1fs', name, now - started)
+      task.cancel()
+
+    for name, (wait, pending) in list(self._queues.items()):
+      try:
+        await asyncio.wait_for(wait(), self._remaining(deadline))
+      except asyncio.TimeoutError:
+        logger.warning('Cut off %d queued %s', pending(), name)
+
+    dropped = await outbound.drain(self._remaining(deadline))
+    for priority, count in dropped.items():
+      if count:
+        logger.warning('Dropped %d queued %s send(s)', count, priority)
+    if outbound.sending:
+      logger.warning('Cut off %d send(s) in flight', outbound.sending)
+
+    failed = sum(1 for view in views if not view.done() or view.cancelled() or view.exception())
+    if failed:
+      logger.warning('Left %d view(s) with live buttons', failed)
+    for view in views:
+      view.cancel()
+
+  def _remaining(self, deadline: float) -> float:
+    return 0 if self.forced else max(deadline - time.monotonic(), 0)
+
+  async def _until(self, done: Callable[[], bool], deadline: float) -> None:
+    while not done() and self._remaining(deadline) > 0:
+      await asyncio.sleep(0.05)
+
+
+class DrainingTree(app_commands.CommandTree):
+  """Ignores app commands while draining, another instance answers them"""
+
+  async def _call(self, interaction: Any) -> None:
+    if drain.draining:
+      return
+    name = interaction.command and interaction.command.qualified_name or '-'
+    with drain.track(name):
+      await super()._call(interaction)
+
+class DrainingCommands:
+  """Ignores commands while draining and tracks the running ones"""
+
+  def __init__(self, *args: Any, **kwargs: Any) -> None:
+    kwargs.setdefault('tree_cls', DrainingTree)
+    super().__init__(*args, **kwargs)
+
+  async def invoke(self, ctx: commands.Context) -> None:
+    if drain.draining:
+      return
+    with drain.track(ctx.command and ctx.command.qualified_name or '-'):
+      await super().invoke(ctx) # type: ignore
+
+
+drain = Drain(Config.SHUTDOWN_TIMEOUT)
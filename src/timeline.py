@@ -0,0 +1,65 @@
+import time
+from contextlib import contextmanager
+from typing import List, Tuple, Optional, Iterator
+
+
+class Timeline:
+  """
+  Startup timeline
+
+  Records when startup steps began and how long they took, relative to
+  when this module was first imported
+  """
+
+  origin: float
+  events: List[Tuple[str, float, Optional[float]]]
+
+  def __init__(self) -> None:
+    self.origin = time.perf_counter()
+    self.events = []
+
+  def has(self, label: str) -> bool:
+    """
+    Whether a step was recorded
+
+    Parameters
+    ----------
+    :param label: The step's label
+    """
+    return any(event[0] == label for event in self.events)
+
+  def mark(self, label: str) -> None:
+    """
+    Records an instant
+
+    Parameters
+    ----------
+    :param label: What happened
+    """
+    self.events.append((label, time.perf_counter() - self.origin, None))
+
+  @contextmanager
+  def span(self, label: str) -> Iterator[None]:
+    """
+    Records how long the body took
+
+    Parameters
+    ----------
+    :param label: What is being timed
+    """
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      end = time.perf_counter()
+      self.events.append((label, start - self.origin, end - start))
+
+  def format(self) -> str:
+    """Formats the timeline in start order"""
+    return '\n'.join(
+      f'{start * 1000:>9.1f}ms  {label}' + (f' ({duration * 1000:.1f}ms)' if duration is not None else '')
+      for label, start, duration in sorted(self.events, key = lambda event: event[1])
+    )
+
+
+timeline = Timeline()
@@ -1,6 +1,20 @@
+import re
+import copy
+import time
+import bisect
+import weakref
+import functools
 import discord
+from collections import OrderedDict
 from discord.ext import commands
-from datetime import datetime
+from discord.ext.commands.view import StringView
+from datetime import datetime, timezone
+from typing import (
+  Any, NoReturn, Optional, Callable, Awaitable,
+  List, Dict, Set, Tuple, Iterable, Union
+)
+
+from .outbound import outbound, Priority
 
 
 class Embeds(discord.Embed):
@@ -10,6 +24,111 @@ class Embeds(discord.Embed):
     self.color = color or discord.Color.from_rgb(0,191,255) #Deepskyblue
 
 
+class RenderedEmbed(discord.Embed):
+  """
+  An embed whose payload was serialized ahead of time
+
+  It is stamped with the current time when created and sent as is until
+  it is changed, a changed embed is serialized like any other
+  """
+
+  __slots__ = ('_payload',)
+
+  _payload: Optional[Dict[str, Any]]
+
+  def __init__(self, template: discord.Embed, payload: Dict[str, Any]) -> None:
+    # Takes every attribute of the template, as Embed.__init__ would have set them, without marking the embed changed
+    assign = object.__setattr__
+    for slot in discord.Embed.__slots__:
+      if slot != '_timestamp' and hasattr(template, slot):
+        value = getattr(template, slot)
+        assign(self, slot, value.copy() if isinstance(value, (list, dict)) else value)
+    assign(self, '_timestamp', datetime.now(timezone.utc))
+    assign(self, '_payload', payload)
+
+  def __setattr__(self, name: str, value: Any) -> None:
+    # Setters, add_field and set_* all assign an attribute, the stored payload no longer matches
+    if name != '_payload':
+      super().__setattr__('_payload', None)
+    super().__setattr__(name, value)
+
+  def to_dict(self) -> Any:
+    if self._payload is None:
+      # Some discord.py versions serialize the slots of the embed's own class, which would only list _payload
+      embed = discord.Embed.__new__(discord.Embed)
+      for slot in discord.Embed.__slots__:
+        if hasattr(self, slot):
+          setattr(embed, slot, getattr(self, slot))
+      return embed.to_dict()
+    payload = self._payload.copy()
+    payload['timestamp'] = self.timestamp.isoformat() # type: ignore
+    return payload
+
+  def copy(self) -> discord.Embed:
+    return discord.Embed.from_dict(self.to_dict())
+
+
+class EmbedTemplates:
+  """
+  Embeds serialized once per distinct content
+
+  Templates are keyed by their content, so a changed prefix or setting
+  renders a new template on its first use and the least recently used
+  ones are dropped
+  """
+
+  maxsize: int
+  hits: int
+  misses: int
+  _templates: OrderedDict[Tuple[Tuple[str, Any], ...], Tuple[discord.Embed, Dict[str, Any]]]
+
+  def __init__(self, maxsize: int = 512) -> None:
+    """
+    Initializes EmbedTemplates
+
+    Parameters
+    ----------
+    :param maxsize: Most templates kept
+    """
+    self.maxsize = maxsize
+    self.hits = 0
+    self.misses = 0
+    self._templates = OrderedDict()
+
+  def __len__(self) -> int:
+    return len(self._templates)
+
+  def embed(self, **kwargs: Any) -> RenderedEmbed:
+    """
+    Returns an embed with the content of `Embeds(**kwargs)`, stamped with the current time
+
+    Parameters
+    ----------
+    :param kwargs: Hashable `Embeds` arguments, e.g. title, description and color
+    """
+    key = tuple(kwargs.items())
+    template = self._templates.get(key)
+    if template is None:
+      self.misses += 1
+      embed = Embeds(**kwargs)
+      payload = embed.to_dict()
+      del payload['timestamp'] # type: ignore
+      template = self._templates[key] = (embed, payload) # type: ignore
+      if len(self._templates) > self.maxsize:
+        self._templates.popitem(last = False)
+    else:
+      self.hits += 1
+      self._templates.move_to_end(key)
+    return RenderedEmbed(*template)
+
+  def clear(self) -> None:
+    """Drops every template"""
+    self._templates.clear()
+
+
+embed_templates = EmbedTemplates()
+
+
 class Error(commands.CommandError):
   def __init__(self, title: str = 'Error', description: str = '-', fields: dict = {}, **kwargs):
     self.title = title
@@ -19,23 +138,69 @@ class Error(commands.CommandError):
 
 
 class ViewPageScroller(discord.ui.View):
+  page_cache_size: int = 8
+
+  _live: 'weakref.WeakSet[ViewPageScroller]' = weakref.WeakSet()
+
   def __init__(self, *, ownerid: int, load_page, pages: list = [], timeout = None):
     self.ownerid = ownerid
     self.pages = pages
     self.current_page = 1
     self.load_page = load_page
 
+    self._rendered: OrderedDict[int, discord.Embed] = OrderedDict()
+    self._pushing = False
+    self._dirty = False
+
     super().__init__(
       timeout = timeout
     )
 
   async def send_message(self, ctx, *args, **kwargs):
-    self.message = await ctx.send(view = self, *args, **kwargs)
-    await self.update_message()
+    self.update_buttons()
+    self.message = await ctx.send(embed = self.create_embed(), view = self, *args, **kwargs)
+    ViewPageScroller._live.add(self)
+
+  @classmethod
+  def live(cls) -> List['ViewPageScroller']:
+    """Returns the sent views whose buttons still work"""
+    return [view for view in cls._live if not view.is_finished()]
 
   async def update_message(self):
     self.update_buttons()
-    await self.message.edit(embed = self.create_embed(), view = self)
+    await outbound.submit(
+      self.message.channel.id, Priority.PAGING,
+      functools.partial(self.message.edit, embed = self.create_embed(), view = self),
+      merge = ('edit', self.message.id)
+    )
+
+  async def navigate(self, interaction: discord.Interaction, page: int):
+    """
+    Moves to a page, answering the button press with the edit itself
+
+    Presses arriving while a page is still being pushed are acknowledged
+    and only the final page is pushed once the in-flight edit completes
+
+    Parameters
+    ----------
+    :param interaction: The button press
+    :param page: The page to move to
+    """
+    self.current_page = max(1, min(page, len(self.pages)))
+    if self._pushing:
+      self._dirty = True
+      await interaction.response.defer()
+      return
+
+    self._pushing = True
+    try:
+      self.update_buttons()
+      await interaction.response.edit_message(embed = self.create_embed(), view = self)
+      while self._dirty:
+        self._dirty = False
+        await self.update_message()
+    finally:
+      self._pushing = False
 
   def update_buttons(self):
     if (self.current_page == 1) and (self.current_page != len(self.pages)):
@@ -83,51 +248,693 @@ class ViewPageScroller(discord.ui.View):
       self.last_page_button.style = discord.ButtonStyle.green
 
   def create_embed(self) -> discord.Embed:
+    data = self._rendered.get(self.current_page)
+    if data is not None:
+      self._rendered.move_to_end(self.current_page)
+      # Cached pages are re-sent, a stamped page shows when it was shown again
+      if data.timestamp is not None:
+        data.timestamp = discord.utils.utcnow()
+      return data
+
     data = self.load_page(self.pages[self.current_page - 1])
     data.set_footer(text=f'Page [{self.current_page}/{len(self.pages)}]\n‍')
+
+    self._rendered[self.current_page] = data
+    if len(self._rendered) > self.page_cache_size:
+      self._rendered.popitem(last = False)
     return data
 
 
   @discord.ui.button(label="|<", style=discord.ButtonStyle.green)
   async def first_page_button(self, interaction: discord.Interaction, button: discord.ui.Button):
     if interaction.user.id != self.ownerid: return
-    await interaction.response.defer()
-    self.current_page = 1
-
-    await self.update_message()
+    await self.navigate(interaction, 1)
 
   @discord.ui.button(label="<", style=discord.ButtonStyle.primary)
   async def prev_button(self, interaction:discord.Interaction, button: discord.ui.Button):
     if interaction.user.id != self.ownerid: return
-    await interaction.response.defer()
-    self.current_page -= 1
-
-    await self.update_message()
+    await self.navigate(interaction, self.current_page - 1)
 
   @discord.ui.button(label=">", style=discord.ButtonStyle.primary)
   async def next_button(self, interaction:discord.Interaction, button: discord.ui.Button):
     if interaction.user.id != self.ownerid: return
-    await interaction.response.defer()
-    self.current_page += 1
-
-    await self.update_message()
+    await self.navigate(interaction, self.current_page + 1)
 
   @discord.ui.button(label=">|", style=discord.ButtonStyle.green)
   async def last_page_button(self, interaction:discord.Interaction, button: discord.ui.Button):
     if interaction.user.id != self.ownerid: return
-    await interaction.response.defer()
-    self.current_page = len(self.pages)
-
-    await self.update_message()
+    await self.navigate(interaction, len(self.pages))
 
   @discord.ui.button(label="Done", style=discord.ButtonStyle.blurple)
   async def done(self, interaction:discord.Interaction, button: discord.ui.Button):
-    last = self.create_embed()
+    last = self.create_embed().copy()
     last.set_footer(text=f'Page [{self.current_page}/{len(self.pages)}]\nDisabled due to user\n‍')
-    await self.message.edit(embed = last, view = None)
+    await interaction.response.edit_message(embed = last, view = None)
     self.stop()
 
   async def on_timeout(self) -> None:
-    last = self.create_embed()
-    last.set_footer(text=f'Page [{self.current_page}/{len(self.pages)}]\nDisabled due to timeout\n‍')
-    await self.message.edit(embed = last, view = None)
+    await self.disable('timeout')
+
+  async def disable(self, reason: str) -> None:
+    """
+    Stops the view and removes its buttons, noting why in the footer
+
+    Parameters
+    ----------
+    :param reason: Why the buttons stopped working
+    """
+    self.stop()
+    last = self.create_embed().copy()
+    last.set_footer(text=f'Page [{self.current_page}/{len(self.pages)}]\nDisabled due to {reason}\n‍')
+    await outbound.submit(
+      self.message.channel.id, Priority.PAGING,
+      functools.partial(self.message.edit, embed = last, view = None),
+      merge = ('edit', self.message.id)
+    )
+
+
+PageBuilder = Callable[[commands.Context, str], Awaitable[Optional[list]]]
+PageLoader = Callable[[Any], discord.Embed]
+
+class StatelessPageScroller:
+  """
+  Pagination without per-message state
+
+  The owner, target page and content key are encoded in each button's custom_id
+  and presses are handled by the PageManager cog, which rebuilds pages from the
+  shared cache or, after a restart or reload, from the source registered for the
+  content kind
+  """
+
+  prefix: str = 'pg'
+  cache_size: int = 512
+
+  _sources: Dict[str, Tuple[PageBuilder, PageLoader]] = {}
+  _cache: 'OrderedDict[Tuple[str, str, int], list]' = OrderedDict()
+
+  def __init__(self, *args, **kwargs) -> NoReturn:
+    raise NotImplementedError('Non Instantiable')
+
+  @classmethod
+  def register(cls, kind: str, build: PageBuilder, load_page: PageLoader) -> None:
+    """
+    Registers how pages of a content kind are built and rendered
+
+    Parameters
+    ----------
+    :param kind: The content kind
+    :param build: Coroutine building the page data for a context and content key
+    :param load_page: Renders page data into an embed
+    """
+    cls._sources[kind] = (build, load_page)
+
+  @classmethod
+  def unregister(cls, kind: str) -> None:
+    """
+    Unregisters a content kind and drops its cached pages
+
+    Parameters
+    ----------
+    :param kind: The content kind
+    """
+    cls._sources.pop(kind, None)
+    for cache_key in [cache_key for cache_key in cls._cache if cache_key[0] == kind]:
+      del cls._cache[cache_key]
+
+  @classmethod
+  def fits(cls, kind: str, key: str) -> bool:
+    """
+    Whether a content key fits in a button custom_id
+
+    Parameters
+    ----------
+    :param kind: The content kind
+    :param key: The content key
+    """
+    return len(cls._custom_id('first', 2**64, 9999, kind, key)) <= 100
+
+  @classmethod
+  def _custom_id(cls, action: str, owner: int, page: int, kind: str, key: str) -> str:
+    return f'{cls.prefix}:{action}:{owner}:{page}:{kind}:{key}'
+
+  @classmethod
+  def parse(cls, custom_id: str) -> Optional[Tuple[str, int, int, str, str]]:
+    """
+    Parses a pagination custom_id into (action, owner, page, kind, key)
+
+    Parameters
+    ----------
+    :param custom_id: The button's custom_id
+    """
+    parts = custom_id.split(':', 5)
+    if len(parts) != 6 or parts[0] != cls.prefix or not parts[2].isdigit() or not parts[3].isdigit():
+      return None
+    return parts[1], int(parts[2]), int(parts[3]), parts[4], parts[5]
+
+  @classmethod
+  def remember(cls, kind: str, key: str, owner: int, pages: list) -> None:
+    """
+    Stores built pages in the shared cache
+
+    Parameters
+    ----------
+    :param kind: The content kind
+    :param key: The content key
+    :param owner: The user the pages were built for
+    :param pages: The page data
+    """
+    cls._cache[(kind, key, owner)] = pages
+    cls._cache.move_to_end((kind, key, owner))
+    while len(cls._cache) > cls.cache_size:
+      cls._cache.popitem(last = False)
+
+  @classmethod
+  def create_embed(cls, kind: str, pages: list, page: int, footer: str = '') -> discord.Embed:
+    """
+    Renders a page
+
+    Parameters
+    ----------
+    :param kind: The content kind
+    :param pages: The page data
+    :param page: The page number, starting at 1
+    :param footer: Extra footer line
+    """
+    data = cls._sources[kind][1](pages[page - 1])
+    data.set_footer(text='\n'.join([f'Page [{page}/{len(pages)}]', *(footer and [footer] or []), '‍']))
+    return data
+
+  @classmethod
+  def create_view(cls, kind: str, key: str, owner: int, page: int, total: int) -> discord.ui.View:
+    """
+    Builds the navigation buttons for a page
+
+    The view is stopped before being returned so that it is never stored
+    in the client's view store
+
+    Parameters
+    ----------
+    :param kind: The content kind
+    :param key: The content key
+    :param owner: The user allowed to navigate
+    :param page: The current page number, starting at 1
+    :param total: The number of pages
+    """
+    view = discord.ui.View(timeout = None)
+    for action, label, target, style, disabled in (
+      ('first', '|<', 1, discord.ButtonStyle.green, page == 1),
+      ('prev', '<', page - 1, discord.ButtonStyle.primary, page == 1),
+      ('next', '>', page + 1, discord.ButtonStyle.primary, page == total),
+      ('last', '>|', total, discord.ButtonStyle.green, page == total),
+      ('done', 'Done', page, discord.ButtonStyle.blurple, False)
+    ):
+      view.add_item(discord.ui.Button(
+        label = label,
+        style = disabled and discord.ButtonStyle.gray or style,
+        disabled = disabled,
+        custom_id = cls._custom_id(action, owner, target, kind, key)
+      ))
+    view.stop()
+    return view
+
+  @classmethod
+  async def send_message(cls, ctx: commands.Context, kind: str, key: str, pages: list, *args, **kwargs):
+    """
+    Sends the first page of paginated content
+
+    Parameters
+    ----------
+    :param ctx: The command context
+    :param kind: The content kind
+    :param key: The content key
+    :param pages: The page data
+    """
+    cls.remember(kind, key, ctx.author.id, pages)
+    return await ctx.send(
+      embed = cls.create_embed(kind, pages, 1),
+      view = cls.create_view(kind, key, ctx.author.id, 1, len(pages)),
+      *args, **kwargs
+    )
+
+  @classmethod
+  async def handle(cls, interaction: discord.Interaction) -> bool:
+    """
+    Handles a pagination button press, returns whether it was one
+
+    Parameters
+    ----------
+    :param interaction: The component interaction
+    """
+    parsed = cls.parse(str((interaction.data or {}).get('custom_id', '')))
+    if not parsed: return False
+
+    action, owner, page, kind, key = parsed
+    if interaction.user.id != owner: return True
+
+    pages = cls._cache.get((kind, key, owner))
+    if pages is not None:
+      cls._cache.move_to_end((kind, key, owner))
+    elif kind in cls._sources and interaction.message:
+      pages = await cls._sources[kind][0](component_context(interaction), key)
+      if pages:
+        cls.remember(kind, key, owner, pages)
+
+    if not pages:
+      await interaction.response.edit_message(view = None)
+      return True
+
+    page = max(1, min(page, len(pages)))
+    if action == 'done':
+      await interaction.response.edit_message(
+        embed = cls.create_embed(kind, pages, page, 'Disabled due to user'),
+        view = None
+      )
+    else:
+      await interaction.response.edit_message(
+        embed = cls.create_embed(kind, pages, page),
+        view = cls.create_view(kind, key, owner, page, len(pages))
+      )
+    return True
+
+
+def component_context(interaction: discord.Interaction) -> commands.Context:
+  """
+  Builds a command context for the user of a component interaction
+
+  Parameters
+  ----------
+  :param interaction: The component interaction
+  """
+  message = copy.copy(interaction.message)
+  message.author = interaction.user # type: ignore
+  return commands.Context(
+    message = message, # type: ignore
+    bot = interaction.client, # type: ignore
+    view = StringView(''),
+    interaction = interaction
+  )
+
+
+class SearchIndex:
+  """
+  Ranked name lookup for autocompletes
+
+  Names are kept sorted for prefix lookups and trigram-indexed for
+  substring and fuzzy lookups, results are ranked exact, prefix,
+  substring then fuzzy
+  """
+
+  _names: List[str]
+  _lower: List[str]
+  _sorted: List[Tuple[str, int]]
+  _trigrams: Dict[str, Set[int]]
+  _gram_counts: List[int]
+
+  def __init__(self, names: Iterable[str] = ()) -> None:
+    """
+    Builds a SearchIndex
+
+    Parameters
+    ----------
+    :param names: Names to index, duplicates are ignored case-insensitively
+    """
+    self._names = []
+    self._lower = []
+    seen: Set[str] = set()
+    for name in names:
+      if name.lower() in seen: continue
+      seen.add(name.lower())
+      self._names.append(name)
+      self._lower.append(name.lower())
+
+    self._sorted = sorted((lower, i) for i, lower in enumerate(self._lower))
+    self._trigrams = {}
+    self._gram_counts = []
+    for i, lower in enumerate(self._lower):
+      grams = self._grams(lower)
+      self._gram_counts.append(len(grams))
+      for gram in grams:
+        self._trigrams.setdefault(gram, set()).add(i)
+
+  def __len__(self) -> int:
+    return len(self._names)
+
+  @staticmethod
+  def _grams(value: str) -> Set[str]:
+    padded = f'  {value} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+  def search(self, query: str, limit: int = 25, fuzzy: float = 0.3) -> List[str]:
+    """
+    Returns up to `limit` names ranked by how well they match
+
+    Parameters
+    ----------
+    :param query: The partial name
+    :param limit: Maximum number of names returned
+    :param fuzzy: Minimum trigram similarity for fuzzy matches
+    """
+    query = query.lower().strip()
+    if not query:
+      return self._names[:limit]
+
+    results: List[int] = []
+    seen: Set[int] = set()
+    def take(ids: Iterable[int]) -> bool:
+      for i in ids:
+        if i in seen: continue
+        seen.add(i)
+        results.append(i)
+        if len(results) >= limit:
+          return True
+      return False
+
+    # Exact and prefix matches are a contiguous range of the sorted names
+    start = bisect.bisect_left(self._sorted, (query, -1))
+    end = bisect.bisect_left(self._sorted, (query + '\uffff', -1))
+    prefixed = sorted(self._sorted[start:end], key = lambda item: (len(item[0]), item[0]))
+    if take(i for _, i in prefixed):
+      return [self._names[i] for i in results]
+
+    # Substring candidates share every trigram of the query
+    grams = self._grams(query)
+    inner = {query[i:i + 3] for i in range(len(query) - 2)}
+    if inner:
+      candidates = set.intersection(*(self._trigrams.get(gram, set()) for gram in inner))
+    else:
+      candidates = set(range(len(self._names)))
+    substring = sorted(
+      (i for i in candidates if i not in seen and query in self._lower[i]),
+      key = lambda i: (self._lower[i].index(query), len(self._lower[i]), self._lower[i])
+    )
+    if take(substring):
+      return [self._names[i] for i in results]
+
+    # Fuzzy matches ranked by trigram similarity
+    shared: Dict[int, int] = {}
+    for gram in grams:
+      for i in self._trigrams.get(gram, ()):
+        if i not in seen:
+          shared[i] = shared.get(i, 0) + 1
+    scored = sorted(
+      (
+        (count / (len(grams) + self._gram_counts[i] - count), i)
+        for i, count in shared.items()
+      ),
+      key = lambda item: (-item[0], self._lower[item[1]])
+    )
+    take(i for score, i in scored if score >= fuzzy)
+    return [self._names[i] for i in results]
+
+
+class GuildEmojis:
+  """
+  Custom emojis of one guild keyed by name, lowercase name and ID
+  """
+
+  __slots__ = ('by_name', 'by_lower', 'by_id', '_names')
+
+  by_name: Dict[str, discord.Emoji]
+  by_lower: Dict[str, discord.Emoji]
+  by_id: Dict[int, discord.Emoji]
+  _names: Optional[SearchIndex]
+
+  def __init__(self, emojis: Iterable[discord.Emoji]) -> None:
+    self.by_name = {}
+    self.by_lower = {}
+    self.by_id = {}
+    self._names = None
+    for emoji in emojis:
+      self.by_name.setdefault(emoji.name, emoji)
+      self.by_lower.setdefault(emoji.name.lower(), emoji)
+      self.by_id[emoji.id] = emoji
+
+  @property
+  def names(self) -> SearchIndex:
+    """Name search index, built on first use"""
+    if self._names is None:
+      self._names = SearchIndex(self.by_name)
+    return self._names
+
+
+class EmojiIndex:
+  """
+  Per-guild custom emoji lookup
+
+  Guilds are indexed on first lookup and re-indexed when their emojis
+  are updated
+  """
+
+  _guilds: Dict[int, GuildEmojis]
+
+  def __init__(self) -> None:
+    self._guilds = {}
+
+  def __len__(self) -> int:
+    return len(self._guilds)
+
+  def guild(self, guild: discord.Guild) -> GuildEmojis:
+    """
+    Returns the index of a guild, building it if needed
+
+    Parameters
+    ----------
+    :param guild: The guild
+    """
+    emojis = self._guilds.get(guild.id)
+    if emojis is None:
+      emojis = self._guilds[guild.id] = GuildEmojis(guild.emojis)
+    return emojis
+
+  def update(self, guild: discord.Guild, emojis: Iterable[discord.Emoji]) -> None:
+    """
+    Re-indexes a guild
+
+    Parameters
+    ----------
+    :param guild: The guild
+    :param emojis: Every custom emoji of the guild
+    """
+    self._guilds[guild.id] = GuildEmojis(emojis)
+
+  def invalidate(self, guild_id: Optional[int] = None) -> None:
+    """
+    Drops the index of a guild, or of every guild
+
+    Parameters
+    ----------
+    :param guild_id: The guild, None for all
+    """
+    if guild_id is None:
+      self._guilds.clear()
+    else:
+      self._guilds.pop(guild_id, None)
+
+  def get(self, guild: discord.Guild, query: str) -> Optional[discord.Emoji]:
+    """
+    Resolves a custom emoji by name, ``:name:``, mention or ID
+
+    Exact names take precedence over IDs, then case-insensitive names
+
+    Parameters
+    ----------
+    :param guild: The guild the emoji belongs to
+    :param query: What the user typed
+    """
+    emojis = self.guild(guild)
+    query = query.strip()
+    if query.startswith('<') and query.endswith('>'):
+      query = query[1:-1].rsplit(':', 1)[-1]
+    elif len(query) > 2 and query.startswith(':') and query.endswith(':'):
+      query = query[1:-1]
+
+    emoji = emojis.by_name.get(query)
+    if emoji is None and query.isdigit():
+      emoji = emojis.by_id.get(int(query))
+    return emoji or emojis.by_lower.get(query.lower())
+
+  def search(self, guild: discord.Guild, query: str, limit: int = 25) -> List[discord.Emoji]:
+    """
+    Returns up to `limit` custom emojis ranked by how well their names match
+
+    Parameters
+    ----------
+    :param guild: The guild the emojis belong to
+    :param query: The partial name
+    :param limit: Maximum number of emojis returned
+    """
+    emojis = self.guild(guild)
+    return [emojis.by_name[name] for name in emojis.names.search(query.strip(':'), limit = limit)]
+
+
+MESSAGE_LINK = re.compile(
+  r'^<?https?://(?:(?:ptb|canary|www)\.)?discord(?:app)?\.com/channels/'
+  r'(?P<guild_id>[0-9]{15,20}|@me)/(?P<channel_id>[0-9]{15,20})/(?P<message_id>[0-9]{15,20})/?>?$'
+)
+MESSAGE_ID = re.compile(r'^(?:(?P<channel_id>[0-9]{15,20})-)?(?P<message_id>[0-9]{15,20})$')
+
+
+class MessageResolver:
+  """
+  Resolves message IDs and links to messages
+
+  The client's message cache is checked before falling back to REST,
+  and messages REST reported as unknown in a channel are remembered for a while
+  """
+
+  negative_ttl: float
+  negative_size: int
+  hits: int
+  fetches: int
+  negative_hits: int
+  _unknown: 'OrderedDict[Tuple[int, int], float]'
+
+  def __init__(self, negative_ttl: float = 300, negative_size: int = 1024) -> None:
+    """
+    Initializes a MessageResolver
+
+    Parameters
+    ----------
+    :param negative_ttl: Seconds an unknown message is remembered
+    :param negative_size: How many unknown messages are remembered
+    """
+    self.negative_ttl = negative_ttl
+    self.negative_size = negative_size
+    self.hits = 0
+    self.fetches = 0
+    self.negative_hits = 0
+    self._unknown = OrderedDict()
+
+  @staticmethod
+  def parse(value: str) -> Tuple[Optional[int], Optional[int], int]:
+    """
+    Splits a message link, ``channel-message`` ID pair or message ID into (guild ID, channel ID, message ID)
+
+    Parameters
+    ----------
+    :param value: What the user typed
+    """
+    match = MESSAGE_LINK.match(value.strip()) or MESSAGE_ID.match(value.strip())
+    if not match:
+      raise Error(description = f'`{value}` is not a message ID or link')
+
+    groups = match.groupdict()
+    guild_id = groups.get('guild_id')
+    return (
+      guild_id and guild_id != '@me' and int(guild_id) or None,
+      groups['channel_id'] and int(groups['channel_id']) or None,
+      int(groups['message_id'])
+    )
+
+  def _channel(self, ctx: commands.Context, guild_id: Optional[int], channel_id: Optional[int]) -> discord.abc.Messageable:
+    if channel_id is None or channel_id == ctx.channel.id:
+      return ctx.channel
+    if not ctx.guild or (guild_id is not None and guild_id != ctx.guild.id):
+      raise Error(description = 'That message is not in this server')
+
+    channel = ctx.guild.get_channel_or_thread(channel_id)
+    if not isinstance(channel, discord.abc.Messageable) or isinstance(channel, discord.CategoryChannel):
+      raise Error(description = 'Unknown channel')
+    if not channel.permissions_for(ctx.author).read_message_history: # type: ignore
+      raise Error(description = 'You cannot read that channel')
+    return channel
+
+  async def resolve(self, ctx: commands.Context, value: Optional[str] = None) -> discord.Message:
+    """
+    Returns the message a link or ID refers to, the latest message in the channel when omitted
+
+    Parameters
+    ----------
+    :param ctx: The invoking context, links must point into its guild
+    :param value: A message link, ``channel-message`` ID pair or message ID
+    """
+    if value:
+      guild_id, channel_id, message_id = self.parse(value)
+      channel = self._channel(ctx, guild_id, channel_id)
+    else:
+      channel = ctx.channel
+      message_id = getattr(channel, 'last_message_id', None)
+      if message_id is None:
+        raise Error(description = 'Unsupported channel type')
+
+    message = ctx.bot._connection._get_message(message_id)
+    if message is not None and message.channel.id == channel.id:
+      self.hits += 1
+      return message
+
+    # A miss only says the message is not in that channel, the same ID may resolve in another
+    key = (channel.id, message_id)
+    expires = self._unknown.get(key)
+    if expires is not None:
+      if expires > time.monotonic():
+        self.negative_hits += 1
+        raise Error(description = 'Unknown message')
+      del self._unknown[key]
+
+    self.fetches += 1
+    try:
+      return await channel.fetch_message(message_id)
+    except discord.NotFound:
+      self._unknown[key] = time.monotonic() + self.negative_ttl
+      if len(self._unknown) > self.negative_size:
+        self._unknown.popitem(last = False)
+      raise Error(description = 'Unknown message')
+
+  def stats(self) -> Dict[str, Union[int, float]]:
+    """Returns cache hit, REST fetch and negative cache counters"""
+    total = self.hits + self.fetches + self.negative_hits
+    return {
+      'hits': self.hits,
+      'fetches': self.fetches,
+      'negative_hits': self.negative_hits,
+      'unknown': len(self._unknown),
+      'hit_rate': total and (self.hits + self.negative_hits) / total
+    }
+
+
+message_resolver = MessageResolver()
+
+
+PrefixResolver = Callable[[discord.Message], Tuple[str, ...]]
+
+class MessageFilter:
+  """
+  Cheap pre-filter for messages that cannot invoke a command
+
+  Runs before the prefix is resolved through the bot and before any
+  context is built, so ordinary chat costs a couple of attribute reads
+  and a ``str.startswith``
+  """
+
+  __slots__ = ('prefixes',)
+
+  prefixes: PrefixResolver
+
+  def __init__(self, prefixes: Any) -> None:
+    """
+    Initializes a MessageFilter
+
+    Parameters
+    ----------
+    :param prefixes: A prefix, an iterable of prefixes or a synchronous callable returning the prefixes for a message, which may include mentions
+    """
+    if isinstance(prefixes, str):
+      prefixes = (prefixes,)
+    if not callable(prefixes):
+      static = tuple(prefixes)
+      prefixes = lambda message: static
+    self.prefixes = prefixes
+
+  def reason(self, message: discord.Message) -> Optional[str]:
+    """
+    Returns why a message cannot be a command, None when it may be one
+
+    Parameters
+    ----------
+    :param message: The received message
+    """
+    if message.author.bot or message.webhook_id is not None:
+      return 'bot'
+    if not message.content.startswith(self.prefixes(message)):
+      return 'no_prefix'
+    return None
@@ -0,0 +1,71 @@
+"""
+Lightweight stand-ins for discord objects
+
+Only the attributes read by the code under test are populated,
+no connection state or HTTP session is required
+"""
+import discord
+from discord.utils import SnowflakeList
+from typing import Any, Dict, List, Optional, Iterable
+
+
+class FakeGuild:
+  """Minimal guild exposing roles, channels and members"""
+
+  def __init__(self, id: int = 1, name: str = 'guild', owner_id: int = 0) -> None:
+    self.id = id
+    self.name = name
+    self.owner_id = owner_id
+    self._roles: Dict[int, discord.Role] = {}
+    self._channels: Dict[int, Any] = {}
+    self.emojis: List[Any] = []
+    self.add_role(id, '@everyone', 0)
+
+  def add_role(self, id: int, name: str, position: int, permissions: int = 0) -> discord.Role:
+    role = discord.Role(guild = self, state = None, data = { # type: ignore
+      'id': id,
+      'name': name,
+      'position': position,
+      'permissions': str(permissions)
+    })
+    self._roles[id] = role
+    return role
+
+  @property
+  def roles(self) -> List[discord.Role]:
+    return sorted(self._roles.values())
+
+  @property
+  def default_role(self) -> discord.Role:
+    return self._roles[self.id]
+
+  def get_role(self, role_id: int, /) -> Optional[discord.Role]:
+    return self._roles.get(role_id)
+
+  def get_channel(self, channel_id: int, /) -> Optional[Any]:
+    return self._channels.get(channel_id)
+
+  def __eq__(self, other: object) -> bool:
+    return isinstance(other, FakeGuild) and other.id == self.id
+
+  def __hash__(self) -> int:
+    return hash(self.id)
+
+
+class FakeMember(discord.Member):
+  """Member backed by a FakeGuild"""
+
+  def __init__(self, guild: FakeGuild, id: int, role_ids: Iterable[int] = ()) -> None:
+    self.guild = guild # type: ignore
+    self._user = discord.Object(id) # type: ignore
+    self._roles = SnowflakeList(list(role_ids))
+    self.timed_out_until = None
+
+
+class FakeContext:
+  """Command context carrying only author, guild and channel"""
+
+  def __init__(self, author: Any, guild: Optional[FakeGuild] = None, channel: Any = None) -> None:
+    self.author = author
+    self.guild = guild
+    self.channel = channel if channel is not None else discord.Object(0)
@@ -0,0 +1,26 @@
+import discord
+
+from src.cache_profile import client_options, derive_intents, scan_sources, source_paths
+
+
+def test_cogs_listeners_are_scanned():
+  events, has_commands = scan_sources(source_paths())
+  assert has_commands
+  assert {'on_message', 'on_member_join', 'on_member_update'} <= events
+
+
+def test_derived_intents_are_minimal():
+  intents = derive_intents(['on_member_join', 'on_ready'], has_commands = False)
+  assert intents == discord.Intents(guilds = True, members = True)
+  assert derive_intents([], has_commands = True).message_content
+
+
+def test_member_cache_flags_follow_intents():
+  options = client_options({
+    'intents': ('guild_messages',),
+    'member_cache_flags': ('joined', 'voice'),
+    'chunk_guilds_at_startup': True,
+    'max_messages': None
+  })
+  assert options['member_cache_flags'] == discord.MemberCacheFlags.none()
+  assert not options['chunk_guilds_at_startup']
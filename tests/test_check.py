@@ -0,0 +1,108 @@
+import pytest
+from discord.ext import commands
+from discord.utils import SnowflakeList
+
+from src.check import (
+  CompiledClauses, DecisionCache, PermissionGate, PermissionPreset,
+  decision_cache, validate
+)
+from src.config import Config
+from tests.fakes import FakeGuild, FakeMember, FakeContext
+
+
+def gate(query: str, value, type: str = 'required', requirement: str = 'wl') -> PermissionGate:
+  return {'type': type, 'requirement': {'type': requirement, 'query': query, 'value': value}} # type: ignore
+
+
+@pytest.fixture(autouse = True)
+def clear_decisions():
+  decision_cache.clear()
+
+
+@pytest.fixture
+def guild() -> FakeGuild:
+  guild = FakeGuild(id = 100, name = 'thread')
+  guild.add_role(1, 'Community', 1)
+  guild.add_role(2, 'Moderator', 5)
+  guild.add_role(3, 'Admin', 10, permissions = 8)
+  return guild
+
+
+def test_has_role_by_id_and_name(guild):
+  ctx = FakeContext(FakeMember(guild, 1, [2]), guild)
+  assert validate(ctx, gate('has_role', 2)) # type: ignore
+  assert validate(ctx, gate('has_role', 'Moderator')) # type: ignore
+  assert not validate(ctx, gate('has_role', 'Admin')) # type: ignore
+
+
+def test_minimum_role(guild):
+  compiled = CompiledClauses(PermissionPreset.Is_Member)
+  assert compiled.validate(FakeContext(FakeMember(guild, 1, [2]), guild)) # type: ignore
+  assert not compiled.validate(FakeContext(FakeMember(guild, 2, []), guild)) # type: ignore
+
+  # Of several roles with the name, the lowest is the minimum
+  guild.add_role(4, 'Moderator', 8)
+  minimum = gate('minimum_role', 'Moderator')
+  assert validate(FakeContext(FakeMember(guild, 3, [2]), guild), minimum) # type: ignore
+  assert not validate(FakeContext(FakeMember(guild, 4, [1]), guild), minimum) # type: ignore
+
+
+def test_required_and_optional_groups(guild):
+  member = FakeMember(guild, 1, [1])
+  ctx = FakeContext(member, guild)
+  in_guild = gate('in_guild', guild.id)
+  assert validate(ctx, in_guild, gate('has_role', 2, 'optional'), gate('has_role', 1, 'optional')) # type: ignore
+  assert not validate(ctx, in_guild, gate('has_role', 2, 'optional'), gate('has_role', 3, 'optional')) # type: ignore
+  assert not validate(ctx, in_guild, [gate('in_guild', 5)]) # type: ignore
+
+
+def test_blacklist_and_developer(guild):
+  ctx = FakeContext(FakeMember(guild, Config.DEVELOPER_USER_ID, [3]), guild)
+  assert validate(ctx, PermissionPreset.Developer, PermissionPreset.Admin) # type: ignore
+  assert not validate(ctx, gate('has_role', 3, requirement = 'bl')) # type: ignore
+
+
+def test_unknown_query_is_check_failure(guild):
+  with pytest.raises(commands.CheckFailure):
+    validate(FakeContext(FakeMember(guild, 1), guild), gate('unknown', None)) # type: ignore
+
+
+def test_decision_cache_invalidation(guild):
+  cache = DecisionCache(maxsize = 2, ttl = 60)
+  cache.set((1, 10, guild.id, None, 0), True)
+  cache.set((1, 11, guild.id, 5, 0), False)
+  assert cache.get((1, 10, guild.id, None, 0)) is True
+  assert cache.get((1, 12, guild.id, None, 0)) is None
+  assert (cache.hits, cache.misses) == (1, 1)
+
+  cache.invalidate_channel(5)
+  assert cache.get((1, 11, guild.id, 5, 0)) is None
+
+  cache.set((1, 11, guild.id, None, 0), True)
+  cache.set((2, 11, guild.id, None, 0), True) # evicts the least recently used entry
+  assert len(cache) == 2 and cache.get((1, 10, guild.id, None, 0)) is None
+
+  cache.invalidate_member(guild.id, 11)
+  assert len(cache) == 0
+
+
+def test_cached_validate_follows_role_changes(guild):
+  compiled = CompiledClauses(gate('has_role', 'Moderator'))
+  member = FakeMember(guild, 7, [2])
+  ctx = FakeContext(member, guild)
+  assert compiled.validate(ctx) # type: ignore
+  assert compiled.validate(ctx) # type: ignore
+
+  member._roles = SnowflakeList([1])
+  decision_cache.invalidate_member(guild.id, member.id)
+  assert not compiled.validate(ctx) # type: ignore
+
+
+def test_cached_validate_follows_roles_of_uncached_members(guild):
+  # No listener fires for members discord.py does not cache, each message carries a new member
+  compiled = CompiledClauses(gate('has_role', 'Moderator'))
+  hits = decision_cache.hits
+  assert compiled.validate(FakeContext(FakeMember(guild, 8, [2]), guild)) # type: ignore
+  assert not compiled.validate(FakeContext(FakeMember(guild, 8, [1]), guild)) # type: ignore
+  assert compiled.validate(FakeContext(FakeMember(guild, 8, [2]), guild)) # type: ignore
+  assert decision_cache.hits == hits + 1
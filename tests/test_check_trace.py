@@ -0,0 +1,41 @@
+import pytest
+
+from src.check import CompiledClauses, check_tracer, decision_cache
+from tests.fakes import FakeGuild, FakeMember, FakeContext
+from tests.test_check import gate
+
+
+class FakeCommand:
+  qualified_name = 'ban'
+
+
+@pytest.fixture(autouse = True)
+def tracing():
+  decision_cache.clear()
+  check_tracer.reset()
+  check_tracer.enabled = True
+  yield
+  check_tracer.enabled = False
+  check_tracer.reset()
+
+
+def test_traces_gates_per_command():
+  guild = FakeGuild(id = 100, name = 'thread')
+  guild.add_role(2, 'Moderator', 5)
+  compiled = CompiledClauses(gate('in_guild', 100), gate('has_role', 2), gate('has_permission', 'administrator'))
+
+  assert not compiled.validate(FakeContext(FakeMember(guild, 1, []), guild), command = FakeCommand) # type: ignore
+  assert not compiled.validate(FakeContext(FakeMember(guild, 1, []), guild), command = FakeCommand) # type: ignore
+  assert not compiled.validate(FakeContext(FakeMember(guild, 2, [2]), guild), command = FakeCommand) # type: ignore
+
+  role = check_tracer.gates[('ban', 'required wl has_role=2')]
+  permission = check_tracer.gates[('ban', 'required wl has_permission=administrator')]
+  assert (role.calls, role.failures, role.short_circuits) == (2, 1, 1)
+  assert (permission.calls, permission.failures, permission.skipped) == (1, 1, 1)
+
+  # The repeated check is answered by the decision cache
+  command = check_tracer.commands['ban']
+  assert (command.checks, command.denied, command.cached) == (3, 3, 1)
+  assert command.last_denial == 'required wl has_permission=administrator'
+  assert [trace for _, _, trace in check_tracer.most_failed(1)] in ([role], [permission])
+  assert len(check_tracer.slowest(10)) == 3
@@ -0,0 +1,138 @@
+import os
+import time
+import asyncio
+import tempfile
+import pytest
+
+from src.cluster import ClusterHub, ClusterLink, cluster_shards
+
+
+def test_cluster_shards_round_robin():
+  assert cluster_shards(5, 2) == [[0, 2, 4], [1, 3]]
+  # Clusters without shards are left out, their worker would run every shard
+  assert cluster_shards(2, 3) == [[0], [1]]
+
+
+def test_broadcast_reaches_every_cluster():
+  async def run():
+    path = os.path.join(tempfile.mkdtemp(), 'hub.sock')
+    hub = ClusterHub(path)
+    await hub.start()
+
+    links = [ClusterLink(cluster, path) for cluster in range(3)]
+    for link in links:
+      async def stats(link = link):
+        return {'cluster': link.cluster_id}
+      async def fail():
+        raise RuntimeError('boom')
+      link.register('stats', stats)
+      link.register('fail', fail)
+      await link.connect()
+    await asyncio.sleep(0.05)
+
+    assert await links[1].broadcast('stats') == {cluster: {'result': {'cluster': cluster}} for cluster in range(3)}
+    failed = await links[0].broadcast('fail')
+    assert sorted(failed) == [0, 1, 2] and all(envelope['error'] == 'RuntimeError: boom' for envelope in failed.values())
+
+    # A cluster that drops out is left out of later broadcasts
+    await links[2].close()
+    await asyncio.sleep(0.05)
+    assert sorted(await links[0].broadcast('stats', timeout = 1)) == [0, 1]
+
+    for link in links:
+      await link.close()
+    await hub.close()
+
+  asyncio.run(run())
+
+
+def test_broadcast_skips_a_cluster_whose_connection_reset():
+  class ResetWriter:
+    def write(self, data: bytes) -> None: ...
+    def close(self) -> None: ...
+    async def drain(self) -> None:
+      raise ConnectionResetError()
+
+  async def run():
+    path = os.path.join(tempfile.mkdtemp(), 'hub.sock')
+    hub = ClusterHub(path)
+    await hub.start()
+    links = [ClusterLink(cluster, path) for cluster in range(3)]
+    for link in links:
+      async def stats(link = link):
+        return link.cluster_id
+      link.register('stats', stats)
+      await link.connect()
+    await asyncio.sleep(0.05)
+
+    # Cluster 2's socket closed, its connection was not cleaned up yet
+    hub._writers[2] = ResetWriter() # type: ignore
+    start = time.monotonic()
+    assert sorted(await links[0].broadcast('stats', timeout = 5)) == [0, 1]
+    assert time.monotonic() - start < 1 and links[0].connected and not hub._pending
+
+    for link in links:
+      await link.close()
+    await hub.close()
+
+  asyncio.run(run())
+
+
+def test_identifies_are_spaced_per_bucket():
+  async def run():
+    path = os.path.join(tempfile.mkdtemp(), 'hub.sock')
+    hub = ClusterHub(path, max_concurrency = 2, identify_interval = 0.1)
+    await hub.start()
+    links = [ClusterLink(cluster, path) for cluster in range(2)]
+    for link in links:
+      await link.connect()
+
+    start = time.monotonic()
+    granted = {}
+    async def identify(link: ClusterLink, shard_id: int):
+      await link.identify(shard_id)
+      granted[shard_id] = time.monotonic() - start
+
+    # Shards 0 and 2 share a bucket, 1 and 3 share the other
+    await asyncio.gather(*(identify(links[shard_id % 2], shard_id) for shard_id in range(4)))
+    assert granted[0] < 0.05 and granted[1] < 0.05
+    assert granted[2] >= 0.09 and granted[3] >= 0.09
+
+    for link in links:
+      await link.close()
+    await hub.close()
+
+  asyncio.run(run())
+
+
+def test_lost_launcher_fails_pending_identifies():
+  async def run():
+    path = os.path.join(tempfile.mkdtemp(), 'hub.sock')
+    hub = ClusterHub(path, identify_interval = 10)
+    await hub.start()
+    link = ClusterLink(0, path)
+    await link.connect()
+
+    await link.identify(0)
+    waiting = asyncio.ensure_future(link.identify(1))
+    await asyncio.sleep(0.05)
+    await hub.close()
+
+    with pytest.raises(ConnectionError):
+      await asyncio.wait_for(waiting, 1)
+    assert not link.connected
+    await link.close()
+
+  asyncio.run(run())
+
+
+def test_broadcast_without_launcher_runs_locally():
+  async def run():
+    link = ClusterLink()
+    async def echo(value):
+      return value
+    link.register('echo', echo)
+    assert await link.broadcast('echo', 5) == {0: {'result': 5}}
+    assert 'error' in (await link.broadcast('missing'))[0]
+
+  asyncio.run(run())
@@ -0,0 +1,72 @@
+import json
+import asyncio
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from src.command_sync import CommandSync
+
+
+def make_tree():
+  bot = commands.Bot(command_prefix = '$', intents = discord.Intents.none())
+  uploads = []
+
+  async def sync(*, guild = None):
+    uploads.append(guild and guild.id)
+    return bot.tree.get_commands(guild = guild)
+  bot.tree.sync = sync # type: ignore
+  return bot.tree, uploads
+
+def slash(name: str, description: str = 'A command') -> app_commands.Command:
+  async def callback(interaction: discord.Interaction): ...
+  return app_commands.Command(name = name, description = description, callback = callback)
+
+
+def test_sync_skips_unchanged_tree(tmp_path):
+  async def run():
+    path = str(tmp_path / 'sync.json')
+    tree, uploads = make_tree()
+    tree.add_command(slash('ping'))
+    tree.add_command(slash('help'))
+
+    first = await CommandSync(path).sync(tree)
+    assert first.synced and first.added == ['help', 'ping'] and first.count == 2
+
+    # A fresh process with the same commands, in another order
+    tree, uploads = make_tree()
+    tree.add_command(slash('help'))
+    tree.add_command(slash('ping'))
+    store = CommandSync(path)
+    unchanged = await store.sync(tree)
+    assert not unchanged.synced and not unchanged and uploads == []
+
+    tree.remove_command('help')
+    tree.add_command(slash('ping', 'Pong'), override = True)
+    tree.add_command(slash('links'))
+    assert (await store.diff(tree)).describe() == '+ links\n- help\n~ ping'
+    changed = await store.sync(tree)
+    assert changed.synced and uploads == [None]
+    assert (await store.sync(tree, force = True)).synced and uploads == [None, None]
+
+    with open(path) as file:
+      assert set(json.load(file)['global']['commands']) == {'links', 'ping'}
+
+  asyncio.run(run())
+
+
+def test_dev_guild_is_tracked_separately(tmp_path):
+  async def run():
+    tree, uploads = make_tree()
+    tree.add_command(slash('ping'))
+    store = CommandSync(str(tmp_path / 'sync.json'))
+    guild = discord.Object(42)
+
+    await store.sync(tree)
+    store.mirror(tree, guild)
+    assert (await store.diff(tree, guild)).added == ['ping']
+    assert (await store.sync(tree, guild)).synced
+    store.mirror(tree, guild)
+    assert not (await store.sync(tree, guild)).synced
+    assert uploads == [None, 42]
+
+  asyncio.run(run())
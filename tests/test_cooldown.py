@@ -0,0 +1,78 @@
+import copy
+import types
+import asyncio
+import pytest
+from discord.ext import commands
+
+from src import cooldown as cooldown_module
+from src.cooldown import MemoryCooldowns, SQLiteCooldowns, cooldown
+
+
+def test_rate_and_burst():
+  store = MemoryCooldowns()
+  assert store.update('ping', 1, 1, 15, now = 100) == 0
+  assert store.update('ping', 1, 1, 15, now = 110) == pytest.approx(5)
+  assert store.update('ping', 2, 1, 15, now = 110) == 0
+  assert store.update('ping', 1, 1, 15, now = 115) == 0
+
+  # Two uses per ten seconds, refilled one at a time
+  assert [store.update('help', 1, 2, 10, now = 0) for _ in range(3)] == [0, 0, pytest.approx(5)]
+  assert store.update('help', 1, 2, 10, now = 5) == 0
+  assert store.update('help', 1, 2, 10, now = 5) == pytest.approx(5)
+
+
+def test_sweep_and_cap_bound_memory():
+  store = MemoryCooldowns(max_keys = 1000, sweep_interval = 60)
+  for user in range(5000):
+    store.update('help', user, 1, 15, now = user / 1000)
+  assert len(store) <= 1000 and store.evictions >= 4000
+
+  # Expired keys are forgotten, the next use is allowed again
+  kept = len(store)
+  assert store.sweep(now = 10) == 0
+  assert store.sweep(now = 30) == kept and len(store) == 0
+  store.update('help', 1, 1, 15, now = 100)
+  assert store.update('help', 2, 1, 15, now = 200) == 0 and len(store) == 1 and store.swept > 0
+
+
+def test_sqlite_cooldowns_are_shared(tmp_path):
+  path = str(tmp_path / 'cooldowns.db')
+  first, second = SQLiteCooldowns(path), SQLiteCooldowns(path)
+  assert first.update('help', (1, 2), 1, 15, now = 100) == 0
+  assert second.update('help', (1, 2), 1, 15, now = 105) == pytest.approx(10)
+  assert second.update('help', (1, 3), 1, 15, now = 105) == 0
+  assert first.sweep(now = 200) == 2
+  assert second.update('help', (1, 2), 1, 15, now = 200) == 0
+
+
+def test_decorator_raises_command_on_cooldown(monkeypatch):
+  monkeypatch.setattr(cooldown_module, 'cooldowns', MemoryCooldowns())
+
+  @commands.command(name = 'help')
+  @cooldown(1, 15, commands.BucketType.user)
+  async def command(ctx): ...
+  check = command.checks[-1]
+
+  def context(user: int, invoked_with: str = 'help'):
+    return types.SimpleNamespace(command = command, invoked_with = invoked_with, author = types.SimpleNamespace(id = user))
+
+  async def run():
+    assert await check(context(1)) and await check(context(2))
+    with pytest.raises(commands.CommandOnCooldown) as error:
+      await check(context(1))
+    assert 0 < error.value.retry_after <= 15 and error.value.type is commands.BucketType.user
+
+    # Checking whether another command can run, or checking again, does not use the cooldown
+    listing = context(3, invoked_with = 'commands')
+    assert await check(listing) and await check(listing)
+    invoked = context(3)
+    assert await check(invoked) and await check(copy.copy(invoked))
+    with pytest.raises(commands.CommandOnCooldown):
+      await check(context(3))
+
+  asyncio.run(run())
+
+
+def test_stores_implement_hit():
+  with pytest.raises(TypeError):
+    cooldown_module.CooldownStore() # type: ignore
@@ -0,0 +1,48 @@
+import discord
+
+from src.utils import Embeds, EmbedTemplates
+
+
+def test_templates_match_embeds_and_follow_content():
+  templates = EmbedTemplates(maxsize = 2)
+  first = templates.embed(title = 'Prefix', description = '$').to_dict()
+  second = templates.embed(title = 'Prefix', description = '$').to_dict()
+  expected = Embeds(title = 'Prefix', description = '$').to_dict()
+
+  assert first.keys() == expected.keys() and first['timestamp'].endswith('+00:00')
+  assert {**first, 'timestamp': None} == {**second, 'timestamp': None} == {**expected, 'timestamp': None}
+  assert (templates.hits, templates.misses) == (1, 1)
+
+  # A changed prefix is a new template, the least recently used one is dropped
+  embed = templates.embed(title = 'Prefix', description = '!')
+  assert embed.description == '!' and embed.to_dict()['description'] == '!'
+  templates.embed(color = discord.Color.dark_red(), description = 'On cooldown')
+  templates.embed(title = 'Prefix', description = '$')
+  assert len(templates) == 2 and templates.misses == 4
+
+
+def test_rendered_embeds_behave_like_embeds():
+  templates = EmbedTemplates()
+  embed = templates.embed(title = 'Prefix', description = '$')
+  assert embed.timestamp is not None and embed.to_dict()['timestamp'] == embed.timestamp.isoformat()
+  assert embed.colour == Embeds().colour
+
+  copied = embed.copy()
+  assert copied == embed and copied.to_dict() == embed.to_dict()
+  copied.set_footer(text = 'Page 1')
+  assert copied != embed and 'footer' not in embed.to_dict()
+
+
+def test_changed_rendered_embeds_are_serialized_again():
+  templates = EmbedTemplates()
+  embed = templates.embed(title = 'Prefix', description = '$')
+  embed.description = '!'
+  embed.set_footer(text = 'Page 1')
+  embed.add_field(name = 'Usage', value = 'prefix')
+  payload = embed.to_dict()
+  assert payload['description'] == '!' and payload['footer'] == {'text': 'Page 1'} and len(payload['fields']) == 1
+  assert payload['timestamp'] == embed.timestamp.isoformat() # type: ignore
+
+  # The template is left as it was
+  fresh = templates.embed(title = 'Prefix', description = '$').to_dict()
+  assert fresh['description'] == '$' and 'footer' not in fresh and 'fields' not in fresh
@@ -0,0 +1,41 @@
+import discord
+
+from src.utils import EmojiIndex
+from tests.fakes import FakeGuild
+
+
+def add_emoji(guild: FakeGuild, id: int, name: str, animated: bool = False) -> discord.Emoji:
+  emoji = discord.Emoji(guild = guild, state = None, data = {'id': id, 'name': name, 'animated': animated}) # type: ignore
+  guild.emojis.append(emoji)
+  return emoji
+
+
+def test_lookup_by_name_mention_and_id():
+  guild = FakeGuild()
+  pog = add_emoji(guild, 10, 'Pog')
+  party = add_emoji(guild, 11, 'party', animated = True)
+  index = EmojiIndex()
+
+  assert index.get(guild, 'Pog') is pog
+  assert index.get(guild, 'pog') is pog
+  assert index.get(guild, ':party:') is party
+  assert index.get(guild, '<a:party:11>') is party
+  assert index.get(guild, '10') is pog
+  assert index.get(guild, 'missing') is None
+  assert str(index.get(guild, 'party')) == '<a:party:11>'
+
+
+def test_update_and_search():
+  guild = FakeGuild()
+  add_emoji(guild, 10, 'pog')
+  index = EmojiIndex()
+  assert index.get(guild, 'pepe_laugh') is None
+
+  # The guild stays indexed until its emojis are updated
+  pepe = add_emoji(guild, 12, 'pepe_laugh')
+  assert index.get(guild, 'pepe_laugh') is None
+  index.update(guild, guild.emojis)
+  assert index.get(guild, 'pepe_laugh') is pepe
+
+  assert [emoji.name for emoji in index.search(guild, 'pe')] == ['pepe_laugh']
+  assert index.search(guild, ':po') == [index.get(guild, 'pog')]
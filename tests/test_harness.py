@@ -0,0 +1,41 @@
+import sys
+import json
+import subprocess
+
+from benchmarks.harness import Recorder, payloads
+
+
+def test_recorder_correlates_replies():
+  recorder = Recorder('$', welcome_channel_id = 9)
+  first = payloads.member_message(1, 5, 100, '$ping')
+  second = payloads.member_message(1, 5, 101, '$help')
+  recorder.dispatched('MESSAGE_CREATE', first)
+  recorder.dispatched('MESSAGE_CREATE', second)
+  recorder.dispatched('MESSAGE_CREATE', payloads.member_message(1, 5, 102, 'no reply expected'))
+  recorder.dispatched('GUILD_MEMBER_ADD', payloads.member_join(5, 200))
+  recorder.dispatched('GUILD_MEMBER_ADD', payloads.member_join(5, 201))
+  assert recorder.pending == {'command': 2, 'slash': 0, 'join': 2}
+
+  # A reply to the second message, then a plain send matched to the oldest
+  recorder.posted(1, {'content': 'pong', 'message_reference': {'message_id': second['id']}})
+  recorder.posted(1, {'content': 'help'})
+  recorder.posted(1, {'content': 'nothing asked'})
+  recorder.posted(9, {'content': '<@200>', 'embeds': [{'description': '*...and 1 more members joined*'}]})
+
+  assert recorder.pending == {'command': 0, 'slash': 0, 'join': 0}
+  assert len(recorder.latencies['command']) == 2
+  assert len(recorder.latencies['join']) == 2
+  assert recorder.unmatched == 1
+
+
+def test_offline_run_answers_every_command():
+  result = subprocess.run(
+    [sys.executable, '-m', 'benchmarks.harness', '--events', '60', '--rate', '200', '--drain', '5', '--log-level', 'CRITICAL', '--json'],
+    capture_output = True, text = True, timeout = 120, check = True
+  )
+  report = json.loads(result.stdout.splitlines()[-1])
+
+  assert report['answered'] == report['events']['command'] + report['events']['slash'] > 0
+  assert report['unanswered'] == {'command': 0, 'slash': 0, 'join': 0}
+  assert report['latency_ms']['command']['p50'] > 0
+  assert report['rss_kib']['peak'] > 0
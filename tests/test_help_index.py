@@ -0,0 +1,43 @@
+import asyncio
+import discord
+from discord.ext import commands
+
+
+async def _load(*extensions: str) -> commands.Bot:
+  client = commands.Bot(command_prefix = '$', intents = discord.Intents.none())
+  for extension in extensions:
+    await client.load_extension(f'.cogs.{extension}', package = 'src')
+  return client
+
+
+def test_help_index_search_and_sync():
+  async def run():
+    client = await _load('help_command', 'misc_command', 'dev_command')
+    index = client.get_cog('Help').index # type: ignore
+    assert index.sync()
+
+    assert [cog.name for cog, _ in index.search()] == ['Help', 'Misc']
+    assert [entry.qualified_name for _, entries in index.search('misc') for entry in entries] == ['ping', 'links', 'getprefix', 'react']
+    assert [entry.qualified_name for _, entries in index.search('PING') for entry in entries] == ['ping']
+    assert not index.search('syncSlashCommands')
+
+    await client.unload_extension('.cogs.misc_command', package = 'src')
+    assert index.sync() and 'Misc' not in index.cogs
+    assert not index.sync()
+
+  asyncio.run(run())
+
+
+def test_help_autocomplete_ranking():
+  async def run():
+    client = await _load('help_command', 'misc_command')
+    index = client.get_cog('Help').index # type: ignore
+    index.sync()
+
+    assert index.names.search('')[:2] == ['Help', 'Misc']
+    assert index.names.search('prefix') == ['prefix', 'getprefix']
+    assert index.names.search('react') == ['react', 'addreaction']
+    assert index.names.search('rect') == ['react']
+    assert 'syncSlashCommands' not in index.names.search('sync')
+
+  asyncio.run(run())
@@ -0,0 +1,38 @@
+import logging
+
+from src.logger import DedupFilter
+
+
+def _record(msg: str = 'boom', exc: bool = False) -> logging.LogRecord:
+  exc_info = None
+  if exc:
+    try:
+      raise ValueError(msg)
+    except ValueError as e:
+      exc_info = (type(e), e, e.__traceback__)
+  return logging.LogRecord('test', logging.ERROR, __file__, 1, msg, None, exc_info)
+
+
+def test_identical_errors_are_folded():
+  dedup = DedupFilter(window = 60, max_per_second = 10**6)
+  assert dedup.filter(_record(exc = True))
+  assert not any(dedup.filter(_record(exc = True)) for _ in range(99))
+  assert dedup.filter(_record('other'))
+  assert dedup.suppressed == 99
+
+  dedup.window = 0
+  record = _record(exc = True)
+  assert dedup.filter(record) and '99 more times' in record.repeats # type: ignore
+
+
+def test_errors_of_other_commands_are_kept():
+  dedup = DedupFilter(window = 60, max_per_second = 10**6)
+  records = [_record(exc = True) for _ in range(3)]
+  records[0].command, records[1].command, records[2].command = 'ping', 'help', 'ping' # type: ignore
+  assert [dedup.filter(record) for record in records] == [True, True, False]
+
+
+def test_bursts_are_sampled():
+  dedup = DedupFilter(window = 0, max_per_second = 10, sample_rate = 10)
+  passed = sum(dedup.filter(_record(f'message {i}')) for i in range(1000))
+  assert passed < 200 and dedup.sampled_out == 1000 - passed
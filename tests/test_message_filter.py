@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+from src.utils import MessageFilter
+
+
+def message(content: str, bot: bool = False, webhook_id = None, guild_id: int = 1):
+  return SimpleNamespace(
+    content = content, webhook_id = webhook_id,
+    author = SimpleNamespace(bot = bot), guild = SimpleNamespace(id = guild_id)
+  )
+
+
+def test_static_prefix():
+  filter = MessageFilter('$')
+  assert filter.reason(message('$help')) is None
+  assert filter.reason(message('just chatting')) == 'no_prefix'
+  assert filter.reason(message('')) == 'no_prefix'
+  assert filter.reason(message('$help', bot = True)) == 'bot'
+  assert filter.reason(message('$help', webhook_id = 5)) == 'bot'
+
+
+def test_per_guild_prefixes_and_mentions():
+  prefixes = {1: ('$',), 2: ('!', '?')}
+  filter = MessageFilter(lambda message: (*prefixes[message.guild.id], '<@42> ', '<@!42> '))
+
+  assert filter.reason(message('!ping', guild_id = 2)) is None
+  assert filter.reason(message('$ping', guild_id = 2)) == 'no_prefix'
+  assert filter.reason(message('<@42> ping', guild_id = 1)) is None
@@ -0,0 +1,96 @@
+import asyncio
+import discord
+import pytest
+from types import SimpleNamespace
+
+from src.utils import Error, MessageResolver
+
+GUILD_ID = 100000000000000001
+CHANNEL_ID = 100000000000000002
+CACHED_ID = 100000000000000003
+REMOTE_ID = 100000000000000004
+MISSING_ID = 100000000000000005
+
+
+class FakeChannel:
+  def __init__(self, id: int, messages: dict) -> None:
+    self.id = id
+    self.last_message_id = CACHED_ID
+    self.messages = messages
+    self.fetches = 0
+
+  async def fetch_message(self, id: int):
+    self.fetches += 1
+    if id not in self.messages:
+      raise discord.NotFound(SimpleNamespace(status = 404, reason = 'Not Found'), 'Unknown Message')
+    return self.messages[id]
+
+
+def context():
+  channel = FakeChannel(CHANNEL_ID, {})
+  cached = SimpleNamespace(id = CACHED_ID, channel = channel)
+  channel.messages[REMOTE_ID] = SimpleNamespace(id = REMOTE_ID, channel = channel)
+  state = SimpleNamespace(_get_message = lambda id: id == CACHED_ID and cached or None)
+  guild = SimpleNamespace(id = GUILD_ID, get_channel_or_thread = lambda id: None)
+  return SimpleNamespace(bot = SimpleNamespace(_connection = state), channel = channel, guild = guild), channel
+
+
+def test_parse_links_and_ids():
+  assert MessageResolver.parse(f'https://discord.com/channels/{GUILD_ID}/{CHANNEL_ID}/{REMOTE_ID}') == (GUILD_ID, CHANNEL_ID, REMOTE_ID)
+  assert MessageResolver.parse(f'<https://ptb.discord.com/channels/@me/{CHANNEL_ID}/{REMOTE_ID}>') == (None, CHANNEL_ID, REMOTE_ID)
+  assert MessageResolver.parse(f'{CHANNEL_ID}-{REMOTE_ID}') == (None, CHANNEL_ID, REMOTE_ID)
+  assert MessageResolver.parse(f' {REMOTE_ID} ') == (None, None, REMOTE_ID)
+  with pytest.raises(Error):
+    MessageResolver.parse('https://example.com/12345')
+
+
+def test_cache_first_with_negative_cache():
+  async def run():
+    resolver = MessageResolver()
+    ctx, channel = context()
+
+    assert (await resolver.resolve(ctx)).id == CACHED_ID
+    assert (await resolver.resolve(ctx, str(CACHED_ID))).id == CACHED_ID
+    assert (await resolver.resolve(ctx, f'https://discord.com/channels/{GUILD_ID}/{CHANNEL_ID}/{REMOTE_ID}')).id == REMOTE_ID
+    assert channel.fetches == 1
+
+    for _ in range(3):
+      with pytest.raises(Error):
+        await resolver.resolve(ctx, str(MISSING_ID))
+    assert channel.fetches == 2
+
+    # Links into other guilds are rejected without a request
+    with pytest.raises(Error):
+      await resolver.resolve(ctx, f'https://discord.com/channels/1{GUILD_ID}/1{CHANNEL_ID}/{REMOTE_ID}')
+    assert channel.fetches == 2
+
+    stats = resolver.stats()
+    assert (stats['hits'], stats['fetches'], stats['negative_hits'], stats['unknown']) == (2, 2, 2, 1)
+
+  asyncio.run(run())
+
+
+
+class FakeTextChannel(FakeChannel, discord.abc.Messageable):
+  def permissions_for(self, member):
+    return SimpleNamespace(read_message_history = True)
+
+
+def test_miss_in_another_channel_does_not_hide_the_message():
+  async def run():
+    resolver = MessageResolver()
+    ctx, channel = context()
+    other = FakeTextChannel(CHANNEL_ID + 10, {})
+    other.messages[MISSING_ID] = SimpleNamespace(id = MISSING_ID, channel = other)
+    ctx.guild.get_channel_or_thread = lambda id: id == other.id and other or None
+    ctx.author = object()
+
+    # A bare ID is looked up in the invoking channel, where the message is not
+    with pytest.raises(Error):
+      await resolver.resolve(ctx, str(MISSING_ID))
+    assert channel.fetches == 1
+
+    assert (await resolver.resolve(ctx, f'https://discord.com/channels/{GUILD_ID}/{other.id}/{MISSING_ID}')).id == MISSING_ID
+    assert other.fetches == 1
+
+  asyncio.run(run())
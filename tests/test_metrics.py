@@ -0,0 +1,50 @@
+from discord.ext import commands
+
+from src.metrics import Histogram, LatencyRing, Metrics
+
+
+def test_histogram_quantiles():
+  histogram = Histogram((0.1, 0.2, 0.5, 1))
+  for _ in range(98):
+    histogram.observe(0.05)
+  histogram.observe(0.4)
+  histogram.observe(0.9)
+
+  assert histogram.count == 100
+  assert 0 < histogram.quantile(0.5) <= 0.1
+  assert 0.2 <= histogram.quantile(0.99) <= 0.5
+
+
+def test_prometheus_rendering():
+  metrics = Metrics()
+  metrics.observe_command('help', 0.02)
+  metrics.observe_command('ping', 2)
+  metrics.observe_error('help', commands.CheckFailure())
+  metrics.observe_error('react', commands.CommandOnCooldown(commands.Cooldown(1, 5), 3, commands.BucketType.user))
+  metrics.observe_message('no_prefix')
+  metrics.observe_message('dispatched')
+
+  text = metrics.render()
+  assert 'thread_command_calls_total{command="help"} 1' in text
+  assert 'thread_command_check_failures_total{command="help"} 1' in text
+  assert 'thread_command_cooldowns_total{command="react"} 1' in text
+  assert 'thread_command_latency_seconds_bucket{command="ping",le="+Inf"} 1' in text
+  assert 'thread_messages_total{result="no_prefix"} 1' in text
+  assert [name for name, _, _ in metrics.top()] == ['ping', 'help']
+
+
+def test_latency_ring_wraps_and_summarizes():
+  ring = LatencyRing(size = 4)
+  for value in (0.1, 0.2, 0.3, 0.4, 0.5, 0.6):
+    ring.add(value)
+
+  assert len(ring) == 4 and ring.values() == [0.3, 0.4, 0.5, 0.6]
+  assert ring.summary() == {'current': 0.6, 'p50': 0.5, 'p95': 0.6, 'max': 0.6}
+
+
+def test_repeated_heartbeat_readings_are_ignored():
+  metrics = Metrics()
+  for value in (0.05, 0.05, 0.07, 0.07, 0.05):
+    metrics.observe_gateway(None, value)
+  assert metrics.gateway_samples[None].values() == [0.05, 0.07, 0.05]
+  assert metrics.gateway_latency.count == 3
@@ -0,0 +1,50 @@
+import asyncio
+
+from src.metrics import metrics
+from src.outbound import OutboundScheduler, Priority
+
+
+def test_replies_skip_bulk_traffic():
+  async def run():
+    scheduler = OutboundScheduler(rate = 3, per = 0.1, reserve = 1)
+    sent = []
+
+    async def send(label: str) -> str:
+      sent.append(label)
+      return label
+
+    bulk = [asyncio.ensure_future(scheduler.submit(1, Priority.WELCOME, lambda i = i: send(f'welcome {i}'))) for i in range(6)]
+    await asyncio.sleep(0.01)
+    assert sent == ['welcome 0', 'welcome 1'] and scheduler.queued['welcome'] == 4
+
+    # The reserved request of the window goes to the reply at once
+    assert await scheduler.submit(1, Priority.REPLY, lambda: send('reply')) == 'reply'
+    assert sent[2] == 'reply'
+    assert await scheduler.submit(2, Priority.PAGING, lambda: send('other channel')) == 'other channel'
+
+    await asyncio.gather(*bulk)
+    assert sent[3:] == ['other channel', 'welcome 2', 'welcome 3', 'welcome 4', 'welcome 5']
+    assert scheduler.queued['welcome'] == 0 and metrics.outbound_depth['welcome'] == 0
+
+  asyncio.run(run())
+
+
+def test_queued_edits_are_merged():
+  async def run():
+    scheduler = OutboundScheduler(rate = 1, per = 0.05, reserve = 0)
+    edits = []
+
+    async def edit(page: int) -> int:
+      edits.append(page)
+      return page
+
+    merged = metrics.outbound_merged.get('paging', 0)
+    first = await scheduler.submit(1, Priority.PAGING, lambda: edit(0), merge = ('edit', 10))
+    pending = [asyncio.ensure_future(scheduler.submit(1, Priority.PAGING, lambda page = page: edit(page), merge = ('edit', 10))) for page in range(1, 5)]
+
+    # Every caller gets the result of the latest edit
+    assert [first, *await asyncio.gather(*pending)] == [0, 4, 4, 4, 4]
+    assert edits == [0, 4]
+    assert metrics.outbound_merged['paging'] == merged + 3
+
+  asyncio.run(run())
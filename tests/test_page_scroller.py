@@ -0,0 +1,89 @@
+import asyncio
+import discord
+from datetime import datetime, timezone
+
+from src.utils import ViewPageScroller, StatelessPageScroller
+
+
+class FakeResponse:
+  def __init__(self, log: list) -> None:
+    self.log = log
+
+  async def edit_message(self, **kwargs):
+    self.log.append(('edit_message', 'embed' in kwargs and kwargs['embed'].title))
+    await asyncio.sleep(0.01)
+
+  async def defer(self):
+    self.log.append(('defer', None))
+
+
+class FakeMessage:
+  def __init__(self, log: list) -> None:
+    self.log = log
+    self.id = 1
+    self.channel = discord.Object(2)
+
+  async def edit(self, **kwargs):
+    self.log.append(('edit', kwargs['embed'].title))
+    await asyncio.sleep(0.01)
+
+
+class FakeInteraction:
+  def __init__(self, log: list, user_id: int = 1) -> None:
+    self.response = FakeResponse(log)
+    self.user = discord.Object(user_id)
+
+
+def test_clicks_are_coalesced_and_pages_cached():
+  async def run():
+    log, loaded = [], []
+    def load_page(page):
+      loaded.append(page)
+      return discord.Embed(title = str(page), timestamp = datetime(2000, 1, 1, tzinfo = timezone.utc))
+
+    view = ViewPageScroller(ownerid = 1, load_page = load_page, pages = list(range(10)))
+    view.message = FakeMessage(log) # type: ignore
+
+    await asyncio.gather(*(view.next_button.callback(FakeInteraction(log)) for _ in range(4))) # type: ignore
+    assert log == [('edit_message', '1'), ('defer', None), ('defer', None), ('defer', None), ('edit', '4')]
+
+    log.clear()
+    await view.first_page_button.callback(FakeInteraction(log)) # type: ignore
+    await view.next_button.callback(FakeInteraction(log)) # type: ignore
+    assert log == [('edit_message', '0'), ('edit_message', '1')]
+    assert loaded == [1, 4, 0]
+
+    # A cached page is stamped again when shown again
+    first = view.create_embed().timestamp
+    assert first is not None and first > datetime(2000, 1, 1, tzinfo = timezone.utc)
+
+  asyncio.run(run())
+
+
+def test_stateless_pages_survive_cache_loss(monkeypatch):
+  async def run():
+    built = []
+    async def build(ctx, key):
+      built.append(key)
+      return [f'{key}-{i}' for i in range(3)]
+
+    StatelessPageScroller.register('test', build, lambda page: discord.Embed(title = page))
+    monkeypatch.setattr('src.utils.component_context', lambda interaction: None)
+
+    view = StatelessPageScroller.create_view('test', 'query', 1, 1, 3)
+    custom_ids = [item.custom_id for item in view.children] # type: ignore
+    assert len(set(custom_ids)) == 5 and all(len(custom_id) <= 100 for custom_id in custom_ids)
+    assert StatelessPageScroller.parse(custom_ids[2]) == ('next', 1, 2, 'test', 'query')
+
+    log = []
+    interaction = FakeInteraction(log)
+    interaction.data = {'custom_id': custom_ids[2]} # type: ignore
+    interaction.message = object() # type: ignore
+    assert await StatelessPageScroller.handle(interaction) # type: ignore
+    assert log == [('edit_message', 'query-1')] and built == ['query']
+
+    StatelessPageScroller.unregister('test')
+    assert await StatelessPageScroller.handle(interaction) # type: ignore
+    assert log[-1] == ('edit_message', False)
+
+  asyncio.run(run())
@@ -0,0 +1,155 @@
+import os
+import types
+import asyncio
+import discord
+
+from src import session as session_module
+from src.config import Config
+from src.session import SessionResume, SessionStore, _keep_resumable
+
+
+def session(guilds = ()) -> dict:
+  return {'session_id': 'abc', 'sequence': 42, 'gateway': 'wss://gateway-us-east1-b.discord.gg', 'guilds': list(guilds)}
+
+
+def test_sessions_are_taken_once(tmp_path):
+  store = SessionStore(str(tmp_path / 'sessions.json'), window = 60)
+  store.save({0: session([1, 2])}, None) # type: ignore
+
+  assert store.take() == (None, {0: session([1, 2])})
+  assert not os.path.exists(store.path)
+  assert store.take() == (None, {})
+
+
+def test_stale_or_resharded_sessions_are_discarded(tmp_path):
+  store = SessionStore(str(tmp_path / 'sessions.json'), window = 60)
+  store.save({0: session(), 1: session()}, 2) # type: ignore
+  assert store.take(4) == (4, {})
+
+  # A sharded client without a configured count adopts the saved one
+  store.save({0: session(), 1: session()}, 2) # type: ignore
+  assert store.take(None) == (2, {0: session(), 1: session()})
+
+  store.save({0: session()}, None) # type: ignore
+  store.window = -1
+  assert store.take() == (None, {})
+
+
+def test_closing_keeps_the_session_resumable():
+  class FakeSocket:
+    codes = []
+    async def close(self, code: int = 4000) -> None:
+      self.codes.append(code)
+
+  ws = FakeSocket()
+  _keep_resumable(ws) # type: ignore
+  asyncio.run(ws.close(code = 1000))
+  assert ws.codes == [4000]
+
+
+class FakeHTTP:
+  def __init__(self, fail: bool = False) -> None:
+    self.fail = fail
+
+  async def get_guild(self, guild_id: int, with_counts: bool = True) -> dict:
+    if self.fail:
+      raise TypeError('unexpected response')
+    return {'id': str(guild_id), 'name': f'guild{guild_id}', 'approximate_member_count': 300}
+
+  async def get_all_guild_channels(self, guild_id: int) -> list:
+    return [{'id': '10', 'type': 0, 'name': 'general', 'position': 0}]
+
+  async def get_member(self, guild_id: int, user_id: int) -> dict:
+    return {'user': {'id': str(user_id)}, 'roles': []}
+
+  async def get_active_threads(self, guild_id: int) -> dict:
+    return {'threads': [{'id': '20'}, {'id': '21'}], 'members': [{'id': '21', 'user_id': '5'}]}
+
+
+class Identify:
+  async def connect(self, *, reconnect: bool = True) -> None:
+    self.identified = True # type: ignore
+
+  async def close(self) -> None: ...
+
+  def is_closed(self) -> bool:
+    return False
+
+  def is_ready(self) -> bool:
+    return False
+
+
+class FakeClient(SessionResume, Identify):
+  """Sharded client, connecting is recorded instead of launching shards"""
+
+  _sharded = True # type: ignore
+
+  def __init__(self, shard_ids, http: FakeHTTP) -> None:
+    self.shard_count = None
+    self.shard_ids = shard_ids
+    self.http = http
+    self.user = discord.Object(5)
+    self.guilds_data = []
+    self.identified = False
+    self._ready = asyncio.Event()
+    self._connection = types.SimpleNamespace(_add_guild_from_data = self.guilds_data.append, _guild_needs_chunking = lambda guild: False)
+
+  async def wait_for(self, event: str, timeout: float) -> None:
+    await asyncio.sleep(timeout)
+
+
+def _saved(tmp_path, monkeypatch, shards) -> SessionStore:
+  store = SessionStore(str(tmp_path / 'sessions.json'), window = 60)
+  monkeypatch.setattr(session_module, 'session_store', store)
+  monkeypatch.setattr(Config, 'RESUME_SESSIONS', True)
+  store.save({shard_id: session([shard_id + 1]) for shard_id in shards}, 2) # type: ignore
+  return store
+
+
+def test_restore_hydrates_guilds_of_every_shard(tmp_path, monkeypatch):
+  _saved(tmp_path, monkeypatch, [0, 1])
+  client = FakeClient(None, FakeHTTP())
+
+  async def run():
+    await client.connect()
+    assert set(client._sessions) == {0, 1} and client.shard_count == 2
+
+    # The client becomes ready once the shards resumed, unless it closes first
+    waiting = client._resumed_ready
+    assert waiting is not None and not waiting.done()
+    await client.close()
+    await asyncio.wait({waiting})
+    assert waiting.cancelled()
+
+  asyncio.run(run())
+  assert sorted(guild['id'] for guild in client.guilds_data) == ['1', '2']
+  guild = client.guilds_data[0]
+  assert guild['member_count'] == 300 and guild['members'][0]['user']['id'] == '5'
+  assert guild['threads'] == [{'id': '20'}, {'id': '21', 'member': {'id': '21', 'user_id': '5'}}]
+
+
+def test_partial_sessions_identify_every_shard(tmp_path, monkeypatch):
+  # Shard 1 has no saved session, resuming only shard 0 would leave the client never ready
+  _saved(tmp_path, monkeypatch, [0])
+  client = FakeClient([0, 1], FakeHTTP())
+
+  asyncio.run(client.connect())
+  assert client._sessions == {} and client.guilds_data == [] and client.identified
+
+
+def test_failed_restore_falls_back_to_identify(tmp_path, monkeypatch):
+  store = _saved(tmp_path, monkeypatch, [0, 1])
+  client = FakeClient(None, FakeHTTP(fail = True))
+
+  asyncio.run(client.connect())
+  assert client._sessions == {} and client.identified and not os.path.exists(store.path)
+
+
+def test_unsupported_discord_versions_identify(tmp_path, monkeypatch):
+  store = _saved(tmp_path, monkeypatch, [0, 1])
+  monkeypatch.setattr(session_module, '_SUPPORTED_VERSIONS', ((1, 0), (1, 7)))
+  client = FakeClient(None, FakeHTTP())
+
+  asyncio.run(client.connect())
+  assert client._sessions == {} and client.guilds_data == [] and client.identified
+  assert os.path.exists(store.path)
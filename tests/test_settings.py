@@ -0,0 +1,76 @@
+import types
+import asyncio
+import pytest
+
+from src.check import Protected, PermissionPreset, decision_cache, set_override_resolver
+from src.config import Config
+from src.settings import SettingsStore
+from tests.fakes import FakeGuild, FakeMember, FakeContext
+
+
+class FakeMessage:
+  def __init__(self, guild) -> None:
+    self.guild = guild
+
+
+def test_updates_persist_and_reset_to_defaults(tmp_path):
+  async def run():
+    store = SettingsStore(str(tmp_path / 'settings.db'))
+    await store.open()
+    assert store.get(Config.GUILD_ID).welcome_channel_id == Config.WELCOME_CHANNEL_ID
+    assert store.get(5).welcome_channel_id is None and store.get(5).prefix == Config.COMMAND_PREFIX
+
+    await store.update(5, prefix = '!', welcome_channel_id = 10)
+    await store.update(5, rule_channel_id = 11)
+    with pytest.raises(ValueError):
+      await store.update(5, colour = 'red')
+    await store.close()
+
+    reopened = SettingsStore(str(tmp_path / 'settings.db'))
+    await reopened.open()
+    assert len(reopened) == 1
+    assert reopened.prefixes(FakeMessage(FakeGuild(5))) == ('!',) # type: ignore
+    assert reopened.command_prefix(None, FakeMessage(None)) == Config.COMMAND_PREFIX # type: ignore
+    assert (reopened.get(5).welcome_channel_id, reopened.get(5).rule_channel_id) == (10, 11)
+
+    # Another process changed the guild
+    await store.open()
+    await store.update(5, prefix = None)
+    assert reopened.get(5).prefix == '!'
+    assert (await reopened.reload(5)).prefix == Config.COMMAND_PREFIX
+    assert reopened.get(5).welcome_channel_id == 10
+    await store.close()
+    await reopened.close()
+
+  asyncio.run(run())
+
+
+def test_permission_override_replaces_command_gates(tmp_path):
+  async def run():
+    store = SettingsStore(str(tmp_path / 'settings.db'))
+    await store.open()
+    set_override_resolver(store.permission_override)
+    try:
+      decision_cache.clear()
+      guild = FakeGuild(id = 100)
+      guild.add_role(1, 'Moderator', 5)
+
+      @Protected.legacy(PermissionPreset.Admin)
+      async def command(): ...
+      predicate = command.__commands_checks__[0] # type: ignore
+
+      ctx = FakeContext(FakeMember(guild, 1, [1]), guild)
+      ctx.command = types.SimpleNamespace(qualified_name = 'command') # type: ignore
+      assert not predicate(ctx)
+
+      gate = {'type': 'required', 'requirement': {'type': 'wl', 'query': 'has_role', 'value': 1}}
+      await store.update(guild.id, permission_overrides = {'command': [gate]})
+      assert predicate(ctx)
+
+      await store.update(guild.id, permission_overrides = None)
+      assert not predicate(ctx)
+    finally:
+      set_override_resolver(None)
+      await store.close()
+
+  asyncio.run(run())
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+
+from src.outbound import OutboundScheduler, Priority
+from src.shutdown import Drain
+
+
+def test_drain_cuts_off_work_past_the_deadline(caplog):
+  async def run():
+    drain = Drain(timeout = 0.2)
+
+    async def command(seconds: float) -> None:
+      with drain.track('help'):
+        await asyncio.sleep(seconds)
+
+    quick = asyncio.ensure_future(command(0.05))
+    stuck = asyncio.ensure_future(command(10))
+    drain.register('welcome(s)', asyncio.Event().wait, lambda: 3)
+    await asyncio.sleep(0)
+
+    with caplog.at_level(logging.INFO, logger = 'src.shutdown'):
+      await drain.drain()
+    await asyncio.sleep(0)
+
+    assert drain.draining and quick.done() and not quick.cancelled() and stuck.cancelled()
+    assert 'Cut off command [help]' in caplog.text and 'Cut off 3 queued welcome(s)' in caplog.text
+
+  asyncio.run(run())
+
+
+def test_outbound_drain_drops_what_is_still_queued():
+  async def run():
+    scheduler = OutboundScheduler(rate = 1, per = 10, reserve = 0)
+
+    async def send(label: str) -> str:
+      return label
+
+    first = asyncio.ensure_future(scheduler.submit(1, Priority.WELCOME, lambda: send('first')))
+    second = asyncio.ensure_future(scheduler.submit(1, Priority.WELCOME, lambda: send('second')))
+    await asyncio.sleep(0.01)
+
+    assert await scheduler.drain(0.05) == {'reply': 0, 'welcome': 1, 'paging': 0}
+    assert await first == 'first'
+    await asyncio.wait({second})
+    assert second.cancelled() and scheduler.queued['welcome'] == 0 and scheduler.sending == 0
+
+  asyncio.run(run())
@@ -0,0 +1,84 @@
+import time
+import types
+import asyncio
+import logging
+import discord
+
+from src.cogs.invite_manager import WelcomeQueue
+
+
+class FakeChannel:
+  def __init__(self) -> None:
+    self.sends = []
+
+  async def send(self, content: str, embed: discord.Embed):
+    self.sends.append((time.monotonic(), content, embed))
+    await asyncio.sleep(0)
+
+
+class FakeMember:
+  def __init__(self, id: int) -> None:
+    self.id = id
+    self.mention = f'<@{id}>'
+    self.global_name = f'member{id}'
+    self.guild = discord.Object(1)
+
+
+def test_join_flood_is_batched_and_rate_limited():
+  async def run():
+    channel = FakeChannel()
+    queue = WelcomeQueue(lambda: channel, window = 0.01, batch_size = 10, rate = 5, per = 0.05, summary_threshold = 100)
+
+    # Waves of joins, each larger than the previous one
+    for wave in range(1, 6):
+      for i in range(wave * 400):
+        queue.push(FakeMember(wave * 10000 + i)) # type: ignore
+      await asyncio.sleep(0.02)
+    await queue.join()
+
+    assert queue.depth == 0 and queue.max_depth >= 2000
+    assert queue.welcomed + queue.summarized == sum(wave * 400 for wave in range(1, 6))
+    assert queue.summarized > 0 and queue.sent == len(channel.sends)
+    assert len(channel.sends) < 100
+    assert all(content.count('<@') <= 10 for _, content, _ in channel.sends)
+
+    # No more than `rate` sends within any `per` window
+    times = [sent for sent, _, _ in channel.sends]
+    assert all(times[i + 5] - times[i] >= 0.05 * 0.9 for i in range(len(times) - 5))
+
+  asyncio.run(run())
+
+
+def test_single_join_keeps_personal_welcome():
+  async def run():
+    channel = FakeChannel()
+    queue = WelcomeQueue(lambda: channel, window = 0.01)
+    queue.push(FakeMember(1)) # type: ignore
+    await queue.join()
+
+    assert [(content, embed.title) for _, content, embed in channel.sends] == [('<@1>', 'member1')]
+    assert len(queue.latencies) == 1
+
+  asyncio.run(run())
+
+
+def test_dropped_welcomes_are_logged(caplog):
+  async def fail(channel, *args, **kwargs):
+    raise discord.HTTPException(types.SimpleNamespace(status = 500, reason = 'Server Error'), 'failed')
+
+  async def run():
+    queue = WelcomeQueue(lambda: FakeChannel(), send = fail, window = 0.01)
+    for i in range(3):
+      queue.push(FakeMember(i)) # type: ignore
+    await queue.join()
+
+    unresolved = WelcomeQueue(lambda: None, window = 0.01)
+    unresolved.push(FakeMember(4)) # type: ignore
+    await unresolved.join()
+
+  with caplog.at_level(logging.WARNING):
+    asyncio.run(run())
+  assert [record.getMessage() for record in caplog.records] == [
+    'Failed to welcome 3 member(s) in guild [1]',
+    'No welcome channel in guild [1], dropping 1 join(s)'
+  ]